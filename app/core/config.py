@@ -24,6 +24,58 @@ class Settings(BaseSettings):
         "https://n8n.advcrm.com.br/webhook/msginterna_crm"
     )
     N8N_WEBHOOK_TIMEOUT_SECONDS: float = 30.0
+    # Pool de conexões do cliente HTTP compartilhado com o gateway
+    N8N_HTTP_MAX_CONNECTIONS: int = 100
+    N8N_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    N8N_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    N8N_HTTP2: bool = True
+    # Circuit breaker e timeout adaptativo do gateway. O timeout de cada envio
+    # segue o p99 observado (x multiplicador), entre o mínimo e
+    # N8N_WEBHOOK_TIMEOUT_SECONDS.
+    N8N_BREAKER_WINDOW_SECONDS: float = 60.0
+    N8N_BREAKER_MIN_CALLS: int = 10
+    N8N_BREAKER_ERROR_RATE: float = 0.5
+    N8N_BREAKER_OPEN_SECONDS: float = 30.0
+    N8N_BREAKER_HALF_OPEN_PROBES: int = 1
+    N8N_TIMEOUT_MIN_SECONDS: float = 3.0
+    N8N_TIMEOUT_P99_MULTIPLIER: float = 2.0
+
+    # Broadcast — envios simultâneos e limite por instância WhatsApp
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_MAX_TARGETS: int = 10000
+    BROADCAST_RATE_PER_INSTANCE: float = 1.0
+    BROADCAST_BURST_PER_INSTANCE: int = 5
+
+    # Fila de envios WhatsApp (outbox) — workers em background
+    OUTBOX_WORKERS: int = 2
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 5.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 900.0
+
+    # Cache da configuração das agendas — invalidado via Realtime; TTL de segurança
+    CALENDAR_CACHE_TTL_SECONDS: float = 300.0
+    CALENDAR_CACHE_MAX_ENTRIES: int = 1000
+
+    # Links dos feeds ICS (query `token`, assinada com HMAC e vinculada ao
+    # token de API emissor, cuja desativação/rotação revoga os links dele).
+    # Vazio: derivado da service role key. Trocar o segredo revoga todos.
+    FEED_SIGNING_SECRET: str = ""
+
+    # Reservas de estoque — sweeper que libera reservas expiradas
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = 30.0
+    RESERVATION_SWEEP_BATCH_SIZE: int = 1000
+
+    # Remoção de arquivos do storage em background (fila persistente, lotes
+    # com retry). Após MAX_ATTEMPTS falhas o lote vai para o log de erro, mas
+    # segue na fila.
+    STORAGE_CLEANUP_DELAY_SECONDS: float = 1.0
+    STORAGE_CLEANUP_POLL_INTERVAL_SECONDS: float = 30.0
+    STORAGE_CLEANUP_BATCH_SIZE: int = 1000
+    STORAGE_CLEANUP_MAX_ATTEMPTS: int = 4
+    STORAGE_CLEANUP_BACKOFF_SECONDS: float = 2.0
+    STORAGE_CLEANUP_BACKOFF_MAX_SECONDS: float = 3600.0
 
     @property
     def cors_origins(self) -> list[str]:
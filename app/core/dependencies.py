@@ -2,7 +2,10 @@ from typing import Annotated
 
 from fastapi import Depends
 
-from app.core.security import validate_api_token
+from app.core.security import get_api_token, validate_api_token
 
 # Dependency que extrai e valida o token, retornando o empresa_id
 EmpresaId = Annotated[str, Depends(validate_api_token)]
+
+# Registro do token de API (id, empresa_id, token), para vincular links assinados
+ApiToken = Annotated[dict, Depends(get_api_token)]
@@ -1,8 +1,13 @@
+import base64
+import hashlib
+import hmac
+import uuid
 from datetime import datetime, timezone
 
 from fastapi import Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app.core.config import get_settings
 from app.core.exceptions import UnauthorizedException
 from app.utils.supabase_client import get_supabase
 
@@ -11,19 +16,23 @@ security_scheme = HTTPBearer(
     description="Token de API gerado no painel do CRM. Formato: adv_live_xxxxxxxx",
 )
 
+# Mesmo esquema, opcional: feeds também aceitam o token assinado na URL
+optional_security_scheme = HTTPBearer(
+    scheme_name="API Token",
+    description="Token de API gerado no painel do CRM. Formato: adv_live_xxxxxxxx",
+    auto_error=False,
+)
 
-async def validate_api_token(
+
+async def get_api_token(
     credentials: HTTPAuthorizationCredentials = Security(security_scheme),
-) -> str:
+) -> dict:
     """
-    Valida o token de API e retorna o empresa_id associado.
+    Valida o token de API e retorna o registro (`id`, `empresa_id`, `token`).
 
     Busca na tabela api_tokens onde token = X AND is_active = true.
     Atualiza last_used_at para rastreamento de uso.
 
-    Returns:
-        empresa_id (str): UUID da empresa associada ao token.
-
     Raises:
         UnauthorizedException: Se o token for inválido ou inativo.
     """
@@ -52,4 +61,72 @@ async def validate_api_token(
         {"last_used_at": datetime.now(timezone.utc).isoformat()}
     ).eq("id", token_data["id"]).execute()
 
-    return token_data["empresa_id"]
+    return {"id": token_data["id"], "empresa_id": token_data["empresa_id"], "token": token}
+
+
+async def validate_api_token(
+    credentials: HTTPAuthorizationCredentials = Security(security_scheme),
+) -> str:
+    """
+    Valida o token de API e retorna o empresa_id associado.
+
+    Returns:
+        empresa_id (str): UUID da empresa associada ao token.
+
+    Raises:
+        UnauthorizedException: Se o token for inválido ou inativo.
+    """
+    return (await get_api_token(credentials))["empresa_id"]
+
+
+# =====================================================
+# Tokens assinados dos feeds
+# =====================================================
+
+
+def _feed_signature(api_token: dict, scope: str) -> str:
+    settings = get_settings()
+    secret = settings.FEED_SIGNING_SECRET or hashlib.sha256(
+        f"feed:{settings.SUPABASE_SERVICE_ROLE_KEY}".encode()
+    ).hexdigest()
+    # O valor do token de API entra na assinatura: rotacioná-lo invalida o link
+    token_hash = hashlib.sha256(api_token["token"].encode()).hexdigest()
+    message = f"{api_token['id']}:{api_token['empresa_id']}:{scope}:{token_hash}"
+    digest = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign_feed_token(api_token: dict, scope: str) -> str:
+    """Token do link de um feed, válido só para `scope` (ex.: `calendar:<id>`).
+
+    Clientes de calendário (Google, Outlook, Apple) assinam a URL sem enviar
+    o header Authorization. O token fica vinculado ao token de API que o
+    emitiu: desativar ou rotacionar esse token revoga o link.
+    """
+    return f"{api_token['id']}.{_feed_signature(api_token, scope)}"
+
+
+async def verify_feed_token(token: str, scope: str) -> str:
+    """Valida o token do feed para `scope` e retorna o empresa_id.
+
+    O token de API emissor precisa continuar ativo e com o mesmo valor.
+    """
+    token_id, _, signature = token.partition(".")
+    try:
+        uuid.UUID(token_id)
+    except ValueError:
+        raise UnauthorizedException("Token do feed inválido") from None
+
+    result = (
+        get_supabase()
+        .table("api_tokens")
+        .select("id, empresa_id, token")
+        .eq("id", token_id)
+        .eq("is_active", True)
+        .execute()
+    )
+    if not result.data or not hmac.compare_digest(
+        signature.encode(), _feed_signature(result.data[0], scope).encode()
+    ):
+        raise UnauthorizedException("Token do feed inválido ou revogado")
+    return result.data[0]["empresa_id"]
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -18,6 +19,14 @@ from app.routers.v1 import (
     chat,
     products,
 )
+from app.services import (
+    booking_cache_service,
+    chat_stream_service,
+    product_reservation_service,
+    storage_cleanup_service,
+    whatsapp_outbox_service,
+    whatsapp_send_service,
+)
 
 DESCRIPTION = """
 ## API pública do Aucta CRM
@@ -49,6 +58,23 @@ Gere seu token no painel do CRM em **Configurações > Integrações > API Keys*
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await whatsapp_send_service.startup()
+    await whatsapp_outbox_service.start_workers()
+    await product_reservation_service.start_sweeper()
+    await storage_cleanup_service.start_worker()
+    await booking_cache_service.start_listener()
+    yield
+    await booking_cache_service.stop_listener()
+    await storage_cleanup_service.stop_worker()
+    await product_reservation_service.stop_sweeper()
+    await whatsapp_outbox_service.stop_workers()
+    await whatsapp_send_service.shutdown()
+    await chat_stream_service.shutdown()
+
+
 app = FastAPI(
     title=settings.API_TITLE,
     description=DESCRIPTION,
@@ -56,6 +82,7 @@ app = FastAPI(
     docs_url=None,   # Desabilitado — customizado abaixo
     redoc_url=None,  # Desabilitado — customizado abaixo
     openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 # Arquivos estáticos (favicon)
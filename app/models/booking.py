@@ -98,10 +98,72 @@ class BookingResponse(BaseModel):
     created_by: str
     created_at: str
     updated_at: str
+    # Ocorrência de série recorrente (materializada ou expandida)
+    series_id: str | None = None
+    series_occurrence_start: str | None = None
     # Relacionamentos opcionais
     booking_types: BookingTypeResponse | None = None
 
 
+class BookingSlotResponse(BaseModel):
+    """Horário livre para um tipo de agendamento."""
+
+    start: str
+    end: str
+    owner_ids: list[str] = Field(
+        default_factory=list, description="Responsáveis livres neste horário"
+    )
+
+
+class BookingSlotsResponse(BaseModel):
+    """Horários livres de uma agenda no período consultado."""
+
+    calendar_id: str
+    booking_type_id: str
+    timezone: str
+    slots: list[BookingSlotResponse]
+
+
+class BookingSeriesResponse(BaseModel):
+    """Série de agendamentos recorrentes."""
+
+    id: str
+    empresa_id: str
+    calendar_id: str
+    booking_type_id: str
+    assigned_to: str
+    created_by: str
+    lead_id: str | None = None
+    client_name: str | None = None
+    client_phone: str | None = None
+    client_email: str | None = None
+    dtstart: str
+    duration_minutes: int
+    timezone: str
+    rrule: str
+    ends_at: str | None = None
+    status: str | None = "confirmed"
+    notes: str | None = None
+    created_at: str
+    updated_at: str
+    # Relacionamentos opcionais
+    booking_types: BookingTypeResponse | None = None
+
+
+class BatchBookingStatusResponse(BaseModel):
+    """Resultado de uma transição de status em lote."""
+
+    updated: int
+    data: list[BookingResponse]
+
+
+class FeedLinkResponse(BaseModel):
+    """Link assinado de um feed ICS, para assinatura em clientes de calendário."""
+
+    url: str = Field(..., description="URL do feed com o token na query")
+    token: str = Field(..., description="Token do feed (parâmetro `token`)")
+
+
 # =====================================================
 # Request Models
 # =====================================================
@@ -112,7 +174,13 @@ class CreateBookingRequest(BaseModel):
 
     calendar_id: str = Field(..., description="ID da agenda")
     booking_type_id: str = Field(..., description="ID do tipo de agendamento")
-    assigned_to: str = Field(..., description="UUID do responsável pelo atendimento")
+    assigned_to: str | None = Field(
+        None,
+        description=(
+            "UUID do responsável pelo atendimento. Se omitido, é atribuído "
+            "automaticamente (round-robin ponderado entre os membros livres)"
+        ),
+    )
     created_by: str = Field(..., description="UUID de quem criou o agendamento")
     lead_id: str | None = Field(None, description="ID do lead associado")
     client_name: str | None = Field(None, max_length=200, description="Nome do cliente")
@@ -136,3 +204,49 @@ class UpdateBookingRequest(BaseModel):
     end_datetime: str | None = None
     status: str | None = None
     notes: str | None = None
+
+
+class CreateBookingSeriesRequest(BaseModel):
+    """Dados para criar uma série de agendamentos recorrentes."""
+
+    calendar_id: str = Field(..., description="ID da agenda")
+    booking_type_id: str = Field(..., description="ID do tipo de agendamento")
+    assigned_to: str = Field(..., description="UUID do responsável pelo atendimento")
+    created_by: str = Field(..., description="UUID de quem criou a série")
+    lead_id: str | None = Field(None, description="ID do lead associado")
+    client_name: str | None = Field(None, max_length=200, description="Nome do cliente")
+    client_phone: str | None = Field(None, max_length=20, description="Telefone do cliente")
+    client_email: str | None = Field(None, description="Email do cliente")
+    start_datetime: str = Field(..., description="Início da primeira ocorrência (ISO)")
+    end_datetime: str = Field(..., description="Fim da primeira ocorrência (ISO)")
+    rrule: str = Field(
+        ...,
+        description=(
+            "Regra de recorrência (RFC 5545). Suportados: FREQ=DAILY|WEEKLY, "
+            "INTERVAL, BYDAY, COUNT, UNTIL. Ex.: FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10"
+        ),
+    )
+    status: str = Field("confirmed", description="Status (confirmed, pending)")
+    notes: str | None = Field(None, description="Observações")
+
+
+class UpdateSeriesOccurrenceRequest(BaseModel):
+    """Alteração de uma única ocorrência de uma série."""
+
+    assigned_to: str | None = None
+    start_datetime: str | None = None
+    end_datetime: str | None = None
+    status: str | None = None
+    notes: str | None = None
+
+
+class BatchBookingStatusRequest(BaseModel):
+    """Seleção de agendamentos para cancelar/confirmar em lote."""
+
+    ids: list[str] | None = Field(
+        None, min_length=1, max_length=500, description="IDs dos agendamentos"
+    )
+    calendar_id: str | None = Field(None, description="Filtrar por agenda")
+    assigned_to: str | None = Field(None, description="Filtrar por responsável (UUID)")
+    date_from: str | None = Field(None, description="Início a partir de (ISO)")
+    date_to: str | None = Field(None, description="Início até (ISO)")
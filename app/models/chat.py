@@ -42,6 +42,23 @@ class ConversationResponse(BaseModel):
     model_config = {"populate_by_name": True}
 
 
+class InboxConversationResponse(ConversationResponse):
+    """Conversa na caixa de entrada, com prévia da última mensagem."""
+
+    last_message_preview: str | None = None
+    last_message_type: str | None = None
+    last_message_direction: str | None = None
+    unread_count: int = 0
+
+
+class ConversationReadResponse(BaseModel):
+    """Marcador de leitura de uma conversa por um atendente."""
+
+    conversation_id: str
+    user_id: str
+    last_read_at: str
+
+
 class MessageResponse(BaseModel):
     """Representação de uma mensagem de chat."""
 
@@ -55,6 +72,7 @@ class MessageResponse(BaseModel):
     status: str
     timestamp: str | None = None
     empresa_id: str
+    external_id: str | None = None
     created_at: str
 
 
@@ -75,6 +93,21 @@ class CreateConversationRequest(BaseModel):
     status: str = Field("active", description="Status (active, closed, archived)")
 
 
+class GetOrCreateConversationRequest(BaseModel):
+    """Busca a conversa do contato na instância ou cria uma nova.
+
+    Os demais campos só são usados quando a conversa é criada.
+    """
+
+    instance_id: str = Field(..., description="ID da instância WhatsApp")
+    fone: str = Field(..., min_length=1, max_length=20, description="Telefone do contato")
+    lead_id: str | None = Field(None, description="ID do lead associado")
+    nome_instancia: str | None = Field(None, description="Nome da instância")
+    assigned_user_id: str | None = Field(None, description="UUID do atendente")
+    cod_lid: str | None = Field(None, description="Código do lead")
+    status: str = Field("active", description="Status (active, closed, archived)")
+
+
 class UpdateConversationRequest(BaseModel):
     """Dados para atualização parcial de uma conversa."""
 
@@ -84,6 +117,15 @@ class UpdateConversationRequest(BaseModel):
     cod_lid: str | None = None
 
 
+class MarkConversationReadRequest(BaseModel):
+    """Marca a conversa como lida por um atendente."""
+
+    user_id: str = Field(..., description="UUID do atendente")
+    read_at: str | None = Field(
+        None, description="Lida até esta data/hora (ISO). Default: agora"
+    )
+
+
 class CreateMessageRequest(BaseModel):
     """Dados para enviar/registrar uma mensagem."""
 
@@ -95,6 +137,45 @@ class CreateMessageRequest(BaseModel):
     status: str = Field("sent", description="Status (sent, delivered, read, failed)")
 
 
+class BulkMessageItem(CreateMessageRequest):
+    """Mensagem de um lote de ingestão (ex: backfill do gateway)."""
+
+    conversation_id: str = Field(..., description="ID da conversa")
+    external_id: str | None = Field(
+        None, description="ID da mensagem no gateway (deduplicação por empresa)"
+    )
+    timestamp: str | None = Field(
+        None, description="Data/hora original da mensagem (ISO). Default: agora"
+    )
+
+
+class BulkCreateMessagesRequest(BaseModel):
+    """Lote de mensagens de várias conversas."""
+
+    messages: list[BulkMessageItem] = Field(
+        ..., min_length=1, max_length=5000, description="Mensagens do lote"
+    )
+
+
+class BulkMessageError(BaseModel):
+    """Mensagem rejeitada no lote."""
+
+    index: int = Field(..., description="Posição da mensagem no lote")
+    conversation_id: str
+    error: str
+
+
+class BulkCreateMessagesResponse(BaseModel):
+    """Resultado da ingestão em lote."""
+
+    received: int
+    inserted: int
+    duplicates: int = Field(
+        ..., description="Ignoradas por `external_id` já registrado"
+    )
+    rejected: list[BulkMessageError] = []
+
+
 # =====================================================
 # Envio de mensagem via WhatsApp
 # =====================================================
@@ -142,6 +223,39 @@ class SendWhatsappMessageRequest(BaseModel):
         return self
 
 
+class BroadcastFilter(BaseModel):
+    """Filtro de conversas alvo do broadcast."""
+
+    status: str | None = Field(None, description="Status da conversa (active, closed, archived)")
+    instance_id: str | None = Field(None, description="Instância WhatsApp")
+    assigned_user_id: str | None = Field(None, description="Atendente (UUID)")
+    lead_id: str | None = Field(None, description="Lead associado")
+
+
+class BroadcastRequest(BaseModel):
+    """Envio da mesma mensagem para várias conversas.
+
+    Informe **apenas um** entre `conversation_ids` e `filter`. Em `content`,
+    `{nome}` e `{fone}` são substituídos pelos dados de cada conversa.
+    """
+
+    message: SendWhatsappMessageRequest
+    conversation_ids: list[str] | None = Field(
+        None, min_length=1, max_length=10000, description="IDs das conversas alvo"
+    )
+    filter: BroadcastFilter | None = Field(
+        None, description="Filtro de conversas alvo"
+    )
+
+    @model_validator(mode="after")
+    def _validate_targets(self) -> "BroadcastRequest":
+        if (self.conversation_ids is None) == (self.filter is None):
+            raise ValueError(
+                "Informe `conversation_ids` ou `filter` (apenas um deles)."
+            )
+        return self
+
+
 class SendWhatsappMessageResponse(BaseModel):
     """Resultado do envio da mensagem."""
 
@@ -155,3 +269,23 @@ class SendWhatsappMessageResponse(BaseModel):
     error: str | None = Field(
         None, description="Mensagem de erro, quando status = 'failed'."
     )
+
+
+WhatsappSendStatus = Literal["pending", "sending", "sent", "failed"]
+
+
+class WhatsappSendJobResponse(BaseModel):
+    """Envio assíncrono registrado na fila (outbox) e seu estado de entrega."""
+
+    id: str = Field(..., description="ID do envio (send_id)")
+    conversation_id: str
+    status: WhatsappSendStatus = Field(
+        ..., description="Estado da entrega (pending, sending, sent, failed)"
+    )
+    attempts: int = Field(0, description="Tentativas de entrega realizadas")
+    next_attempt_at: str | None = None
+    last_error: str | None = None
+    webhook_response: dict[str, Any] | None = None
+    sent_at: str | None = None
+    created_at: str
+    updated_at: str
@@ -15,6 +15,16 @@ class PaginatedResponse(BaseModel, Generic[T]):
     total_pages: int
 
 
+class CursorPaginatedResponse(BaseModel, Generic[T]):
+    """Resposta paginada por cursor (keyset), sem contagem total."""
+
+    data: list[T]
+    limit: int
+    has_more: bool
+    next_before: str | None = None
+    next_after: str | None = None
+
+
 class ErrorResponse(BaseModel):
     """Schema de resposta de erro."""
 
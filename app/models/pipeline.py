@@ -24,3 +24,25 @@ class PipelineResponse(BaseModel):
     created_at: str
     # Stages opcionalmente populados
     stages: list[StageResponse] | None = None
+
+
+class StageAnalyticsResponse(BaseModel):
+    """Métricas de funil de um stage no período consultado."""
+
+    stage_id: str
+    name: str
+    position: int
+    entries: int = 0
+    advanced: int = 0
+    conversion_rate: float | None = None
+    dwell_median_seconds: float | None = None
+    dwell_p90_seconds: float | None = None
+
+
+class PipelineAnalyticsResponse(BaseModel):
+    """Conversão e tempo de permanência por stage de um pipeline."""
+
+    pipeline_id: str
+    date_from: str | None = None
+    date_to: str | None = None
+    stages: list[StageAnalyticsResponse]
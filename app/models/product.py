@@ -66,6 +66,9 @@ class ProductResponse(BaseModel):
     preco: float | None = None
     preco_promocional: float | None = None
     quantidade_estoque: int = 0
+    # Reservado por checkouts em andamento; disponível = estoque - reservado
+    quantidade_reservada: int = 0
+    quantidade_disponivel: int = 0
     unidade_medida: str = "un"
     status: ProductStatus
     tipo: ProductType
@@ -77,6 +80,80 @@ class ProductResponse(BaseModel):
     images: list[ProductImageResponse] = []
 
 
+ReservationStatus = Literal["active", "committed", "released", "expired"]
+
+
+class ProductReservationResponse(BaseModel):
+    """Reserva de estoque de um produto (checkout)."""
+
+    id: str
+    empresa_id: str
+    product_id: str
+    quantidade: int
+    status: ReservationStatus
+    expires_at: str
+    reference: str | None = None
+    created_at: str
+    updated_at: str
+
+
+BulkItemStatus = Literal["created", "updated", "unchanged", "not_found", "error"]
+
+
+class BulkUpsertItemResult(BaseModel):
+    """Resultado da sincronização de um SKU."""
+
+    sku: str
+    id: str | None = None
+    status: BulkItemStatus
+    error: str | None = None
+
+
+class BulkUpsertProductsResponse(BaseModel):
+    """Resultado da sincronização em lote, com o detalhe por SKU."""
+
+    received: int
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    not_found: int = 0
+    error: int = 0
+    results: list[BulkUpsertItemResult] = []
+
+
+class FacetCountResponse(BaseModel):
+    """Quantidade de itens com um valor da faceta (`null` = não informado)."""
+
+    value: str | None = None
+    count: int
+
+
+class PriceRangeResponse(BaseModel):
+    min: float | None = None
+    max: float | None = None
+
+
+class PriceBucketResponse(BaseModel):
+    """Faixa do histograma de preço efetivo (promocional ou cheio)."""
+
+    min: float
+    max: float
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    """Facetas do catálogo para os filtros informados."""
+
+    total: int = 0
+    categoria_id: list[FacetCountResponse] = []
+    marca: list[FacetCountResponse] = []
+    tipo: list[FacetCountResponse] = []
+    status: list[FacetCountResponse] = []
+    preco: PriceRangeResponse
+    preco_promocional: PriceRangeResponse
+    histogram: list[PriceBucketResponse] = []
+
+
 # =====================================================
 # Request Models — Products
 # =====================================================
@@ -196,3 +273,50 @@ class AdjustStockRequest(BaseModel):
                 "Informe apenas um entre `delta` e `quantidade_estoque`, não ambos."
             )
         return self
+
+
+class CreateReservationRequest(BaseModel):
+    """Reserva estoque de um produto durante o checkout.
+
+    A reserva expira após `ttl_seconds` se não for confirmada nem liberada.
+    """
+
+    quantidade: int = Field(..., ge=1, description="Quantidade a reservar")
+    ttl_seconds: int = Field(
+        900, ge=30, le=86400, description="Validade da reserva em segundos (default 15 min)"
+    )
+    reference: str | None = Field(
+        None, max_length=255, description="Referência externa (ex.: id do carrinho)"
+    )
+
+
+class BulkProductItem(BaseModel):
+    """Item da sincronização em lote, identificado pelo SKU.
+
+    Só os campos enviados são comparados e gravados; `preco_promocional: null`
+    remove a promoção. Os demais campos de criação só valem com `create_missing`.
+    """
+
+    sku: str = Field(..., min_length=1, description="Código SKU")
+    nome: str | None = Field(None, min_length=1, max_length=300)
+    preco: float | None = Field(None, ge=0)
+    preco_promocional: float | None = Field(None, ge=0)
+    quantidade_estoque: int | None = Field(None, ge=0)
+    status: ProductStatus | None = None
+    # Usados apenas ao criar (`create_missing`)
+    descricao: str | None = None
+    categoria_id: str | None = None
+    marca: str | None = None
+    unidade_medida: str | None = None
+    tipo: ProductType | None = None
+
+
+class BulkUpsertProductsRequest(BaseModel):
+    """Lote de itens para sincronização de preço/estoque (ex.: ERP)."""
+
+    items: list[BulkProductItem] = Field(
+        ..., min_length=1, max_length=5000, description="Itens do lote"
+    )
+    create_missing: bool = Field(
+        False, description="Criar produtos para SKUs inexistentes (exige `nome`)"
+    )
@@ -1,18 +1,42 @@
-from fastapi import APIRouter, Query
-
-from app.core.dependencies import EmpresaId
+from typing import Literal
+
+from fastapi import APIRouter, Header, Query, Request, Response, Security
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core.dependencies import ApiToken, EmpresaId
+from app.core.exceptions import UnauthorizedException, ValidationException
+from app.core.security import (
+    optional_security_scheme,
+    sign_feed_token,
+    validate_api_token,
+    verify_feed_token,
+)
 from app.models.booking import (
+    BatchBookingStatusRequest,
+    BatchBookingStatusResponse,
     BookingAvailabilityResponse,
     BookingBlockResponse,
     BookingResponse,
+    BookingSeriesResponse,
+    BookingSlotsResponse,
     BookingTypeResponse,
     CalendarOwnerResponse,
     CalendarResponse,
     CreateBookingRequest,
+    CreateBookingSeriesRequest,
+    FeedLinkResponse,
     UpdateBookingRequest,
+    UpdateSeriesOccurrenceRequest,
 )
 from app.models.common import PaginatedResponse, SuccessResponse
-from app.services import booking_service
+from app.services import (
+    booking_assignment_service,
+    booking_feed_service,
+    booking_series_service,
+    booking_service,
+    booking_slot_service,
+)
 
 router = APIRouter()
 
@@ -73,6 +97,252 @@ async def list_blocks(
     return await booking_service.list_blocks(empresa_id, calendar_id, date_from)
 
 
+@router.get(
+    "/bookings/calendars/{calendar_id}/slots",
+    response_model=BookingSlotsResponse,
+)
+async def list_slots(
+    calendar_id: str,
+    empresa_id: EmpresaId,
+    type_id: str = Query(..., description="ID do tipo de agendamento"),
+    date_from: str = Query(..., alias="from", description="Data (YYYY-MM-DD) ou data/hora inicial (ISO)"),
+    date_to: str = Query(..., alias="to", description="Data (YYYY-MM-DD, inclusiva) ou data/hora final (ISO)"),
+    interval_minutes: int | None = Query(
+        None, ge=5, le=1440, description="Passo entre inícios (padrão: duração do tipo)"
+    ),
+):
+    """
+    Calcula os horários livres de um tipo de agendamento no período.
+
+    Considera duração, buffers, `max_per_day`, antecedência mínima/máxima,
+    bloqueios e agendamentos dos responsáveis, no fuso da agenda.
+    Período máximo de 92 dias. Cada slot traz os responsáveis livres.
+    """
+    return await booking_slot_service.list_slots(
+        empresa_id, calendar_id, type_id, date_from, date_to, interval_minutes
+    )
+
+
+# =====================================================
+# Feeds iCalendar
+# =====================================================
+
+
+def _feed_response(feed: dict) -> Response:
+    if feed["stream"] is None:
+        return Response(status_code=304, headers=feed["headers"])
+    return StreamingResponse(
+        feed["stream"],
+        media_type="text/calendar; charset=utf-8",
+        headers=feed["headers"],
+    )
+
+
+async def _feed_empresa_id(
+    scope: str,
+    token: str | None,
+    credentials: HTTPAuthorizationCredentials | None,
+) -> str:
+    """Empresa do feed: token assinado na query ou, na falta dele, o Bearer."""
+    if token:
+        return await verify_feed_token(token, scope)
+    if credentials:
+        return await validate_api_token(credentials)
+    raise UnauthorizedException("Informe o `token` do feed ou o token de API")
+
+
+def _feed_link(request: Request, route: str, api_token: dict, scope: str, **path) -> dict:
+    token = sign_feed_token(api_token, scope)
+    return {"url": f"{request.url_for(route, **path)}?token={token}", "token": token}
+
+
+@router.get(
+    "/bookings/calendars/{calendar_id}/feed-link",
+    response_model=FeedLinkResponse,
+)
+async def calendar_feed_link(calendar_id: str, request: Request, api_token: ApiToken):
+    """
+    Link assinado do feed ICS da agenda, para assinar no Google Calendar,
+    Outlook ou Apple Calendar (que não enviam o header Authorization).
+
+    O link fica vinculado ao token de API usado nesta chamada: desativar ou
+    rotacionar esse token revoga o link.
+    """
+    await booking_service.get_calendar(api_token["empresa_id"], calendar_id)
+    return _feed_link(
+        request, "calendar_feed", api_token, f"calendar:{calendar_id}",
+        calendar_id=calendar_id,
+    )
+
+
+@router.get(
+    "/bookings/owners/{user_id}/feed-link",
+    response_model=FeedLinkResponse,
+)
+async def owner_feed_link(user_id: str, request: Request, api_token: ApiToken):
+    """Link assinado do feed ICS de um responsável. Mesmas regras do link por agenda."""
+    return _feed_link(
+        request, "owner_feed", api_token, f"owner:{user_id}", user_id=user_id
+    )
+
+
+@router.get(
+    "/bookings/calendars/{calendar_id}/feed.ics",
+    response_class=StreamingResponse,
+)
+async def calendar_feed(
+    calendar_id: str,
+    token: str | None = Query(None, description="Token do link assinado (feed-link)"),
+    credentials: HTTPAuthorizationCredentials | None = Security(optional_security_scheme),
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+):
+    """
+    Feed iCalendar (ICS) dos agendamentos da agenda.
+
+    Autenticação pelo `token` do link de `GET .../feed-link` (para clientes
+    de calendário) ou pelo token de API no header Authorization.
+
+    Inclui de 30 dias atrás até 1 ano à frente, com as ocorrências de
+    séries recorrentes; cancelados saem com `STATUS:CANCELLED`. Suporta
+    `If-None-Match`/`If-Modified-Since` (304 quando nada mudou).
+    """
+    empresa_id = await _feed_empresa_id(f"calendar:{calendar_id}", token, credentials)
+    feed = await booking_feed_service.build_feed(
+        empresa_id,
+        calendar_id=calendar_id,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+    )
+    return _feed_response(feed)
+
+
+@router.get(
+    "/bookings/owners/{user_id}/feed.ics",
+    response_class=StreamingResponse,
+)
+async def owner_feed(
+    user_id: str,
+    token: str | None = Query(None, description="Token do link assinado (feed-link)"),
+    credentials: HTTPAuthorizationCredentials | None = Security(optional_security_scheme),
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+):
+    """
+    Feed iCalendar (ICS) dos agendamentos de um responsável (`assigned_to`),
+    em todas as agendas da empresa. Mesmas regras do feed por agenda.
+    """
+    empresa_id = await _feed_empresa_id(f"owner:{user_id}", token, credentials)
+    feed = await booking_feed_service.build_feed(
+        empresa_id,
+        assigned_to=user_id,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+    )
+    return _feed_response(feed)
+
+
+# =====================================================
+# Séries recorrentes
+# =====================================================
+
+
+@router.post("/bookings/series", response_model=BookingSeriesResponse, status_code=201)
+async def create_series(data: CreateBookingSeriesRequest, empresa_id: EmpresaId):
+    """
+    Cria uma série de agendamentos recorrentes a partir de uma RRULE.
+
+    As ocorrências não são gravadas uma a uma: aparecem em `GET /bookings`
+    (com `date_from`/`date_to`) e nos feeds ICS, bloqueiam horários no
+    cálculo de slots e fazem `POST /bookings`/`PATCH /bookings/{id}`
+    retornarem 409 para o responsável em qualquer data.
+
+    Na criação da série, só os primeiros 92 dias são verificados: retorna
+    409 se alguma ocorrência desse período cair em um bloqueio da agenda ou
+    conflitar com agendamentos do responsável. Ocorrências posteriores
+    podem coincidir com agendamentos já existentes (não com novos).
+    """
+    return await booking_series_service.create_series(
+        empresa_id, data.model_dump(exclude_none=True)
+    )
+
+
+@router.get("/bookings/series/{series_id}", response_model=BookingSeriesResponse)
+async def get_series(series_id: str, empresa_id: EmpresaId):
+    """Busca uma série recorrente por ID."""
+    return await booking_series_service.get_series(empresa_id, series_id)
+
+
+@router.post(
+    "/bookings/series/{series_id}/cancel", response_model=BookingSeriesResponse
+)
+async def cancel_series(series_id: str, empresa_id: EmpresaId):
+    """Cancela a série. Ocorrências já alteradas individualmente são mantidas."""
+    return await booking_series_service.cancel_series(empresa_id, series_id)
+
+
+@router.patch(
+    "/bookings/series/{series_id}/occurrences/{occurrence}",
+    response_model=BookingResponse,
+)
+async def update_series_occurrence(
+    series_id: str,
+    occurrence: str,
+    data: UpdateSeriesOccurrenceRequest,
+    empresa_id: EmpresaId,
+):
+    """
+    Altera uma única ocorrência da série.
+
+    `occurrence` é o início original da ocorrência (`AAAAMMDDTHHMMSSZ` em
+    UTC, ou ISO). A ocorrência passa a existir como agendamento próprio.
+    """
+    return await booking_series_service.update_occurrence(
+        empresa_id, series_id, occurrence, data.model_dump(exclude_none=True)
+    )
+
+
+@router.post(
+    "/bookings/series/{series_id}/occurrences/{occurrence}/cancel",
+    response_model=BookingResponse,
+)
+async def cancel_series_occurrence(
+    series_id: str, occurrence: str, empresa_id: EmpresaId
+):
+    """Cancela uma única ocorrência da série."""
+    return await booking_series_service.cancel_occurrence(
+        empresa_id, series_id, occurrence
+    )
+
+
+# =====================================================
+# Operações em lote
+# =====================================================
+
+
+@router.post(
+    "/bookings/batch/{action}", response_model=BatchBookingStatusResponse
+)
+async def batch_update_status(
+    action: Literal["cancel", "confirm"],
+    data: BatchBookingStatusRequest,
+    empresa_id: EmpresaId,
+):
+    """
+    Cancela (`cancel`) ou confirma (`confirm`) vários agendamentos de uma vez.
+
+    Seleção por `ids` (até 500) e/ou filtros; sem `ids`, o período
+    (`date_from` e `date_to`) é obrigatório. Executa um único UPDATE e
+    retorna os agendamentos alterados. Confirmar só afeta pendentes; se
+    algum conflitar com outro agendamento ou com um bloqueio da agenda, nada
+    é alterado (409).
+    Ocorrências de séries não materializadas não são afetadas.
+    """
+    return await booking_service.batch_update_status(
+        empresa_id, action, **data.model_dump(exclude_none=True)
+    )
+
+
 # =====================================================
 # Bookings CRUD
 # =====================================================
@@ -89,12 +359,38 @@ async def list_bookings(
     lead_id: str | None = Query(None, description="Filtrar por lead associado"),
     date_from: str | None = Query(None, description="Data/hora inicial (ISO)"),
     date_to: str | None = Query(None, description="Data/hora final (ISO)"),
+    include_occurrences: bool = Query(
+        False,
+        description="Incluir ocorrências de séries recorrentes (exige `date_from` e `date_to`)",
+    ),
 ):
     """
     Lista agendamentos da empresa com paginação e filtros.
 
     Ordenados por data de início (mais próximos primeiro).
+
+    Com `include_occurrences=true` (e o período completo), inclui as
+    ocorrências de séries recorrentes do período, expandidas sob demanda.
+    O `id` de uma ocorrência não materializada tem o formato
+    `{series_id}:{AAAAMMDDTHHMMSSZ}` e não é aceito nas rotas de
+    agendamento; use `/bookings/series/{series_id}/occurrences/{occurrence}`.
     """
+    if include_occurrences:
+        if not (date_from and date_to):
+            raise ValidationException(
+                "`include_occurrences` exige `date_from` e `date_to`"
+            )
+        return await booking_series_service.list_bookings_expanded(
+            empresa_id=empresa_id,
+            date_from=date_from,
+            date_to=date_to,
+            page=page,
+            limit=limit,
+            calendar_id=calendar_id,
+            status=status,
+            assigned_to=assigned_to,
+            lead_id=lead_id,
+        )
     return await booking_service.list_bookings(
         empresa_id=empresa_id,
         page=page,
@@ -119,19 +415,37 @@ async def create_booking(data: CreateBookingRequest, empresa_id: EmpresaId):
     """
     Cria um novo agendamento.
 
-    Campos obrigatórios: `calendar_id`, `booking_type_id`, `assigned_to`,
-    `created_by`, `start_datetime`, `end_datetime`.
+    Campos obrigatórios: `calendar_id`, `booking_type_id`, `created_by`,
+    `start_datetime`, `end_datetime`.
+
+    Sem `assigned_to`, o responsável é escolhido entre os membros da agenda
+    livres no horário (respeitando disponibilidade, buffers e antecedência),
+    por round-robin ponderado por `booking_weight` e carga do dia; nesse
+    caso `end_datetime` é recalculado pela duração do tipo de agendamento.
+
+    Retorna 409 se o horário estiver bloqueado na agenda ou se sobrepuser
+    a outro agendamento ativo do responsável, inclusive ocorrências de
+    séries recorrentes (ou se nenhum membro estiver livre, na atribuição
+    automática).
     """
-    return await booking_service.create_booking(
-        empresa_id, data.model_dump(exclude_none=True)
-    )
+    payload = data.model_dump(exclude_none=True)
+    if "assigned_to" not in payload:
+        return await booking_assignment_service.create_booking_auto_assigned(
+            empresa_id, payload
+        )
+    return await booking_service.create_booking(empresa_id, payload)
 
 
 @router.patch("/bookings/{booking_id}", response_model=BookingResponse)
 async def update_booking(
     booking_id: str, data: UpdateBookingRequest, empresa_id: EmpresaId
 ):
-    """Atualiza parcialmente um agendamento."""
+    """
+    Atualiza parcialmente um agendamento.
+
+    Retorna 409 se o novo horário/responsável conflitar com outro agendamento
+    ou com uma ocorrência de série recorrente.
+    """
     return await booking_service.update_booking(
         empresa_id, booking_id, data.model_dump(exclude_none=True)
     )
@@ -1,21 +1,38 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from app.core.dependencies import EmpresaId
 from app.models.chat import (
+    BroadcastRequest,
+    BulkCreateMessagesRequest,
+    BulkCreateMessagesResponse,
+    ConversationReadResponse,
     ConversationResponse,
     CreateConversationRequest,
     CreateMessageRequest,
+    GetOrCreateConversationRequest,
+    InboxConversationResponse,
+    MarkConversationReadRequest,
     MessageResponse,
     SendWhatsappMessageRequest,
     SendWhatsappMessageResponse,
     UpdateConversationRequest,
     WhatsappInstanceResponse,
+    WhatsappSendJobResponse,
+)
+from app.models.common import CursorPaginatedResponse, PaginatedResponse
+from app.services import (
+    chat_service,
+    chat_stream_service,
+    whatsapp_broadcast_service,
+    whatsapp_outbox_service,
+    whatsapp_send_service,
 )
-from app.models.common import PaginatedResponse
-from app.services import chat_service, whatsapp_send_service
 
 router = APIRouter()
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 # =====================================================
 # WhatsApp Instances (somente leitura)
@@ -33,6 +50,56 @@ async def list_instances(empresa_id: EmpresaId):
 # =====================================================
 
 
+@router.get(
+    "/chat/inbox",
+    response_model=CursorPaginatedResponse[InboxConversationResponse],
+)
+async def get_inbox(
+    empresa_id: EmpresaId,
+    limit: int = Query(20, ge=1, le=100, description="Itens por página"),
+    before: str | None = Query(
+        None, description="Cursor da próxima página (use `next_before`)"
+    ),
+    user_id: str | None = Query(
+        None,
+        description="Atendente para o cálculo de não lidas (default: atendente atribuído)",
+    ),
+    status: str | None = Query(None, description="Filtrar por status (active, closed, archived)"),
+    instance_id: str | None = Query(None, description="Filtrar por instância WhatsApp"),
+    assigned_user_id: str | None = Query(None, description="Filtrar por atendente (UUID)"),
+):
+    """
+    Caixa de entrada do chat em uma única chamada.
+
+    Cada conversa traz a prévia da última mensagem, `message_count` e
+    `unread_count` (mensagens recebidas após a última leitura do atendente,
+    limitado a 100). Ordenada pela atividade mais recente, paginada por cursor.
+    """
+    return await chat_service.get_inbox(
+        empresa_id=empresa_id,
+        limit=limit,
+        before=before,
+        user_id=user_id,
+        status=status,
+        instance_id=instance_id,
+        assigned_user_id=assigned_user_id,
+    )
+
+
+@router.get("/chat/inbox/stream", response_class=StreamingResponse)
+async def stream_inbox_messages(empresa_id: EmpresaId):
+    """
+    Stream (Server-Sent Events) das novas mensagens de todas as conversas
+    da empresa.
+
+    Cada mensagem chega como um evento `message` com o JSON da mensagem.
+    """
+    stream = await chat_stream_service.open_stream(empresa_id)
+    return StreamingResponse(
+        stream, media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
 @router.get(
     "/chat/conversations",
     response_model=PaginatedResponse[ConversationResponse],
@@ -84,13 +151,39 @@ async def create_conversation(
     """
     Cria uma nova conversa.
 
-    Pode ser vinculada a um lead e/ou instância WhatsApp.
+    Pode ser vinculada a um lead e/ou instância WhatsApp. Retorna 409 se já
+    existir conversa para o telefone na instância; para buscar ou criar em
+    uma chamada, use `PUT /chat/conversations/by-phone`.
     """
     return await chat_service.create_conversation(
         empresa_id, data.model_dump(exclude_none=True)
     )
 
 
+@router.put(
+    "/chat/conversations/by-phone",
+    response_model=ConversationResponse,
+    responses={201: {"description": "Conversa criada"}},
+)
+async def get_or_create_conversation_by_phone(
+    data: GetOrCreateConversationRequest,
+    response: Response,
+    empresa_id: EmpresaId,
+):
+    """
+    Retorna a conversa do telefone na instância ou a cria, em uma única chamada.
+
+    Responde `200` quando a conversa já existe e `201` quando é criada.
+    Chamadas concorrentes para o mesmo contato nunca geram duplicatas.
+    """
+    conversation, created = await chat_service.get_or_create_conversation_by_phone(
+        empresa_id, data.model_dump(exclude_none=True)
+    )
+    if created:
+        response.status_code = 201
+    return conversation
+
+
 @router.patch(
     "/chat/conversations/{conversation_id}",
     response_model=ConversationResponse,
@@ -115,6 +208,21 @@ async def close_conversation(conversation_id: str, empresa_id: EmpresaId):
     return await chat_service.close_conversation(empresa_id, conversation_id)
 
 
+@router.post(
+    "/chat/conversations/{conversation_id}/read",
+    response_model=ConversationReadResponse,
+)
+async def mark_conversation_read(
+    conversation_id: str,
+    data: MarkConversationReadRequest,
+    empresa_id: EmpresaId,
+):
+    """Marca a conversa como lida pelo atendente, zerando suas não lidas."""
+    return await chat_service.mark_conversation_read(
+        empresa_id, conversation_id, data.user_id, data.read_at
+    )
+
+
 @router.post(
     "/chat/conversations/{conversation_id}/send",
     response_model=SendWhatsappMessageResponse,
@@ -139,6 +247,67 @@ async def send_whatsapp_message(
     )
 
 
+@router.post(
+    "/chat/conversations/{conversation_id}/send-async",
+    response_model=WhatsappSendJobResponse,
+    status_code=202,
+)
+async def send_whatsapp_message_async(
+    conversation_id: str,
+    data: SendWhatsappMessageRequest,
+    empresa_id: EmpresaId,
+    idempotency_key: str | None = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=200,
+        description="Chave para evitar envios duplicados em retentativas do cliente",
+    ),
+):
+    """
+    Enfileira uma mensagem WhatsApp para envio em background.
+
+    Responde `202` com o `id` do envio sem esperar o gateway. A entrega é
+    feita por workers com retentativas (backoff exponencial); acompanhe em
+    `GET /chat/sends/{send_id}`. Repetir a chamada com o mesmo
+    `Idempotency-Key` devolve o envio já registrado.
+    """
+    return await whatsapp_outbox_service.enqueue_message(
+        empresa_id,
+        conversation_id,
+        data.model_dump(exclude_none=True, mode="json"),
+        idempotency_key,
+    )
+
+
+@router.post("/chat/broadcast", response_class=StreamingResponse)
+async def broadcast_whatsapp_message(
+    data: BroadcastRequest, empresa_id: EmpresaId
+):
+    """
+    Envia a mesma mensagem WhatsApp para várias conversas (campanha).
+
+    Os alvos vêm de `conversation_ids` ou de `filter`. Os envios respeitam
+    um limite de vazão por instância WhatsApp. A resposta é um stream NDJSON:
+    uma linha `{"type": "result", ...}` por conversa, à medida que os envios
+    terminam, e uma linha final `{"type": "summary", ...}`.
+    """
+    stream = await whatsapp_broadcast_service.start_broadcast(
+        empresa_id,
+        data.message.model_dump(exclude_none=True, mode="json"),
+        conversation_ids=data.conversation_ids,
+        filters=data.filter.model_dump(exclude_none=True) if data.filter else None,
+    )
+    return StreamingResponse(
+        stream, media_type="application/x-ndjson", headers=SSE_HEADERS
+    )
+
+
+@router.get("/chat/sends/{send_id}", response_model=WhatsappSendJobResponse)
+async def get_send_status(send_id: str, empresa_id: EmpresaId):
+    """Consulta o estado de entrega de um envio assíncrono."""
+    return await whatsapp_outbox_service.get_send(empresa_id, send_id)
+
+
 # =====================================================
 # Messages
 # =====================================================
@@ -164,6 +333,55 @@ async def list_messages(
     )
 
 
+@router.get(
+    "/chat/conversations/{conversation_id}/messages/cursor",
+    response_model=CursorPaginatedResponse[MessageResponse],
+)
+async def list_messages_cursor(
+    conversation_id: str,
+    empresa_id: EmpresaId,
+    limit: int = Query(50, ge=1, le=100, description="Mensagens por página"),
+    before: str | None = Query(
+        None, description="Cursor: mensagens anteriores (use `next_before`)"
+    ),
+    after: str | None = Query(
+        None, description="Cursor: mensagens posteriores (use `next_after`)"
+    ),
+):
+    """
+    Lista mensagens de uma conversa por cursor, mais recentes primeiro.
+
+    Sem cursor, retorna as mensagens mais recentes. Use `next_before` para
+    carregar mensagens antigas e `next_after` para buscar novas mensagens.
+    Uma página vazia devolve o cursor enviado no campo da mesma direção
+    (`next_after` para `after`) e `null` no outro.
+    Tempo constante mesmo em conversas longas (sem offset nem contagem total).
+    """
+    return await chat_service.list_messages_cursor(
+        empresa_id, conversation_id, limit, before, after
+    )
+
+
+@router.get(
+    "/chat/conversations/{conversation_id}/stream",
+    response_class=StreamingResponse,
+)
+async def stream_conversation_messages(
+    conversation_id: str, empresa_id: EmpresaId
+):
+    """
+    Stream (Server-Sent Events) das novas mensagens de uma conversa.
+
+    Cada mensagem chega como um evento `message` com o JSON da mensagem.
+    Substitui o polling de `GET /chat/conversations/{id}/messages`.
+    """
+    await chat_service.get_conversation(empresa_id, conversation_id)
+    stream = await chat_stream_service.open_stream(empresa_id, conversation_id)
+    return StreamingResponse(
+        stream, media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
 @router.post(
     "/chat/conversations/{conversation_id}/messages",
     response_model=MessageResponse,
@@ -183,3 +401,19 @@ async def create_message(
     return await chat_service.create_message(
         empresa_id, conversation_id, data.model_dump(exclude_none=True)
     )
+
+
+@router.post("/chat/messages/bulk", response_model=BulkCreateMessagesResponse)
+async def create_messages_bulk(
+    data: BulkCreateMessagesRequest, empresa_id: EmpresaId
+):
+    """
+    Registra um lote de mensagens de várias conversas (até 5000 por chamada).
+
+    Pensado para backfill do gateway ao reconectar uma instância. Mensagens
+    com `external_id` já registrado são ignoradas (`duplicates`); mensagens
+    de conversas inexistentes são listadas em `rejected`.
+    """
+    return await chat_service.create_messages_bulk(
+        empresa_id, [m.model_dump(exclude_none=True) for m in data.messages]
+    )
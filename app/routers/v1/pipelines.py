@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Query
 
 from app.core.dependencies import EmpresaId
-from app.models.pipeline import PipelineResponse, StageResponse
+from app.models.pipeline import (
+    PipelineAnalyticsResponse,
+    PipelineResponse,
+    StageResponse,
+)
 from app.services import pipeline_service
 
 router = APIRouter()
@@ -34,3 +38,26 @@ async def get_pipeline(pipeline_id: str, empresa_id: EmpresaId):
 async def list_stages(pipeline_id: str, empresa_id: EmpresaId):
     """Lista todos os stages de um pipeline, ordenados por posição."""
     return await pipeline_service.list_stages(empresa_id, pipeline_id)
+
+
+@router.get(
+    "/pipelines/{pipeline_id}/analytics",
+    response_model=PipelineAnalyticsResponse,
+)
+async def get_pipeline_analytics(
+    pipeline_id: str,
+    empresa_id: EmpresaId,
+    date_from: str | None = Query(None, description="Entradas a partir de (ISO)"),
+    date_to: str | None = Query(None, description="Entradas até (ISO)"),
+):
+    """
+    Métricas de funil por stage, calculadas a partir do histórico dos leads.
+
+    - `entries`: entradas no stage dentro do período.
+    - `advanced` / `conversion_rate`: entradas que avançaram para um stage posterior.
+    - `dwell_median_seconds` / `dwell_p90_seconds`: tempo de permanência no stage
+      (apenas entradas que já saíram dele).
+    """
+    return await pipeline_service.get_pipeline_analytics(
+        empresa_id, pipeline_id, date_from, date_to
+    )
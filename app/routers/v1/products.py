@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Query
+from typing import Literal
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from app.core.dependencies import EmpresaId
 from app.models.common import PaginatedResponse, SuccessResponse
 from app.models.product import (
     AdjustStockRequest,
+    BulkUpsertProductsRequest,
+    BulkUpsertProductsResponse,
     CreateCategoryRequest,
     CreateProductImageRequest,
     CreateProductRequest,
+    CreateReservationRequest,
     MarkSoldRequest,
+    ProductFacetsResponse,
     ProductCategoryResponse,
     ProductImageResponse,
+    ProductReservationResponse,
     ProductResponse,
     ProductStatus,
     ProductType,
@@ -21,7 +29,9 @@ from app.models.product import (
 )
 from app.services import (
     product_category_service,
+    product_feed_service,
     product_image_service,
+    product_reservation_service,
     product_service,
 )
 
@@ -87,6 +97,106 @@ async def list_products(
     )
 
 
+@router.get("/products/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    empresa_id: EmpresaId,
+    search: str | None = Query(
+        None, description="Busca textual em nome, descrição, SKU e marca"
+    ),
+    categoria_id: str | None = Query(None, description="Filtrar por categoria"),
+    tipo: ProductType | None = Query(
+        None, description="Filtrar por tipo: produto ou servico"
+    ),
+    status: list[ProductStatus] | None = Query(
+        None, description="Filtrar por status (pode repetir)"
+    ),
+    marca: list[str] | None = Query(
+        None, description="Filtrar por marca (pode repetir)"
+    ),
+    preco_min: float | None = Query(None, ge=0, description="Preço mínimo"),
+    preco_max: float | None = Query(None, ge=0, description="Preço máximo"),
+    only_promotion: bool = Query(
+        False, description="Considerar apenas itens com preço promocional"
+    ),
+    status_produto: StatusProduto | None = Query(
+        None,
+        description=(
+            "Disponibilidade — `ativo` (em estoque, default), `vendido`, ou `todos`"
+        ),
+    ),
+    buckets: int = Query(
+        10, ge=1, le=50, description="Número de faixas do histograma de preço"
+    ),
+):
+    """
+    Facetas para a barra de filtros do catálogo, numa única consulta.
+
+    Aceita os mesmos filtros de `GET /products` e retorna contagens por
+    categoria, marca, tipo e status, a faixa de `preco`/`preco_promocional`
+    e um histograma do preço efetivo (promocional, quando houver).
+    """
+    return await product_service.get_product_facets(
+        empresa_id,
+        search=search,
+        categoria_id=categoria_id,
+        tipo=tipo,
+        status=list(status) if status else None,
+        marca=list(marca) if marca else None,
+        preco_min=preco_min,
+        preco_max=preco_max,
+        only_promotion=only_promotion,
+        status_produto=status_produto,
+        buckets=buckets,
+    )
+
+
+@router.get("/products/feed.{feed_format}", response_class=StreamingResponse)
+async def product_feed(
+    feed_format: Literal["csv", "xml", "ndjson"],
+    empresa_id: EmpresaId,
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+):
+    """
+    Exporta o catálogo ativo para marketplaces (Google Merchant, Meta).
+
+    Formatos: `csv`, `xml` (RSS 2.0 com campos `g:`) e `ndjson`, com os
+    campos `id`, `sku`, `title`, `description`, `brand`, `product_type`,
+    `price`, `sale_price`, `availability`, `quantity`, `image_link` e
+    `additional_image_link`. O corpo é gerado em streaming; suporta
+    `If-None-Match`/`If-Modified-Since` (304 quando nada mudou).
+    """
+    feed = await product_feed_service.build_feed(
+        empresa_id,
+        feed_format,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+    )
+    if feed["stream"] is None:
+        return Response(status_code=304, headers=feed["headers"])
+    return StreamingResponse(
+        feed["stream"], media_type=feed["media_type"], headers=feed["headers"]
+    )
+
+
+@router.post("/products/bulk-upsert", response_model=BulkUpsertProductsResponse)
+async def bulk_upsert_products(
+    data: BulkUpsertProductsRequest, empresa_id: EmpresaId
+):
+    """
+    Sincroniza preço e estoque de até 5000 itens por chamada, pelo `sku`.
+
+    Só os itens com valores diferentes dos atuais são gravados, e apenas nos
+    campos enviados. SKUs inexistentes retornam `not_found`, ou são criados
+    com `create_missing=true` (exige `nome`). `results` traz o status de cada SKU.
+    """
+    return await product_service.bulk_upsert_products(
+        empresa_id,
+        [item.model_dump(exclude_unset=True) for item in data.items],
+        create_missing=data.create_missing,
+    )
+
+
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(product_id: str, empresa_id: EmpresaId):
     """Busca um produto/serviço por ID, incluindo categoria e imagens."""
@@ -105,7 +215,13 @@ async def create_product(data: CreateProductRequest, empresa_id: EmpresaId):
 async def update_product(
     product_id: str, data: UpdateProductRequest, empresa_id: EmpresaId
 ):
-    """Atualiza parcialmente um produto/serviço."""
+    """
+    Atualiza parcialmente um produto/serviço.
+
+    `quantidade_estoque` segue as regras de `/adjust-stock`: não pode ficar
+    abaixo do estoque reservado (409) e atualiza o status (`vendido` ao
+    zerar, `ativo` ao reabastecer), salvo `status` enviado junto.
+    """
     return await product_service.update_product(
         empresa_id, product_id, data.model_dump(exclude_unset=True)
     )
@@ -132,7 +248,8 @@ async def mark_product_as_sold(
 
     - **Serviço**: muda status para `vendido` (estoque ignorado).
     - **Produto**: decrementa o estoque pela `quantidade_vendida`. Se chegar a 0,
-      o status vira `vendido`; caso contrário, permanece `ativo`.
+      o status vira `vendido`; caso contrário, permanece `ativo`. Quantidade
+      maior que o estoque retorna 409.
     """
     return await product_service.mark_product_as_sold(
         empresa_id, product_id, data.quantidade_vendida
@@ -157,6 +274,10 @@ async def adjust_stock(
     Forneça apenas um dos campos:
     - `delta`: incrementa (positivo) ou decrementa (negativo) o estoque atual.
     - `quantidade_estoque`: define o estoque para um valor absoluto.
+
+    Deixar o estoque abaixo da quantidade reservada em reservas ativas (ou
+    negativo) retorna 409. Produto que zera vira `vendido`; produto
+    `vendido` reabastecido volta a `ativo`.
     """
     return await product_service.adjust_stock(
         empresa_id,
@@ -166,6 +287,75 @@ async def adjust_stock(
     )
 
 
+# =====================================================
+# Reservas de estoque (checkout)
+# =====================================================
+
+
+@router.post(
+    "/products/{product_id}/reservations",
+    response_model=ProductReservationResponse,
+    status_code=201,
+)
+async def create_reservation(
+    product_id: str, data: CreateReservationRequest, empresa_id: EmpresaId
+):
+    """
+    Reserva estoque de um produto durante o checkout.
+
+    A quantidade sai do estoque disponível (`quantidade_disponivel`) até a
+    reserva ser confirmada (`/commit`, vira venda), liberada (`/release`) ou
+    expirar após `ttl_seconds`. Retorna 409 se não houver estoque disponível.
+    """
+    return await product_reservation_service.create_reservation(
+        empresa_id,
+        product_id,
+        quantidade=data.quantidade,
+        ttl_seconds=data.ttl_seconds,
+        reference=data.reference,
+    )
+
+
+@router.get(
+    "/products/{product_id}/reservations/{reservation_id}",
+    response_model=ProductReservationResponse,
+)
+async def get_reservation(product_id: str, reservation_id: str, empresa_id: EmpresaId):
+    """Busca uma reserva de estoque."""
+    return await product_reservation_service.get_reservation(
+        empresa_id, product_id, reservation_id
+    )
+
+
+@router.post(
+    "/products/{product_id}/reservations/{reservation_id}/commit",
+    response_model=ProductReservationResponse,
+)
+async def commit_reservation(
+    product_id: str, reservation_id: str, empresa_id: EmpresaId
+):
+    """
+    Confirma a reserva como venda: baixa o estoque reservado (status
+    `vendido` se zerar). Reservas expiradas ou liberadas retornam 409.
+    """
+    return await product_reservation_service.commit_reservation(
+        empresa_id, product_id, reservation_id
+    )
+
+
+@router.post(
+    "/products/{product_id}/reservations/{reservation_id}/release",
+    response_model=ProductReservationResponse,
+)
+async def release_reservation(
+    product_id: str, reservation_id: str, empresa_id: EmpresaId
+):
+    """Libera a reserva, devolvendo a quantidade ao estoque disponível."""
+    return await product_reservation_service.release_reservation(
+        empresa_id, product_id, reservation_id
+    )
+
+
 # =====================================================
 # Imagens
 # =====================================================
@@ -214,8 +404,11 @@ async def delete_product_image(
 async def reorder_product_images(
     product_id: str, data: ReorderImagesRequest, empresa_id: EmpresaId
 ):
-    """Reordena as imagens de um produto pela ordem dos IDs informados."""
-    await product_service.get_product(empresa_id, product_id)
+    """
+    Reordena as imagens de um produto pela ordem dos IDs informados.
+
+    As imagens não informadas são posicionadas depois, na ordem atual.
+    """
     return await product_image_service.reorder_product_images(
         empresa_id, product_id, data.image_ids
     )
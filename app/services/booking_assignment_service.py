@@ -0,0 +1,123 @@
+"""Atribuição automática de responsável para novos agendamentos.
+
+Entre os membros livres no horário (calculados pelo mesmo motor de slots,
+com as mesmas três consultas), escolhe o de menor carga do dia relativa ao
+peso (`booking_weight`) e, entre os empatados, por round-robin ponderado
+suave. O estado do rodízio fica em memória, por agenda e por processo.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.core.exceptions import ConflictException, ValidationException
+from app.services import booking_service, booking_slot_service
+
+
+class WeightedRoundRobin:
+    """Menor carga relativa primeiro; round-robin ponderado suave no empate.
+
+    Candidatos são os membros com a menor razão carga do dia / peso: quem
+    está mais ocupado (em proporção ao peso) só recebe depois que os outros
+    o alcançam. Entre eles, rodízio ponderado suave (estilo nginx): cada um
+    soma o próprio peso ao contador, o maior vence e desconta a soma dos
+    pesos dos candidatos. Ao longo do dia, cada membro recebe uma fração
+    proporcional ao peso, sem rajadas para o mesmo membro.
+    """
+
+    def __init__(self) -> None:
+        self._current: dict[str, dict[str, int]] = {}
+
+    def pick(
+        self,
+        calendar_id: str,
+        weights: dict[str, int],
+        loads: dict[str, int],
+    ) -> str:
+        relative = {o: loads.get(o, 0) / weight for o, weight in weights.items()}
+        lowest = min(relative.values())
+        candidates = [o for o in weights if relative[o] == lowest]
+
+        current = self._current.setdefault(calendar_id, {})
+        for owner_id in candidates:
+            current[owner_id] = current.get(owner_id, 0) + weights[owner_id]
+
+        chosen = max(candidates, key=lambda o: current[o])
+        current[chosen] -= sum(weights[o] for o in candidates)
+        return chosen
+
+
+_round_robin = WeightedRoundRobin()
+
+
+def _daily_loads(bookings: list[dict], tz: ZoneInfo, day: date) -> dict[str, int]:
+    loads: dict[str, int] = {}
+    for booking in bookings:
+        start = datetime.fromisoformat(booking["start_datetime"]).astimezone(tz)
+        if start.date() == day and booking.get("assigned_to"):
+            loads[booking["assigned_to"]] = loads.get(booking["assigned_to"], 0) + 1
+    return loads
+
+
+async def create_booking_auto_assigned(empresa_id: str, data: dict) -> dict:
+    """Cria o agendamento atribuindo um responsável livre automaticamente.
+
+    `end_datetime` é recalculado pela duração do tipo de agendamento, a
+    mesma usada na verificação de disponibilidade. Retorna 409 se nenhum
+    membro puder receber o agendamento no horário.
+    Se outro request ocupar o escolhido nesse meio tempo (conflito na
+    constraint de exclusão), tenta o próximo do rodízio.
+    """
+    calendar = await booking_service.get_calendar(empresa_id, data["calendar_id"])
+    tz = booking_slot_service.calendar_timezone(calendar.get("timezone"))
+
+    try:
+        start = datetime.fromisoformat(data["start_datetime"])
+    except ValueError as exc:
+        raise ValidationException("Data/hora inválida (use ISO 8601)") from exc
+    if start.tzinfo is None:
+        # Mesmo tratamento do banco para timestamps sem fuso
+        start = start.replace(tzinfo=timezone.utc)
+
+    context = booking_slot_service.load_context(
+        empresa_id,
+        calendar,
+        data["booking_type_id"],
+        start - timedelta(days=1),
+        start + timedelta(days=1),
+    )
+    duration = timedelta(minutes=context["booking_type"]["duration_minutes"])
+    # O horário validado é o do tipo: o fim enviado pelo cliente não vale
+    data = {
+        **data,
+        "start_datetime": start.isoformat(),
+        "end_datetime": (start + duration).isoformat(),
+    }
+
+    slots = booking_slot_service.compute_slots(
+        **context,
+        range_start=start,
+        range_end=start + duration,
+        now=datetime.now(timezone.utc),
+        exact_start=True,
+    )
+
+    weights = {
+        owner["user_id"]: owner.get("booking_weight") or 1
+        for owner in calendar.get("booking_calendar_owners") or []
+        if slots and owner["user_id"] in slots[0]["owner_ids"]
+        and (owner.get("booking_weight") is None or owner["booking_weight"] > 0)
+    }
+    loads = _daily_loads(context["bookings"], tz, start.astimezone(tz).date())
+
+    while weights:
+        owner_id = _round_robin.pick(calendar["id"], weights, loads)
+        try:
+            return await booking_service.create_booking(
+                empresa_id, {**data, "assigned_to": owner_id}
+            )
+        except ConflictException:
+            weights.pop(owner_id)
+
+    raise ConflictException("Nenhum responsável disponível neste horário")
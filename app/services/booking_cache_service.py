@@ -0,0 +1,160 @@
+"""Cache em memória da configuração das agendas (por processo).
+
+Guarda o resultado de `booking_service.get_calendar` (agenda com
+disponibilidade, tipos e membros), chaveado pelo id da agenda e validado
+pela empresa dona. Uma assinatura Supabase Realtime nas quatro tabelas de
+configuração invalida a agenda alterada na hora; o TTL limita a
+desatualização se a assinatura cair.
+
+A assinatura é feita por uma task em background (`start_listener`, no
+startup), nunca no caminho da requisição: enquanto ela não estiver ativa,
+as leituras vão direto ao banco, sem cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+
+from app.core.config import get_settings
+from app.utils.realtime import RealtimeChannel
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_TOPIC = "api-booking-config"
+CONFIG_TABLES = (
+    "booking_calendars",
+    "booking_availability",
+    "booking_types",
+    "booking_calendar_owners",
+)
+# Espera antes de tentar assinar o Realtime de novo após uma falha
+SUBSCRIBE_RETRY_SECONDS = 60.0
+
+
+class _CalendarCache:
+    """LRU com TTL de configurações de agenda, invalidado via Realtime."""
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+        self._realtime = RealtimeChannel(
+            CHANNEL_TOPIC,
+            (("*", table) for table in CONFIG_TABLES),
+            self._on_change,
+        )
+
+    @property
+    def listening(self) -> bool:
+        return self._realtime.subscribed
+
+    def get(self, empresa_id: str, calendar_id: str) -> dict | None:
+        if not self.listening:
+            return None
+        entry = self._entries.get(calendar_id)
+        if entry is None:
+            return None
+        expires_at, owner_empresa_id, calendar = entry
+        if expires_at < time.monotonic():
+            del self._entries[calendar_id]
+            return None
+        if owner_empresa_id != empresa_id:
+            # Agenda de outra empresa: a consulta ao banco devolve o 404
+            return None
+        self._entries.move_to_end(calendar_id)
+        return copy.deepcopy(calendar)
+
+    def put(self, empresa_id: str, calendar: dict) -> None:
+        if not self.listening:
+            # Sem invalidação em tempo real, não guarda nada
+            return
+        settings = get_settings()
+        expires_at = time.monotonic() + settings.CALENDAR_CACHE_TTL_SECONDS
+        self._entries[calendar["id"]] = (expires_at, empresa_id, copy.deepcopy(calendar))
+        self._entries.move_to_end(calendar["id"])
+        while len(self._entries) > settings.CALENDAR_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, calendar_id: str | None = None) -> None:
+        if calendar_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(calendar_id, None)
+
+    def _on_change(self, payload: dict) -> None:
+        data = payload.get("data") or {}
+        record = data.get("record") or data.get("old_record") or {}
+        if data.get("table") == "booking_calendars":
+            calendar_id = record.get("id")
+        else:
+            calendar_id = record.get("calendar_id")
+        # Sem o id (ex.: DELETE sem REPLICA IDENTITY FULL): invalida tudo
+        self.invalidate(calendar_id)
+
+    async def listen(self) -> None:
+        """Assina as mudanças de configuração (uma vez por processo)."""
+        if self._realtime.subscribed:
+            return
+        try:
+            subscribed = await self._realtime.subscribe()
+        except Exception:
+            # Segue sem cache até a próxima tentativa
+            logger.exception("Falha ao assinar o Realtime de configuração das agendas")
+            return
+        if subscribed:
+            # Mudanças anteriores à assinatura não foram vistas
+            self.invalidate()
+
+    async def close(self) -> None:
+        await self._realtime.close()
+
+
+_cache = _CalendarCache()
+_listener: asyncio.Task | None = None
+_stop = asyncio.Event()
+
+
+def get(empresa_id: str, calendar_id: str) -> dict | None:
+    """Configuração em cache da agenda, ou `None` se ausente/expirada.
+
+    Sempre `None` enquanto a assinatura Realtime não estiver ativa.
+    """
+    return _cache.get(empresa_id, calendar_id)
+
+
+def put(empresa_id: str, calendar: dict) -> None:
+    _cache.put(empresa_id, calendar)
+
+
+def invalidate(calendar_id: str | None = None) -> None:
+    """Remove uma agenda do cache (ou todas, sem `calendar_id`)."""
+    _cache.invalidate(calendar_id)
+
+
+async def _listen() -> None:
+    while not _stop.is_set():
+        await _cache.listen()
+        try:
+            await asyncio.wait_for(_stop.wait(), timeout=SUBSCRIBE_RETRY_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_listener() -> None:
+    """Sobe a task que assina o Realtime de configuração (startup da aplicação)."""
+    global _listener
+    _stop.clear()
+    _listener = asyncio.create_task(_listen())
+
+
+async def stop_listener() -> None:
+    """Para a task e encerra a assinatura Realtime (shutdown da aplicação)."""
+    global _listener
+    _stop.set()
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
+    await _cache.close()
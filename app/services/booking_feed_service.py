@@ -0,0 +1,273 @@
+"""Feeds iCalendar (ICS) de agendamentos, por agenda ou por responsável.
+
+Clientes de calendário (Google, Outlook) consultam o feed periodicamente.
+Antes de gerar o corpo, uma única consulta (`max(updated_at)` + contagem na
+janela) produz o ETag/Last-Modified; se nada mudou, a resposta é 304.
+Caso contrário, os agendamentos são lidos por keyset em
+`(start_datetime, id)` e emitidos em streaming, página a página, seguidos
+das ocorrências (não materializadas) das séries recorrentes na janela.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.services import booking_series_service, booking_service
+from app.utils.conditional_get import is_not_modified
+from app.utils.supabase_client import get_supabase
+
+FEED_SELECT = (
+    "id, calendar_id, assigned_to, client_name, client_phone, client_email, "
+    "start_datetime, end_datetime, status, notes, created_at, updated_at, "
+    "booking_types(name)"
+)
+
+FEED_PAGE_SIZE = 500
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 365
+REFRESH_INTERVAL = "PT15M"
+
+ICS_STATUS = {
+    "confirmed": "CONFIRMED",
+    "pending": "TENTATIVE",
+    "cancelled": "CANCELLED",
+}
+
+
+# =====================================================
+# Formatação ICS (RFC 5545)
+# =====================================================
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Quebra a linha em até 75 octetos, sem partir caracteres UTF-8."""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+
+    parts: list[str] = []
+    current, size, limit = "", 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append(current)
+            # Linhas de continuação começam com um espaço
+            current, size, limit = "", 0, 74
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_datetime(value: str) -> str:
+    return (
+        datetime.fromisoformat(value)
+        .astimezone(timezone.utc)
+        .strftime("%Y%m%dT%H%M%SZ")
+    )
+
+
+def _vevent(booking: dict) -> str:
+    type_name = (booking.get("booking_types") or {}).get("name")
+    summary = " — ".join(
+        part for part in (type_name, booking.get("client_name")) if part
+    ) or "Agendamento"
+
+    description = [
+        f"{label}: {booking[key]}"
+        for label, key in (
+            ("Cliente", "client_name"),
+            ("Telefone", "client_phone"),
+            ("Email", "client_email"),
+        )
+        if booking.get(key)
+    ]
+    if booking.get("notes"):
+        description.append(booking["notes"])
+
+    updated = _ics_datetime(booking.get("updated_at") or booking["created_at"])
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{booking['id']}@aucta-crm",
+        f"DTSTAMP:{updated}",
+        f"LAST-MODIFIED:{updated}",
+        f"DTSTART:{_ics_datetime(booking['start_datetime'])}",
+        f"DTEND:{_ics_datetime(booking['end_datetime'])}",
+        f"SUMMARY:{_escape(summary)}",
+        f"STATUS:{ICS_STATUS.get(booking.get('status') or '', 'CONFIRMED')}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(chr(10).join(description))}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def _vcalendar_header(name: str, timezone_name: str | None) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Aucta CRM//API//PT-BR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}",
+        f"X-PUBLISHED-TTL:{REFRESH_INTERVAL}",
+    ]
+    if timezone_name:
+        lines.append(f"X-WR-TIMEZONE:{timezone_name}")
+    return "".join(_fold(line) for line in lines)
+
+
+# =====================================================
+# Consulta e validadores HTTP
+# =====================================================
+
+
+def _window() -> tuple[datetime, datetime]:
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=FEED_PAST_DAYS), today + timedelta(days=FEED_FUTURE_DAYS)
+
+
+def _base_query(select: str, scope: dict, window: tuple[datetime, datetime], **kwargs):
+    query = (
+        get_supabase()
+        .table("bookings")
+        .select(select, **kwargs)
+        .gte("start_datetime", window[0].isoformat())
+        .lt("start_datetime", window[1].isoformat())
+    )
+    for column, value in scope.items():
+        query = query.eq(column, value)
+    return query
+
+
+def _validators(
+    scope: dict, window: tuple[datetime, datetime], name: str
+) -> tuple[str, datetime | None]:
+    """ETag e Last-Modified do feed: uma consulta em `bookings` e outra nas
+    séries que cruzam a janela.
+
+    As contagens entram no ETag para que exclusões (que não alteram o
+    `max(updated_at)`) também invalidem o feed.
+    """
+    result = (
+        _base_query("updated_at", scope, window, count="exact")
+        .order("updated_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    series_query = (
+        get_supabase()
+        .table("booking_series")
+        .select("updated_at", count="exact")
+        .lt("dtstart", window[1].isoformat())
+        .gt("ends_at", window[0].isoformat())
+    )
+    for column, value in scope.items():
+        series_query = series_query.eq(column, value)
+    series = series_query.order("updated_at", desc=True).limit(1).execute()
+
+    latest = [
+        datetime.fromisoformat(rows.data[0]["updated_at"]).astimezone(timezone.utc)
+        for rows in (result, series)
+        if rows.data
+    ]
+
+    raw = "|".join([
+        *(f"{key}={value}" for key, value in sorted(scope.items())),
+        window[0].date().isoformat(),
+        name,
+        *(value.isoformat() for value in latest),
+        str(result.count or 0),
+        str(series.count or 0),
+    ])
+    etag = f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+    return etag, max(latest) if latest else None
+
+
+async def _feed_stream(
+    scope: dict, window: tuple[datetime, datetime], header: str
+) -> AsyncIterator[str]:
+    yield header
+
+    cursor: tuple[str, str] | None = None
+    while True:
+        query = _base_query(FEED_SELECT, scope, window)
+        if cursor:
+            start, booking_id = cursor
+            query = query.or_(
+                f'start_datetime.gt."{start}",'
+                f'and(start_datetime.eq."{start}",id.gt.{booking_id})'
+            )
+        rows = (
+            query.order("start_datetime").order("id").limit(FEED_PAGE_SIZE).execute().data
+            or []
+        )
+
+        for booking in rows:
+            yield _vevent(booking)
+
+        if len(rows) < FEED_PAGE_SIZE:
+            break
+        cursor = (rows[-1]["start_datetime"], rows[-1]["id"])
+
+    filters = {key: value for key, value in scope.items() if key != "empresa_id"}
+    for occurrence in booking_series_service.virtual_bookings(
+        scope["empresa_id"], window[0], window[1], filters
+    ):
+        if datetime.fromisoformat(occurrence["start_datetime"]) >= window[0]:
+            yield _vevent(occurrence)
+
+    yield "END:VCALENDAR\r\n"
+
+
+async def build_feed(
+    empresa_id: str,
+    *,
+    calendar_id: str | None = None,
+    assigned_to: str | None = None,
+    if_none_match: str | None = None,
+    if_modified_since: str | None = None,
+) -> dict:
+    """Prepara o feed ICS da agenda (ou do responsável).
+
+    Retorna `headers` (ETag, Last-Modified) e `stream`; `stream` é `None`
+    quando o cliente já tem a versão atual (responder 304).
+    """
+    scope = {"empresa_id": empresa_id}
+    timezone_name = None
+    if calendar_id:
+        calendar = await booking_service.get_calendar(empresa_id, calendar_id)
+        scope["calendar_id"] = calendar_id
+        name = calendar["name"]
+        timezone_name = calendar.get("timezone")
+    else:
+        scope["assigned_to"] = assigned_to
+        name = "Agendamentos"
+
+    window = _window()
+    etag, last_modified = _validators(scope, window, name)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return {"headers": headers, "stream": None}
+
+    return {
+        "headers": headers,
+        "stream": _feed_stream(scope, window, _vcalendar_header(name, timezone_name)),
+    }
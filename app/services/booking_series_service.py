@@ -0,0 +1,677 @@
+"""Séries de agendamentos recorrentes (RRULE).
+
+Uma série guarda a regra de recorrência (subconjunto da RFC 5545:
+`FREQ=DAILY|WEEKLY`, `INTERVAL`, `BYDAY`, `COUNT`, `UNTIL`) e o horário de
+parede no fuso da agenda; o armazenamento é O(séries), não O(ocorrências).
+As ocorrências são expandidas sob demanda dentro da janela consultada
+(listagem de agendamentos e cálculo de slots).
+
+Alterar ou cancelar uma ocorrência a materializa em `bookings` (com
+`series_id` e `series_occurrence_start`); a linha materializada prevalece
+sobre a expansão.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.core.exceptions import (
+    ConflictException,
+    NotFoundException,
+    ValidationException,
+)
+from app.services import booking_service
+from app.utils.pagination import build_paginated_response
+from app.utils.supabase_client import get_supabase
+
+SERIES_SELECT = (
+    "id, empresa_id, calendar_id, booking_type_id, assigned_to, created_by, "
+    "lead_id, client_name, client_phone, client_email, dtstart, "
+    "duration_minutes, timezone, rrule, ends_at, status, notes, "
+    "created_at, updated_at, "
+    "booking_types(" + booking_service.BOOKING_TYPE_SELECT + ")"
+)
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+SUPPORTED_PARTS = {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL", "WKST"}
+MAX_COUNT = 1000
+
+# Identificador compacto (UTC) de uma ocorrência, usado em ids e rotas
+OCCURRENCE_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# Conflitos verificados na criação da série (a partir do início)
+CONFLICT_HORIZON_DAYS = 92
+LOOKUP_CHUNK = 200
+
+
+# =====================================================
+# RRULE
+# =====================================================
+
+
+def parse_rrule(rule: str) -> dict:
+    """Valida e decompõe a regra (subconjunto suportado da RFC 5545)."""
+    text = rule.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+
+    parts: dict[str, str] = {}
+    for item in filter(None, text.split(";")):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValidationException(f"RRULE inválida: '{item}'")
+        parts[key.strip().upper()] = value.strip().upper()
+
+    unsupported = set(parts) - SUPPORTED_PARTS
+    if unsupported:
+        raise ValidationException(
+            f"RRULE: parâmetros não suportados: {', '.join(sorted(unsupported))}"
+        )
+
+    freq = parts.get("FREQ")
+    if freq not in ("DAILY", "WEEKLY"):
+        raise ValidationException("RRULE: FREQ deve ser DAILY ou WEEKLY")
+    if parts.get("WKST", "MO") != "MO":
+        raise ValidationException("RRULE: apenas WKST=MO é suportado")
+    if "COUNT" in parts and "UNTIL" in parts:
+        raise ValidationException("RRULE: COUNT e UNTIL são mutuamente exclusivos")
+
+    try:
+        interval = int(parts.get("INTERVAL", "1"))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+    except ValueError as exc:
+        raise ValidationException("RRULE: INTERVAL e COUNT devem ser inteiros") from exc
+    if interval < 1:
+        raise ValidationException("RRULE: INTERVAL deve ser >= 1")
+    if count is not None and not 1 <= count <= MAX_COUNT:
+        raise ValidationException(f"RRULE: COUNT deve estar entre 1 e {MAX_COUNT}")
+
+    byday = None
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValidationException("RRULE: BYDAY só é suportado com FREQ=WEEKLY")
+        try:
+            byday = sorted({WEEKDAYS[day] for day in parts["BYDAY"].split(",")})
+        except KeyError as exc:
+            raise ValidationException(
+                "RRULE: BYDAY inválido (use MO,TU,WE,TH,FR,SA,SU)"
+            ) from exc
+
+    until = until_date = None
+    if "UNTIL" in parts:
+        value = parts["UNTIL"]
+        try:
+            if len(value) == 8:
+                until_date = datetime.strptime(value, "%Y%m%d").date()
+            else:
+                until = datetime.strptime(value, OCCURRENCE_FORMAT).replace(
+                    tzinfo=timezone.utc
+                )
+        except ValueError as exc:
+            raise ValidationException(
+                "RRULE: UNTIL deve ser AAAAMMDD ou AAAAMMDDTHHMMSSZ"
+            ) from exc
+
+    return {
+        "freq": freq,
+        "interval": interval,
+        "byday": byday,
+        "count": count,
+        "until": until,
+        "until_date": until_date,
+    }
+
+
+def _normalize_rrule(rule: dict) -> str:
+    parts = [f"FREQ={rule['freq']}"]
+    if rule["interval"] != 1:
+        parts.append(f"INTERVAL={rule['interval']}")
+    if rule["byday"]:
+        names = {number: name for name, number in WEEKDAYS.items()}
+        parts.append("BYDAY=" + ",".join(names[day] for day in rule["byday"]))
+    if rule["count"] is not None:
+        parts.append(f"COUNT={rule['count']}")
+    if rule["until"]:
+        parts.append(f"UNTIL={rule['until'].strftime(OCCURRENCE_FORMAT)}")
+    if rule["until_date"]:
+        parts.append(f"UNTIL={rule['until_date'].strftime('%Y%m%d')}")
+    return ";".join(parts)
+
+
+def _candidate_dates(rule: dict, start_date: date, from_date: date) -> Iterator[date]:
+    """Datas locais candidatas, em ordem, saltando direto para `from_date`."""
+    interval = rule["interval"]
+
+    if rule["freq"] == "DAILY":
+        skip = max(0, (from_date - start_date).days // interval)
+        day = start_date + timedelta(days=skip * interval)
+        while True:
+            yield day
+            day += timedelta(days=interval)
+
+    weekdays = rule["byday"] or [start_date.weekday()]
+    period = 7 * interval
+    anchor = start_date - timedelta(days=start_date.weekday())
+    week = anchor + timedelta(days=max(0, (from_date - anchor).days // period) * period)
+    while True:
+        for weekday in weekdays:
+            day = week + timedelta(days=weekday)
+            if day >= start_date:
+                yield day
+        week += timedelta(days=period)
+
+
+def occurrence_starts(
+    series: dict, rule: dict, window_start: datetime, window_end: datetime
+) -> list[datetime]:
+    """Inícios (UTC) das ocorrências que cruzam `[window_start, window_end)`.
+
+    Mantém o horário de parede no fuso da série (atravessa horário de verão
+    sem deslocar). Sem COUNT, a expansão começa direto na janela.
+    """
+    tz = ZoneInfo(series["timezone"])
+    dtstart = datetime.fromisoformat(series["dtstart"]).astimezone(tz)
+    duration = timedelta(minutes=series["duration_minutes"])
+    wall_time = dtstart.time()
+
+    # COUNT é contado desde o início da série, então não dá para saltar
+    from_date = dtstart.date()
+    if rule["count"] is None:
+        from_date = max(
+            from_date, (window_start - duration).astimezone(tz).date() - timedelta(days=1)
+        )
+
+    starts: list[datetime] = []
+    for index, day in enumerate(_candidate_dates(rule, dtstart.date(), from_date)):
+        start = datetime.combine(day, wall_time, tz)
+        if rule["count"] is not None and index >= rule["count"]:
+            break
+        if rule["until"] and start > rule["until"]:
+            break
+        if rule["until_date"] and day > rule["until_date"]:
+            break
+        if start >= window_end:
+            break
+        if start + duration > window_start:
+            starts.append(start.astimezone(timezone.utc))
+    return starts
+
+
+def _series_end(series: dict, rule: dict) -> str:
+    """Fim da última ocorrência (`infinity` para séries sem fim).
+
+    Não percorre a série desde o início: com UNTIL, expande só o último
+    período antes do limite; com COUNT (até `MAX_COUNT`), a janela é
+    limitada a COUNT períodos.
+    """
+    if rule["count"] is None and rule["until"] is None and rule["until_date"] is None:
+        return "infinity"
+
+    dtstart = datetime.fromisoformat(series["dtstart"])
+
+    try:
+        period = timedelta(days=rule["interval"] * (7 if rule["freq"] == "WEEKLY" else 1))
+        if rule["count"] is not None:
+            lo = dtstart
+            hi = dtstart + period * rule["count"] + timedelta(days=2)
+        else:
+            if rule["until"]:
+                hi = rule["until"] + timedelta(seconds=1)
+            else:
+                tz = ZoneInfo(series["timezone"])
+                hi = datetime.combine(
+                    rule["until_date"] + timedelta(days=1), time.min, tz
+                )
+            # A última ocorrência cai no último período antes do limite
+            # (+1 dia de folga para horário de verão)
+            lo = max(dtstart, hi - period - timedelta(days=1))
+        starts = occurrence_starts(series, rule, lo, hi)
+        end = starts[-1] + timedelta(minutes=series["duration_minutes"]) if starts else None
+    except OverflowError as exc:
+        raise ValidationException(
+            "RRULE: a série termina fora do intervalo de datas suportado"
+        ) from exc
+
+    if end is None:
+        raise ValidationException("A regra de recorrência não gera nenhuma ocorrência")
+    return end.isoformat()
+
+
+# =====================================================
+# Expansão (listagem e slots)
+# =====================================================
+
+
+def _epoch(value: str) -> int:
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def occurrence_key(start: datetime) -> str:
+    return start.astimezone(timezone.utc).strftime(OCCURRENCE_FORMAT)
+
+
+def _virtual_booking(series: dict, start: datetime) -> dict:
+    end = start + timedelta(minutes=series["duration_minutes"])
+    return {
+        "id": f"{series['id']}:{occurrence_key(start)}",
+        "empresa_id": series["empresa_id"],
+        "calendar_id": series["calendar_id"],
+        "booking_type_id": series["booking_type_id"],
+        "assigned_to": series["assigned_to"],
+        "lead_id": series.get("lead_id"),
+        "client_name": series.get("client_name"),
+        "client_phone": series.get("client_phone"),
+        "client_email": series.get("client_email"),
+        "start_datetime": start.isoformat(),
+        "end_datetime": end.isoformat(),
+        "status": series.get("status"),
+        "notes": series.get("notes"),
+        "event_id": None,
+        "created_by": series["created_by"],
+        "created_at": series["created_at"],
+        "updated_at": series["updated_at"],
+        "series_id": series["id"],
+        "series_occurrence_start": start.isoformat(),
+        "booking_types": series.get("booking_types"),
+    }
+
+
+def _fetch_series(
+    empresa_id: str,
+    lo: datetime,
+    hi: datetime,
+    filters: dict | None = None,
+    owners_of_calendar: tuple[str, list[str]] | None = None,
+) -> list[dict]:
+    query = (
+        get_supabase()
+        .table("booking_series")
+        .select(SERIES_SELECT)
+        .eq("empresa_id", empresa_id)
+        .neq("status", "cancelled")
+        .lt("dtstart", hi.isoformat())
+        .gt("ends_at", lo.isoformat())
+    )
+    for column, value in (filters or {}).items():
+        query = query.eq(column, value)
+    if owners_of_calendar:
+        calendar_id, owner_ids = owners_of_calendar
+        if owner_ids:
+            query = query.or_(
+                f"calendar_id.eq.{calendar_id},assigned_to.in.({','.join(owner_ids)})"
+            )
+        else:
+            query = query.eq("calendar_id", calendar_id)
+    return query.execute().data or []
+
+
+def _overridden(series_ids: list[str], lo: datetime, hi: datetime) -> set[tuple[str, int]]:
+    """Ocorrências já materializadas em `bookings` (alteradas ou canceladas)."""
+    supabase = get_supabase()
+    found: set[tuple[str, int]] = set()
+    for start in range(0, len(series_ids), LOOKUP_CHUNK):
+        rows = (
+            supabase.table("bookings")
+            .select("series_id, series_occurrence_start")
+            .in_("series_id", series_ids[start:start + LOOKUP_CHUNK])
+            .gte("series_occurrence_start", lo.isoformat())
+            .lt("series_occurrence_start", hi.isoformat())
+            .execute()
+        ).data or []
+        found.update(
+            (row["series_id"], _epoch(row["series_occurrence_start"])) for row in rows
+        )
+    return found
+
+
+def expand_series(series_rows: list[dict], lo: datetime, hi: datetime) -> list[dict]:
+    """Ocorrências virtuais das séries que cruzam a janela (sem as materializadas)."""
+    if not series_rows:
+        return []
+
+    # Margem para ocorrências que começam antes da janela e a atravessam
+    longest = max(s["duration_minutes"] for s in series_rows)
+    overridden = _overridden(
+        [s["id"] for s in series_rows], lo - timedelta(minutes=longest), hi
+    )
+
+    occurrences = []
+    for series in series_rows:
+        rule = parse_rrule(series["rrule"])
+        for start in occurrence_starts(series, rule, lo, hi):
+            if (series["id"], int(start.timestamp())) not in overridden:
+                occurrences.append(_virtual_booking(series, start))
+    return occurrences
+
+
+def virtual_bookings(
+    empresa_id: str, lo: datetime, hi: datetime, filters: dict | None = None
+) -> list[dict]:
+    """Ocorrências das séries (filtradas por coluna) que cruzam a janela."""
+    return expand_series(_fetch_series(empresa_id, lo, hi, filters), lo, hi)
+
+
+def virtual_bookings_for_calendar(
+    empresa_id: str,
+    calendar_id: str,
+    owner_ids: list[str],
+    lo: datetime,
+    hi: datetime,
+) -> list[dict]:
+    """Ocorrências da agenda ou de seus membros, para o cálculo de slots."""
+    series_rows = _fetch_series(
+        empresa_id, lo, hi, owners_of_calendar=(calendar_id, owner_ids)
+    )
+    return expand_series(series_rows, lo, hi)
+
+
+def _parse_datetime(value: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise ValidationException(f"Data/hora inválida: '{value}'") from exc
+    # Mesmo tratamento do banco para timestamps sem fuso
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def list_bookings_expanded(
+    empresa_id: str,
+    date_from: str,
+    date_to: str,
+    page: int = 1,
+    limit: int = 20,
+    calendar_id: str | None = None,
+    status: str | None = None,
+    assigned_to: str | None = None,
+    lead_id: str | None = None,
+) -> dict:
+    """Lista agendamentos gravados + ocorrências de séries no período.
+
+    Mesmos filtros e ordenação de `booking_service.list_bookings`. A página
+    da mescla está entre os `offset + limit` primeiros de cada lado: o banco
+    devolve só esses agendamentos gravados (e o total por `count`), e as
+    ocorrências são expandidas em memória a partir das séries do período.
+    """
+    lo, hi = _parse_datetime(date_from), _parse_datetime(date_to)
+    if hi < lo:
+        raise ValidationException("`date_to` deve ser posterior a `date_from`")
+
+    filters = {
+        column: value
+        for column, value in (
+            ("calendar_id", calendar_id),
+            ("status", status),
+            ("assigned_to", assigned_to),
+            ("lead_id", lead_id),
+        )
+        if value
+    }
+    offset = (page - 1) * limit
+
+    query = (
+        get_supabase()
+        .table("bookings")
+        .select(booking_service.BOOKING_SELECT, count="exact")
+        .eq("empresa_id", empresa_id)
+        .gte("start_datetime", lo.isoformat())
+        .lte("start_datetime", hi.isoformat())
+    )
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    result = query.order("start_datetime").order("id").limit(offset + limit).execute()
+    stored = result.data or []
+
+    virtual = [
+        occurrence
+        for occurrence in expand_series(
+            _fetch_series(empresa_id, lo, hi + timedelta(seconds=1), filters),
+            lo,
+            hi + timedelta(seconds=1),
+        )
+        if lo <= datetime.fromisoformat(occurrence["start_datetime"]) <= hi
+    ]
+
+    merged = sorted(
+        stored + virtual, key=lambda b: (_epoch(b["start_datetime"]), b["id"])
+    )
+
+    return build_paginated_response(
+        data=merged[offset:offset + limit],
+        total=(result.count or 0) + len(virtual),
+        page=page,
+        limit=limit,
+    )
+
+
+# =====================================================
+# Séries
+# =====================================================
+
+
+async def get_series(empresa_id: str, series_id: str) -> dict:
+    """Busca uma série recorrente."""
+    result = (
+        get_supabase()
+        .table("booking_series")
+        .select(SERIES_SELECT)
+        .eq("id", series_id)
+        .eq("empresa_id", empresa_id)
+        .execute()
+    )
+
+    if not result.data:
+        raise NotFoundException(f"Série '{series_id}' não encontrada")
+
+    return result.data[0]
+
+
+def _check_conflicts(empresa_id: str, series: dict, rule: dict) -> None:
+    """Recusa (409) séries que colidem com bloqueios ou agendamentos do responsável.
+
+    Verifica as ocorrências dos primeiros `CONFLICT_HORIZON_DAYS` dias contra
+    bloqueios da agenda, agendamentos gravados e outras séries do mesmo
+    responsável. Depois do horizonte, a série pode colidir com agendamentos
+    já existentes; novos agendamentos avulsos são verificados contra as
+    ocorrências em `check_occurrence_conflicts`, sem horizonte.
+    """
+    lo = datetime.fromisoformat(series["dtstart"])
+    hi = lo + timedelta(days=CONFLICT_HORIZON_DAYS)
+    duration = timedelta(minutes=series["duration_minutes"])
+    occurrences = [(s, s + duration) for s in occurrence_starts(series, rule, lo, hi)]
+
+    supabase = get_supabase()
+    blocks = (
+        supabase.table("booking_blocks")
+        .select("start_datetime, end_datetime")
+        .eq("calendar_id", series["calendar_id"])
+        .lt("start_datetime", hi.isoformat())
+        .gt("end_datetime", lo.isoformat())
+        .execute()
+    ).data or []
+    stored = (
+        supabase.table("bookings")
+        .select("start_datetime, end_datetime")
+        .eq("assigned_to", series["assigned_to"])
+        .neq("status", "cancelled")
+        .lt("start_datetime", hi.isoformat())
+        .gt("end_datetime", lo.isoformat())
+        .execute()
+    ).data or []
+    others = virtual_bookings(empresa_id, lo, hi, {"assigned_to": series["assigned_to"]})
+
+    busy = sorted(
+        (
+            datetime.fromisoformat(b["start_datetime"]),
+            datetime.fromisoformat(b["end_datetime"]),
+            reason,
+        )
+        for rows, reason in (
+            (blocks, "cai em um bloqueio da agenda"),
+            (
+                stored + [o for o in others if o.get("status") != "cancelled"],
+                "conflita com outro agendamento do responsável",
+            ),
+        )
+        for b in rows
+    )
+
+    # Varredura de duas listas ordenadas por início
+    i = j = 0
+    while i < len(occurrences) and j < len(busy):
+        occurrence_start, occurrence_end = occurrences[i]
+        busy_start, busy_end, reason = busy[j]
+        if busy_end <= occurrence_start:
+            j += 1
+        elif occurrence_end <= busy_start:
+            i += 1
+        else:
+            raise ConflictException(
+                f"Horário indisponível: a ocorrência de {occurrence_start.isoformat()} "
+                f"{reason}"
+            )
+
+
+def check_occurrence_conflicts(
+    empresa_id: str,
+    assigned_to: str,
+    start_datetime: str,
+    end_datetime: str,
+    *,
+    occurrence: tuple[str, str] | None = None,
+) -> None:
+    """Recusa (409) horários que colidem com ocorrências virtuais do responsável.
+
+    A constraint `bookings_no_overlap` só enxerga ocorrências materializadas;
+    as virtuais são expandidas aqui apenas na janela do agendamento, então a
+    verificação não tem horizonte. `occurrence` (`series_id`, início) é a
+    própria ocorrência sendo materializada, ignorada na comparação.
+
+    Não é atômica com a criação simultânea de uma série para o mesmo
+    responsável.
+    """
+    lo, hi = _parse_datetime(start_datetime), _parse_datetime(end_datetime)
+    skip = (occurrence[0], _epoch(occurrence[1])) if occurrence else None
+
+    for booking in virtual_bookings(empresa_id, lo, hi, {"assigned_to": assigned_to}):
+        if booking.get("status") == "cancelled":
+            continue
+        if (booking["series_id"], _epoch(booking["start_datetime"])) == skip:
+            continue
+        raise ConflictException(
+            "Horário indisponível: o responsável tem uma ocorrência de série "
+            "recorrente nesse período"
+        )
+
+
+async def create_series(empresa_id: str, data: dict) -> dict:
+    """Cria uma série recorrente (as ocorrências não são gravadas)."""
+    calendar = await booking_service.get_calendar(empresa_id, data["calendar_id"])
+    if data["booking_type_id"] not in {
+        t["id"] for t in calendar.get("booking_types") or []
+    }:
+        raise NotFoundException(
+            f"Tipo de agendamento '{data['booking_type_id']}' não encontrado nesta agenda"
+        )
+
+    rule = parse_rrule(data.pop("rrule"))
+    start = _parse_datetime(data.pop("start_datetime"))
+    end = _parse_datetime(data.pop("end_datetime"))
+    duration_minutes = (end - start).total_seconds() / 60
+    if duration_minutes <= 0 or not duration_minutes.is_integer():
+        raise ValidationException(
+            "`end_datetime` deve ser posterior a `start_datetime`, em minutos inteiros"
+        )
+
+    series = {
+        **data,
+        "empresa_id": empresa_id,
+        "dtstart": start.isoformat(),
+        "duration_minutes": int(duration_minutes),
+        "timezone": calendar.get("timezone") or "America/Sao_Paulo",
+        "rrule": _normalize_rrule(rule),
+    }
+    series["ends_at"] = _series_end(series, rule)
+
+    _check_conflicts(empresa_id, series, rule)
+
+    result = get_supabase().table("booking_series").insert(series).execute()
+
+    return await get_series(empresa_id, result.data[0]["id"])
+
+
+async def cancel_series(empresa_id: str, series_id: str) -> dict:
+    """Cancela a série: deixa de gerar ocorrências (as materializadas ficam)."""
+    await get_series(empresa_id, series_id)
+
+    get_supabase().table("booking_series").update({
+        "status": "cancelled",
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }).eq("id", series_id).execute()
+
+    return await get_series(empresa_id, series_id)
+
+
+# =====================================================
+# Ocorrências
+# =====================================================
+
+
+def _parse_occurrence(occurrence: str) -> datetime:
+    """Aceita o formato compacto (AAAAMMDDTHHMMSSZ) ou ISO 8601."""
+    try:
+        return datetime.strptime(occurrence, OCCURRENCE_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return _parse_datetime(occurrence)
+
+
+async def update_occurrence(
+    empresa_id: str, series_id: str, occurrence: str, data: dict
+) -> dict:
+    """Altera uma ocorrência, materializando-a em `bookings` se preciso.
+
+    Retorna 404 se o horário não for uma ocorrência da série e 409 se a
+    alteração conflitar com outro agendamento.
+    """
+    series = await get_series(empresa_id, series_id)
+    start = _parse_occurrence(occurrence)
+
+    rule = parse_rrule(series["rrule"])
+    if start not in occurrence_starts(series, rule, start, start + timedelta(seconds=1)):
+        raise NotFoundException(
+            f"Ocorrência '{occurrence}' não pertence à série '{series_id}'"
+        )
+
+    existing = (
+        get_supabase()
+        .table("bookings")
+        .select("id")
+        .eq("series_id", series_id)
+        .eq("series_occurrence_start", start.isoformat())
+        .execute()
+    ).data
+    if existing:
+        return await booking_service.update_booking(empresa_id, existing[0]["id"], data)
+
+    booking = _virtual_booking(series, start)
+    row = {
+        key: booking[key]
+        for key in (
+            "calendar_id", "booking_type_id", "assigned_to", "created_by",
+            "lead_id", "client_name", "client_phone", "client_email",
+            "start_datetime", "end_datetime", "status", "notes",
+            "series_id", "series_occurrence_start",
+        )
+        if booking[key] is not None
+    }
+    row.update(data)
+
+    return await booking_service.create_booking(empresa_id, row)
+
+
+async def cancel_occurrence(empresa_id: str, series_id: str, occurrence: str) -> dict:
+    """Cancela uma única ocorrência da série."""
+    return await update_occurrence(
+        empresa_id, series_id, occurrence, {"status": "cancelled"}
+    )
@@ -1,6 +1,14 @@
+import uuid
 from datetime import datetime, timezone
 
-from app.core.exceptions import NotFoundException
+from postgrest.exceptions import APIError
+
+from app.core.exceptions import (
+    ConflictException,
+    NotFoundException,
+    ValidationException,
+)
+from app.services import booking_cache_service
 from app.utils.pagination import build_paginated_response, paginate_query
 from app.utils.supabase_client import get_supabase
 
@@ -26,10 +34,19 @@ BOOKING_SELECT = (
     "id, empresa_id, calendar_id, booking_type_id, assigned_to, "
     "lead_id, client_name, client_phone, client_email, "
     "start_datetime, end_datetime, status, notes, event_id, "
-    "created_by, created_at, updated_at, "
+    "created_by, created_at, updated_at, series_id, series_occurrence_start, "
     "booking_types(" + BOOKING_TYPE_SELECT + ")"
 )
 
+# SQLSTATE da constraint `bookings_no_overlap` e da RPC create_booking_checked
+EXCLUSION_VIOLATION = "23P01"
+
+# Transições em lote: ação -> (status de origem aceito, novo status)
+BATCH_TRANSITIONS = {
+    "cancel": ("active", "cancelled"),
+    "confirm": ("pending", "confirmed"),
+}
+
 
 # =====================================================
 # Calendars (somente leitura)
@@ -53,7 +70,14 @@ async def list_calendars(empresa_id: str) -> list[dict]:
 
 
 async def get_calendar(empresa_id: str, calendar_id: str) -> dict:
-    """Busca uma agenda com disponibilidade, tipos e membros."""
+    """Busca uma agenda com disponibilidade, tipos e membros.
+
+    Servida do cache de configuração (`booking_cache_service`) quando possível.
+    """
+    cached = booking_cache_service.get(empresa_id, calendar_id)
+    if cached is not None:
+        return cached
+
     supabase = get_supabase()
 
     select = (
@@ -86,44 +110,25 @@ async def get_calendar(empresa_id: str, calendar_id: str) -> dict:
     if calendar.get("booking_types"):
         calendar["booking_types"].sort(key=lambda t: t.get("position", 0))
 
+    booking_cache_service.put(empresa_id, calendar)
     return calendar
 
 
 async def list_availability(empresa_id: str, calendar_id: str) -> list[dict]:
     """Lista horários de disponibilidade de uma agenda."""
-    supabase = get_supabase()
+    calendar = await get_calendar(empresa_id, calendar_id)
 
-    # Validar que a agenda pertence à empresa
-    await get_calendar(empresa_id, calendar_id)
-
-    result = (
-        supabase.table("booking_availability")
-        .select(AVAILABILITY_SELECT)
-        .eq("calendar_id", calendar_id)
-        .eq("is_active", True)
-        .order("day_of_week")
-        .execute()
-    )
-
-    return result.data or []
+    return [
+        a for a in calendar.get("booking_availability") or []
+        if a.get("is_active")
+    ]
 
 
 async def list_booking_types(empresa_id: str, calendar_id: str) -> list[dict]:
     """Lista tipos de agendamento ativos de uma agenda."""
-    supabase = get_supabase()
-
-    await get_calendar(empresa_id, calendar_id)
+    calendar = await get_calendar(empresa_id, calendar_id)
 
-    result = (
-        supabase.table("booking_types")
-        .select(BOOKING_TYPE_SELECT)
-        .eq("calendar_id", calendar_id)
-        .eq("is_active", True)
-        .order("position")
-        .execute()
-    )
-
-    return result.data or []
+    return [t for t in calendar.get("booking_types") or [] if t.get("is_active")]
 
 
 async def list_blocks(
@@ -198,8 +203,27 @@ async def list_bookings(
     )
 
 
+def _require_booking_id(booking_id: str) -> None:
+    """Recusa ids que não são UUID antes de chegar ao banco (que daria 500).
+
+    Ocorrências de séries não materializadas (`{series_id}:{AAAAMMDDTHHMMSSZ}`)
+    só são alteradas pelas rotas da série.
+    """
+    try:
+        uuid.UUID(booking_id)
+    except ValueError:
+        if ":" in booking_id:
+            raise ValidationException(
+                f"'{booking_id}' é uma ocorrência de série: use "
+                "/bookings/series/{series_id}/occurrences/{occurrence}"
+            ) from None
+        raise NotFoundException(f"Agendamento '{booking_id}' não encontrado") from None
+
+
 async def get_booking(empresa_id: str, booking_id: str) -> dict:
     """Busca um agendamento por ID."""
+    _require_booking_id(booking_id)
+
     supabase = get_supabase()
 
     result = (
@@ -216,26 +240,109 @@ async def get_booking(empresa_id: str, booking_id: str) -> dict:
     return result.data[0]
 
 
+def _validate_range(start_datetime: str, end_datetime: str) -> None:
+    try:
+        start = datetime.fromisoformat(start_datetime)
+        end = datetime.fromisoformat(end_datetime)
+    except ValueError as exc:
+        raise ValidationException("Data/hora inválida (use ISO 8601)") from exc
+
+    if (start.tzinfo is None) != (end.tzinfo is None) or end <= start:
+        raise ValidationException("`end_datetime` deve ser posterior a `start_datetime`")
+
+
+def _conflict_from(exc: APIError) -> ConflictException | None:
+    """Converte a violação de sobreposição do banco em 409."""
+    if exc.code != EXCLUSION_VIOLATION:
+        return None
+    if exc.message == "block_conflict":
+        return ConflictException("Horário bloqueado na agenda")
+    return ConflictException(
+        "Horário indisponível: o responsável já possui agendamento nesse período"
+    )
+
+
+def _check_series_conflicts(empresa_id: str, booking: dict) -> None:
+    """Recusa (409) agendamentos sobre ocorrências virtuais de séries.
+
+    Ocorrências não materializadas não são linhas de `bookings`, então a
+    constraint de exclusão não as enxerga.
+    """
+    # Import tardio: booking_series_service depende deste módulo
+    from app.services import booking_series_service
+
+    if booking.get("status") == "cancelled" or not booking.get("assigned_to"):
+        return
+
+    occurrence = None
+    if booking.get("series_id") and booking.get("series_occurrence_start"):
+        occurrence = (booking["series_id"], booking["series_occurrence_start"])
+
+    booking_series_service.check_occurrence_conflicts(
+        empresa_id,
+        booking["assigned_to"],
+        booking["start_datetime"],
+        booking["end_datetime"],
+        occurrence=occurrence,
+    )
+
+
 async def create_booking(empresa_id: str, data: dict) -> dict:
-    """Cria um novo agendamento."""
+    """Cria um novo agendamento.
+
+    Recusa (409) horários bloqueados da agenda (trigger em `bookings`) ou
+    que se sobreponham a outro agendamento ativo do responsável; a
+    constraint de exclusão garante isso mesmo com requisições simultâneas.
+    Ocorrências virtuais de séries do responsável também contam como
+    ocupadas (verificadas antes, fora da constraint).
+    """
     supabase = get_supabase()
 
-    data["empresa_id"] = empresa_id
+    _validate_range(data["start_datetime"], data["end_datetime"])
+    _check_series_conflicts(empresa_id, data)
 
-    result = supabase.table("bookings").insert(data).execute()
+    try:
+        result = supabase.rpc(
+            "create_booking_checked",
+            {"p_empresa_id": empresa_id, "p_data": data},
+        ).execute()
+    except APIError as exc:
+        conflict = _conflict_from(exc)
+        if conflict:
+            raise conflict from exc
+        raise
 
-    return await get_booking(empresa_id, result.data[0]["id"])
+    return await get_booking(empresa_id, result.data)
 
 
 async def update_booking(empresa_id: str, booking_id: str, data: dict) -> dict:
-    """Atualiza parcialmente um agendamento."""
+    """Atualiza parcialmente um agendamento.
+
+    Novo horário, responsável ou reativação são verificados contra os demais
+    agendamentos (constraint de exclusão), os bloqueios da agenda (trigger)
+    e as ocorrências virtuais de séries do responsável.
+    """
     supabase = get_supabase()
 
-    await get_booking(empresa_id, booking_id)
+    current = await get_booking(empresa_id, booking_id)
+
+    if "start_datetime" in data or "end_datetime" in data:
+        _validate_range(
+            data.get("start_datetime", current["start_datetime"]),
+            data.get("end_datetime", current["end_datetime"]),
+        )
+    if {"start_datetime", "end_datetime", "assigned_to", "status"} & data.keys():
+        _check_series_conflicts(empresa_id, {**current, **data})
 
     data["updated_at"] = datetime.now(timezone.utc).isoformat()
 
-    supabase.table("bookings").update(data).eq("id", booking_id).execute()
+    try:
+        supabase.table("bookings").update(data).eq("id", booking_id).execute()
+    except APIError as exc:
+        conflict = _conflict_from(exc)
+        if conflict:
+            raise conflict from exc
+        raise
 
     return await get_booking(empresa_id, booking_id)
 
@@ -256,20 +363,90 @@ async def cancel_booking(empresa_id: str, booking_id: str) -> dict:
 
 
 async def confirm_booking(empresa_id: str, booking_id: str) -> dict:
-    """Confirma um agendamento pendente."""
+    """Confirma um agendamento pendente (409 se o horário estiver bloqueado)."""
     supabase = get_supabase()
 
     await get_booking(empresa_id, booking_id)
 
     now = datetime.now(timezone.utc).isoformat()
-    supabase.table("bookings").update({
-        "status": "confirmed",
-        "updated_at": now,
-    }).eq("id", booking_id).execute()
+    try:
+        supabase.table("bookings").update({
+            "status": "confirmed",
+            "updated_at": now,
+        }).eq("id", booking_id).execute()
+    except APIError as exc:
+        # Ex.: reativar um cancelado cujo horário já foi ocupado ou bloqueado
+        conflict = _conflict_from(exc)
+        if conflict:
+            raise conflict from exc
+        raise
 
     return await get_booking(empresa_id, booking_id)
 
 
+async def batch_update_status(
+    empresa_id: str,
+    action: str,
+    ids: list[str] | None = None,
+    calendar_id: str | None = None,
+    assigned_to: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict:
+    """Cancela ou confirma vários agendamentos num único UPDATE.
+
+    Seleciona por `ids` e/ou filtros (agenda, responsável, período de
+    início). Só altera agendamentos que aceitam a transição (cancelar:
+    não cancelados; confirmar: pendentes) e retorna as linhas alteradas.
+    """
+    if not ids and not (date_from and date_to):
+        raise ValidationException(
+            "Informe `ids` ou o período completo (`date_from` e `date_to`)"
+        )
+    for booking_id in ids or []:
+        _require_booking_id(booking_id)
+
+    supabase = get_supabase()
+    source_status, new_status = BATCH_TRANSITIONS[action]
+
+    query = (
+        supabase.table("bookings")
+        .update({
+            "status": new_status,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+        .eq("empresa_id", empresa_id)
+    )
+
+    if source_status == "active":
+        query = query.neq("status", "cancelled")
+    else:
+        query = query.eq("status", source_status)
+    if ids:
+        query = query.in_("id", ids)
+    if calendar_id:
+        query = query.eq("calendar_id", calendar_id)
+    if assigned_to:
+        query = query.eq("assigned_to", assigned_to)
+    if date_from:
+        query = query.gte("start_datetime", date_from)
+    if date_to:
+        query = query.lte("start_datetime", date_to)
+
+    try:
+        result = query.execute()
+    except APIError as exc:
+        # Lote inteiro é revertido se algum confirmar sobre horário ocupado
+        # ou bloqueado
+        conflict = _conflict_from(exc)
+        if conflict:
+            raise conflict from exc
+        raise
+
+    rows = result.data or []
+    return {"updated": len(rows), "data": rows}
+
+
 async def delete_booking(empresa_id: str, booking_id: str) -> None:
     """Deleta um agendamento permanentemente."""
     supabase = get_supabase()
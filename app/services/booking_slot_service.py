@@ -0,0 +1,445 @@
+"""Cálculo de horários disponíveis (slots) de uma agenda.
+
+Os dados vêm em três consultas (agenda com disponibilidade/tipos/membros,
+bloqueios e agendamentos do período). O cálculo é feito em memória com
+intervalos em segundos (epoch):
+
+1. As janelas de disponibilidade semanais viram intervalos absolutos no
+   fuso da agenda, dia a dia, e são mescladas.
+2. Para cada responsável, agendamentos e bloqueios viram listas ordenadas
+   e mescladas de intervalos ocupados (com e sem buffers).
+3. Uma varredura com ponteiros percorre cada janela em passos de
+   `interval_minutes`, saltando direto para o fim do conflito, em
+   O(candidatos + ocupados) por responsável.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core.exceptions import NotFoundException, ValidationException
+from app.services import booking_series_service, booking_service
+from app.utils.supabase_client import get_supabase
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+MAX_RANGE_DAYS = 92
+CANCELLED_STATUS = "cancelled"
+
+Interval = tuple[int, int]
+
+
+# =====================================================
+# Intervalos
+# =====================================================
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    """Ordena e mescla intervalos sobrepostos ou encostados."""
+    if not intervals:
+        return []
+
+    ordered = sorted(intervals)
+    merged = [ordered[0]]
+    for start, end in ordered[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            if end > last_end:
+                merged[-1] = (last_start, end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _align(origin: int, value: int, step: int) -> int:
+    """Primeiro ponto da grade `origin + k * step` que é >= `value`."""
+    if value <= origin:
+        return origin
+    return origin + -(-(value - origin) // step) * step
+
+
+def free_starts(
+    windows: list[Interval],
+    raw_busy: list[Interval],
+    buffered_busy: list[Interval],
+    *,
+    duration: int,
+    before: int,
+    after: int,
+    step: int,
+    earliest: int,
+    latest: int,
+) -> list[int]:
+    """Inícios livres dentro das janelas para um responsável.
+
+    Um candidato `[s, s + duration]` é livre quando:
+    - com os próprios buffers, não encosta em nada ocupado (`raw_busy`);
+    - sem buffers, não invade o buffer de outro agendamento (`buffered_busy`).
+
+    Todas as listas devem estar ordenadas e mescladas.
+    """
+    starts: list[int] = []
+    i = j = 0
+    n_raw, n_buf = len(raw_busy), len(buffered_busy)
+
+    for window_start, window_end in windows:
+        s = _align(window_start, earliest, step)
+        last_start = min(window_end - duration, latest)
+
+        while s <= last_start:
+            lo, hi = s - before, s + duration + after
+            while i < n_raw and raw_busy[i][1] <= lo:
+                i += 1
+            if i < n_raw and raw_busy[i][0] < hi:
+                s = _align(window_start, raw_busy[i][1] + before, step)
+                continue
+
+            while j < n_buf and buffered_busy[j][1] <= s:
+                j += 1
+            if j < n_buf and buffered_busy[j][0] < s + duration:
+                s = _align(window_start, buffered_busy[j][1], step)
+                continue
+
+            starts.append(s)
+            s += step
+
+    return starts
+
+
+# =====================================================
+# Conversões
+# =====================================================
+
+
+def _epoch(value: str) -> int:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _parse_time(value: str) -> time:
+    return time.fromisoformat(value)
+
+
+def _day_of_week(day: date) -> int:
+    """0 = Domingo, ..., 6 = Sábado (convenção de `booking_availability`)."""
+    return (day.weekday() + 1) % 7
+
+
+def calendar_timezone(name: str | None) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except ZoneInfoNotFoundError:
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _parse_bound(value: str, tz: ZoneInfo, end_of_day: bool) -> datetime:
+    """Aceita data (YYYY-MM-DD, no fuso da agenda) ou data/hora ISO."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise ValidationException(f"Data inválida: '{value}'") from exc
+
+    if len(value) == 10:
+        parsed = parsed + timedelta(days=1) if end_of_day else parsed
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed
+
+
+def availability_windows(
+    availability: list[dict],
+    tz: ZoneInfo,
+    first_day: date,
+    last_day: date,
+) -> list[tuple[date, Interval]]:
+    """Janelas absolutas (epoch) por dia local, a partir da grade semanal."""
+    by_weekday: dict[int, list[tuple[time, time]]] = {}
+    for slot in availability:
+        if slot.get("is_active") is False:
+            continue
+        by_weekday.setdefault(slot["day_of_week"], []).append(
+            (_parse_time(slot["start_time"]), _parse_time(slot["end_time"]))
+        )
+
+    windows: list[tuple[date, Interval]] = []
+    day = first_day
+    while day <= last_day:
+        intervals = [
+            (
+                int(datetime.combine(day, start, tz).timestamp()),
+                int(datetime.combine(day, end, tz).timestamp()),
+            )
+            for start, end in by_weekday.get(_day_of_week(day), [])
+        ]
+        for interval in merge_intervals(intervals):
+            windows.append((day, interval))
+        day += timedelta(days=1)
+    return windows
+
+
+# =====================================================
+# Cálculo
+# =====================================================
+
+
+def compute_slots(
+    *,
+    calendar: dict,
+    booking_type: dict,
+    blocks: list[dict],
+    bookings: list[dict],
+    range_start: datetime,
+    range_end: datetime,
+    now: datetime,
+    interval_minutes: int | None = None,
+    exact_start: bool = False,
+) -> list[dict]:
+    """Calcula os slots livres do tipo de agendamento no período.
+
+    Respeita duração, buffers, `max_per_day`, antecedência mínima/máxima,
+    bloqueios, agendamentos existentes de cada responsável e o fuso da
+    agenda. Cada slot lista os responsáveis livres (`owner_ids`); agendas
+    sem membros cadastrados são tratadas como um único recurso.
+
+    Com `exact_start`, só `range_start` é candidato (fora da grade de
+    `interval_minutes`), para validar um horário escolhido pelo cliente.
+    """
+    tz = calendar_timezone(calendar.get("timezone"))
+
+    duration = int(booking_type["duration_minutes"]) * 60
+    before = int(booking_type.get("buffer_before_minutes") or 0) * 60
+    after = int(booking_type.get("buffer_after_minutes") or 0) * 60
+    step = int(interval_minutes or booking_type["duration_minutes"]) * 60
+    max_per_day = booking_type.get("max_per_day")
+
+    min_advance = booking_type.get("min_advance_hours")
+    if min_advance is None:
+        min_advance = calendar.get("min_advance_hours") or 0
+    max_advance = calendar.get("max_advance_days")
+
+    earliest = max(int(range_start.timestamp()), int((now + timedelta(hours=min_advance)).timestamp()))
+    latest = int(range_end.timestamp()) - duration
+    if max_advance is not None:
+        latest = min(latest, int((now + timedelta(days=max_advance)).timestamp()))
+    if earliest > latest:
+        return []
+    if exact_start and earliest != int(range_start.timestamp()):
+        return []
+
+    first_day = datetime.fromtimestamp(earliest, tz).date()
+    last_day = datetime.fromtimestamp(latest, tz).date()
+    windows = availability_windows(
+        calendar.get("booking_availability") or [], tz, first_day, last_day
+    )
+
+    # max_per_day: dias locais que já atingiram o limite deste tipo
+    if max_per_day:
+        per_day: dict[date, int] = {}
+        for booking in bookings:
+            if booking.get("booking_type_id") == booking_type["id"] and (
+                booking.get("calendar_id") == calendar["id"]
+            ):
+                day = datetime.fromtimestamp(_epoch(booking["start_datetime"]), tz).date()
+                per_day[day] = per_day.get(day, 0) + 1
+        windows = [
+            (day, interval) for day, interval in windows
+            if per_day.get(day, 0) < max_per_day
+        ]
+
+    window_intervals = [interval for _, interval in windows]
+    if exact_start:
+        # Ancora a grade no horário pedido, dentro da janela que o contém
+        window_intervals = [
+            (earliest, window_end)
+            for window_start, window_end in window_intervals
+            if window_start <= earliest < window_end
+        ]
+    block_intervals = [
+        (_epoch(b["start_datetime"]), _epoch(b["end_datetime"])) for b in blocks
+    ]
+
+    owners = calendar.get("booking_calendar_owners") or []
+    owner_ids: list[str | None] = [
+        o["user_id"] for o in owners if o.get("can_receive_bookings", True) is not False
+    ]
+    if not owners:
+        owner_ids = [None]
+
+    raw_by_owner: dict[str | None, list[Interval]] = {o: [] for o in owner_ids}
+    buffered_by_owner: dict[str | None, list[Interval]] = {o: [] for o in owner_ids}
+    for booking in bookings:
+        key = booking.get("assigned_to") if owners else None
+        if key not in raw_by_owner:
+            continue
+        booking_type_data = booking.get("booking_types") or {}
+        start = _epoch(booking["start_datetime"])
+        end = _epoch(booking["end_datetime"])
+        raw_by_owner[key].append((start, end))
+        buffered_by_owner[key].append((
+            start - int(booking_type_data.get("buffer_before_minutes") or 0) * 60,
+            end + int(booking_type_data.get("buffer_after_minutes") or 0) * 60,
+        ))
+
+    available: dict[int, list[str]] = {}
+    for owner_id in owner_ids:
+        starts = free_starts(
+            window_intervals,
+            merge_intervals(raw_by_owner[owner_id] + block_intervals),
+            merge_intervals(buffered_by_owner[owner_id] + block_intervals),
+            duration=duration,
+            before=before,
+            after=after,
+            step=step,
+            earliest=earliest,
+            latest=latest,
+        )
+        for start in starts:
+            owners_at = available.setdefault(start, [])
+            if owner_id is not None:
+                owners_at.append(owner_id)
+
+    return [
+        {
+            "start": datetime.fromtimestamp(start, tz).isoformat(),
+            "end": datetime.fromtimestamp(start + duration, tz).isoformat(),
+            "owner_ids": available[start],
+        }
+        for start in sorted(available)
+    ]
+
+
+# =====================================================
+# Endpoint
+# =====================================================
+
+
+def _fetch_blocks(calendar_id: str, lo: datetime, hi: datetime) -> list[dict]:
+    result = (
+        get_supabase()
+        .table("booking_blocks")
+        .select(booking_service.BLOCK_SELECT)
+        .eq("calendar_id", calendar_id)
+        .lt("start_datetime", hi.isoformat())
+        .gt("end_datetime", lo.isoformat())
+        .execute()
+    )
+    return result.data or []
+
+
+def _fetch_bookings(
+    empresa_id: str,
+    calendar_id: str,
+    owner_ids: list[str],
+    lo: datetime,
+    hi: datetime,
+) -> list[dict]:
+    """Agendamentos ativos da agenda ou de seus membros (em qualquer agenda)."""
+    query = (
+        get_supabase()
+        .table("bookings")
+        .select(
+            "id, calendar_id, booking_type_id, assigned_to, start_datetime, "
+            "end_datetime, status, "
+            "booking_types(buffer_before_minutes, buffer_after_minutes)"
+        )
+        .eq("empresa_id", empresa_id)
+        .neq("status", CANCELLED_STATUS)
+        .lt("start_datetime", hi.isoformat())
+        .gt("end_datetime", lo.isoformat())
+    )
+    if owner_ids:
+        query = query.or_(
+            f"calendar_id.eq.{calendar_id},assigned_to.in.({','.join(owner_ids)})"
+        )
+    else:
+        query = query.eq("calendar_id", calendar_id)
+    return query.execute().data or []
+
+
+def load_context(
+    empresa_id: str,
+    calendar: dict,
+    booking_type_id: str,
+    lo: datetime,
+    hi: datetime,
+) -> dict:
+    """Tipo, bloqueios e agendamentos necessários ao cálculo.
+
+    Inclui as ocorrências de séries recorrentes, expandidas na janela. O
+    número de consultas independe do número de responsáveis.
+    """
+    calendar_id = calendar["id"]
+
+    booking_type = next(
+        (
+            t for t in calendar.get("booking_types") or []
+            if t["id"] == booking_type_id and t.get("is_active", True)
+        ),
+        None,
+    )
+    if booking_type is None:
+        raise NotFoundException(
+            f"Tipo de agendamento '{booking_type_id}' não encontrado nesta agenda"
+        )
+
+    owner_ids = [
+        o["user_id"] for o in calendar.get("booking_calendar_owners") or []
+    ]
+
+    bookings = _fetch_bookings(empresa_id, calendar_id, owner_ids, lo, hi)
+    bookings += booking_series_service.virtual_bookings_for_calendar(
+        empresa_id, calendar_id, owner_ids, lo, hi
+    )
+
+    return {
+        "calendar": calendar,
+        "booking_type": booking_type,
+        "blocks": _fetch_blocks(calendar_id, lo, hi),
+        "bookings": bookings,
+    }
+
+
+async def list_slots(
+    empresa_id: str,
+    calendar_id: str,
+    booking_type_id: str,
+    date_from: str,
+    date_to: str,
+    interval_minutes: int | None = None,
+) -> dict:
+    """Horários disponíveis de um tipo de agendamento no período."""
+    calendar = await booking_service.get_calendar(empresa_id, calendar_id)
+    tz = calendar_timezone(calendar.get("timezone"))
+
+    range_start = _parse_bound(date_from, tz, end_of_day=False)
+    range_end = _parse_bound(date_to, tz, end_of_day=True)
+    if range_end <= range_start:
+        raise ValidationException("`to` deve ser posterior a `from`")
+    if range_end - range_start > timedelta(days=MAX_RANGE_DAYS):
+        raise ValidationException(f"O período máximo é de {MAX_RANGE_DAYS} dias")
+
+    # Margem de um dia para capturar buffers e o max_per_day nas bordas
+    context = load_context(
+        empresa_id,
+        calendar,
+        booking_type_id,
+        range_start - timedelta(days=1),
+        range_end + timedelta(days=1),
+    )
+
+    slots = compute_slots(
+        **context,
+        range_start=range_start,
+        range_end=range_end,
+        now=datetime.now(timezone.utc),
+        interval_minutes=interval_minutes,
+    )
+
+    return {
+        "calendar_id": calendar_id,
+        "booking_type_id": booking_type_id,
+        "timezone": str(tz),
+        "slots": slots,
+    }
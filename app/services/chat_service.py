@@ -1,7 +1,19 @@
 from datetime import datetime, timezone
 
-from app.core.exceptions import NotFoundException
-from app.utils.pagination import build_paginated_response, paginate_query
+from postgrest.exceptions import APIError
+
+from app.core.exceptions import (
+    ConflictException,
+    NotFoundException,
+    ValidationException,
+)
+from app.utils.pagination import (
+    build_cursor_response,
+    build_paginated_response,
+    decode_timestamp_cursor,
+    encode_cursor,
+    paginate_query,
+)
 from app.utils.supabase_client import get_supabase
 
 CONVERSATION_SELECT = (
@@ -12,9 +24,19 @@ CONVERSATION_SELECT = (
 
 MESSAGE_SELECT = (
     "id, conversation_id, instance_id, message_type, content, "
-    "media_url, direction, status, timestamp, empresa_id, created_at"
+    "media_url, direction, status, timestamp, empresa_id, external_id, "
+    "created_at"
 )
 
+# SQLSTATE levantado pelas RPCs quando o recurso não pertence à empresa
+NO_DATA_FOUND = "P0002"
+# SQLSTATE do índice único (empresa_id, instance_id, fone)
+UNIQUE_VIOLATION = "23505"
+
+# Tamanho dos lotes de ingestão: ids por consulta `in` e linhas por INSERT
+BULK_LOOKUP_CHUNK = 200
+BULK_INSERT_CHUNK = 500
+
 INSTANCE_SELECT = (
     "id, name, phone_number, status, display_name, "
     "auto_create_leads, created_at, updated_at"
@@ -108,16 +130,70 @@ async def get_conversation(empresa_id: str, conversation_id: str) -> dict:
 
 
 async def create_conversation(empresa_id: str, data: dict) -> dict:
-    """Cria uma nova conversa."""
+    """Cria uma nova conversa.
+
+    Já existindo conversa para (instância, telefone), retorna 409; use
+    `get_or_create_conversation_by_phone` para buscar ou criar.
+    """
     supabase = get_supabase()
 
     data["empresa_id"] = empresa_id
-
-    result = supabase.table("chat_conversations").insert(data).execute()
+    if data.get("fone"):
+        data["fone"] = data["fone"].strip()
+
+    try:
+        result = supabase.table("chat_conversations").insert(data).execute()
+    except APIError as exc:
+        if exc.code == UNIQUE_VIOLATION:
+            raise ConflictException(
+                "Já existe conversa para este telefone nesta instância; "
+                "use PUT /chat/conversations/by-phone"
+            ) from exc
+        raise
 
     return await get_conversation(empresa_id, result.data[0]["id"])
 
 
+async def get_or_create_conversation_by_phone(
+    empresa_id: str, data: dict
+) -> tuple[dict, bool]:
+    """Retorna a conversa de (instância, telefone) ou a cria, atomicamente.
+
+    Uma única chamada (RPC `get_or_create_conversation_by_phone`) com
+    `INSERT ... ON CONFLICT DO NOTHING` sobre o índice único
+    `(empresa_id, instance_id, fone)`: chamadas concorrentes para o mesmo
+    contato nunca criam duplicatas.
+
+    Returns:
+        Tupla (conversa, criada).
+    """
+    supabase = get_supabase()
+
+    instance_id = data.pop("instance_id")
+    fone = data.pop("fone").strip()
+
+    try:
+        result = supabase.rpc(
+            "get_or_create_conversation_by_phone",
+            {
+                "p_empresa_id": empresa_id,
+                "p_instance_id": instance_id,
+                "p_fone": fone,
+                "p_defaults": data,
+            },
+        ).execute()
+    except APIError as exc:
+        if exc.code == NO_DATA_FOUND:
+            raise NotFoundException(
+                f"Instância '{instance_id}' não encontrada"
+            ) from exc
+        raise
+
+    conversation = result.data
+    created = conversation.pop("created", False)
+    return conversation, created
+
+
 async def update_conversation(
     empresa_id: str, conversation_id: str, data: dict
 ) -> dict:
@@ -142,6 +218,97 @@ async def close_conversation(empresa_id: str, conversation_id: str) -> dict:
     )
 
 
+# =====================================================
+# Inbox
+# =====================================================
+
+INBOX_UNREAD_CAP = 100
+
+
+async def get_inbox(
+    empresa_id: str,
+    limit: int = 20,
+    before: str | None = None,
+    user_id: str | None = None,
+    status: str | None = None,
+    instance_id: str | None = None,
+    assigned_user_id: str | None = None,
+) -> dict:
+    """Caixa de entrada: conversas com prévia da última mensagem e não lidas.
+
+    Montada em uma única chamada (RPC `chat_inbox`, ver
+    `migration_chat_inbox.sql`), paginada por cursor na atividade mais
+    recente. `unread_count` conta mensagens inbound após a última leitura
+    do atendente (`user_id` ou, se omitido, o atendente atribuído), limitada
+    a `INBOX_UNREAD_CAP`.
+    """
+    supabase = get_supabase()
+
+    before_at = before_id = None
+    if before:
+        before_at, before_id = decode_timestamp_cursor(before)
+
+    result = supabase.rpc(
+        "chat_inbox",
+        {
+            "p_empresa_id": empresa_id,
+            "p_user_id": user_id,
+            "p_status": status,
+            "p_instance_id": instance_id,
+            "p_assigned_user_id": assigned_user_id,
+            "p_before_at": before_at,
+            "p_before_id": before_id,
+            "p_limit": limit + 1,
+            "p_unread_cap": INBOX_UNREAD_CAP,
+        },
+    ).execute()
+
+    rows = result.data or []
+    has_more = len(rows) > limit
+    conversations = rows[:limit]
+
+    next_before = None
+    if has_more:
+        last = conversations[-1]
+        next_before = encode_cursor(last["activity_at"], last["id"])
+
+    return build_cursor_response(
+        data=conversations,
+        limit=limit,
+        has_more=has_more,
+        next_before=next_before,
+        next_after=None,
+    )
+
+
+async def mark_conversation_read(
+    empresa_id: str,
+    conversation_id: str,
+    user_id: str,
+    read_at: str | None = None,
+) -> dict:
+    """Registra até onde o atendente leu a conversa (zera as não lidas)."""
+    supabase = get_supabase()
+
+    await get_conversation(empresa_id, conversation_id)
+
+    result = (
+        supabase.table("chat_conversation_reads")
+        .upsert(
+            {
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "empresa_id": empresa_id,
+                "last_read_at": read_at or datetime.now(timezone.utc).isoformat(),
+            },
+            on_conflict="conversation_id,user_id",
+        )
+        .execute()
+    )
+
+    return result.data[0]
+
+
 # =====================================================
 # Messages
 # =====================================================
@@ -178,30 +345,191 @@ async def list_messages(
     )
 
 
-async def create_message(
-    empresa_id: str, conversation_id: str, data: dict
+def _message_cursor(message: dict) -> str:
+    return encode_cursor(message["timestamp"], message["id"])
+
+
+async def list_messages_cursor(
+    empresa_id: str,
+    conversation_id: str,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
 ) -> dict:
-    """Registra uma nova mensagem em uma conversa."""
+    """Lista mensagens por cursor em (timestamp, id), mais recentes primeiro.
+
+    - Sem cursor: as `limit` mensagens mais recentes da conversa.
+    - `before`: mensagens anteriores ao cursor (rolar para o passado).
+    - `after`: mensagens posteriores ao cursor (buscar novas).
+
+    Não usa offset nem `count="exact"`: o custo independe do tamanho da
+    conversa (índice em `(conversation_id, timestamp, id)`).
+    """
+    if before and after:
+        raise ValidationException("Informe apenas um entre `before` e `after`")
+
     supabase = get_supabase()
 
     await get_conversation(empresa_id, conversation_id)
 
-    data["conversation_id"] = conversation_id
-    data["empresa_id"] = empresa_id
+    query = (
+        supabase.table("chat_messages")
+        .select(MESSAGE_SELECT)
+        .eq("conversation_id", conversation_id)
+        .eq("empresa_id", empresa_id)
+        .not_.is_("timestamp", "null")
+    )
 
-    result = supabase.table("chat_messages").insert(data).execute()
+    if after:
+        timestamp, message_id = decode_timestamp_cursor(after)
+        query = query.or_(
+            f'timestamp.gt."{timestamp}",'
+            f'and(timestamp.eq."{timestamp}",id.gt."{message_id}")'
+        )
+        ascending = True
+    else:
+        if before:
+            timestamp, message_id = decode_timestamp_cursor(before)
+            query = query.or_(
+                f'timestamp.lt."{timestamp}",'
+                f'and(timestamp.eq."{timestamp}",id.lt."{message_id}")'
+            )
+        ascending = False
 
-    # Atualizar contagem e last_message_at na conversa
-    now = datetime.now(timezone.utc).isoformat()
-    supabase.rpc(
-        "increment_message_count",
-        {"conv_id": conversation_id},
-    ).execute() if False else None  # RPC pode não existir
+    query = (
+        query.order("timestamp", desc=not ascending)
+        .order("id", desc=not ascending)
+        .limit(limit + 1)
+    )
 
-    # Fallback: atualizar via update direto
-    supabase.table("chat_conversations").update({
-        "last_message_at": now,
-        "updated_at": now,
-    }).eq("id", conversation_id).execute()
+    rows = query.execute().data or []
+    has_more = len(rows) > limit
+    messages = rows[:limit]
+
+    # `after` busca em ordem crescente para pegar as imediatamente seguintes;
+    # a resposta é sempre da mais recente para a mais antiga.
+    if ascending:
+        messages.reverse()
+
+    # Página vazia: a direção consultada mantém o cursor recebido (o polling
+    # com `after` continua do mesmo ponto); a outra não tem itens a seguir.
+    if messages:
+        next_before = _message_cursor(messages[-1])
+        next_after = _message_cursor(messages[0])
+    else:
+        next_before, next_after = before, after
+    return build_cursor_response(
+        data=messages,
+        limit=limit,
+        has_more=has_more,
+        next_before=next_before,
+        next_after=next_after,
+    )
 
-    return result.data[0]
+
+async def create_message(
+    empresa_id: str, conversation_id: str, data: dict
+) -> dict:
+    """Registra uma nova mensagem em uma conversa.
+
+    Uma única chamada (RPC `ingest_chat_message`): valida que a conversa é
+    da empresa e insere a mensagem; `message_count`, `last_message_at` e a
+    prévia são atualizados na mesma transação pelo trigger de
+    `chat_messages` (ver `migration_chat_message_ingest.sql`).
+    """
+    supabase = get_supabase()
+
+    try:
+        result = supabase.rpc(
+            "ingest_chat_message",
+            {
+                "p_empresa_id": empresa_id,
+                "p_conversation_id": conversation_id,
+                "p_message": data,
+            },
+        ).execute()
+    except APIError as exc:
+        if exc.code == NO_DATA_FOUND:
+            raise NotFoundException(
+                f"Conversa '{conversation_id}' não encontrada"
+            ) from exc
+        raise
+
+    return result.data
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def create_messages_bulk(empresa_id: str, messages: list[dict]) -> dict:
+    """Ingestão em lote de mensagens de várias conversas.
+
+    - Valida a posse de cada conversa distinta uma única vez (consultas `in`).
+    - Deduplica por `external_id`, no lote e contra o banco
+      (`ON CONFLICT DO NOTHING` em `(empresa_id, external_id)`).
+    - Insere em INSERTs multi-linha de até `BULK_INSERT_CHUNK` mensagens;
+      o trigger por statement atualiza os contadores de cada conversa uma
+      vez por INSERT (ver `migration_chat_messages_bulk.sql`).
+    """
+    supabase = get_supabase()
+
+    conversation_ids = list(dict.fromkeys(m["conversation_id"] for m in messages))
+    owned: set[str] = set()
+    for chunk in _chunks(conversation_ids, BULK_LOOKUP_CHUNK):
+        result = (
+            supabase.table("chat_conversations")
+            .select("id")
+            .eq("empresa_id", empresa_id)
+            .in_("id", chunk)
+            .execute()
+        )
+        owned.update(row["id"] for row in result.data or [])
+
+    rejected = []
+    rows = []
+    seen_external_ids: set[str] = set()
+    duplicates = 0
+
+    for index, message in enumerate(messages):
+        conversation_id = message["conversation_id"]
+        if conversation_id not in owned:
+            rejected.append({
+                "index": index,
+                "conversation_id": conversation_id,
+                "error": "Conversa não encontrada",
+            })
+            continue
+
+        external_id = message.get("external_id")
+        if external_id:
+            if external_id in seen_external_ids:
+                duplicates += 1
+                continue
+            seen_external_ids.add(external_id)
+
+        rows.append({**message, "empresa_id": empresa_id})
+
+    inserted = 0
+    for chunk in _chunks(rows, BULK_INSERT_CHUNK):
+        result = (
+            supabase.table("chat_messages")
+            .upsert(
+                chunk,
+                on_conflict="empresa_id,external_id",
+                ignore_duplicates=True,
+                default_to_null=False,
+            )
+            .execute()
+        )
+        count = len(result.data or [])
+        inserted += count
+        duplicates += len(chunk) - count
+
+    return {
+        "received": len(messages),
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "rejected": rejected,
+    }
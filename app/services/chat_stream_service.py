@@ -0,0 +1,128 @@
+"""Stream em tempo real das novas mensagens de chat (Server-Sent Events).
+
+Uma única assinatura Supabase Realtime em `chat_messages` (INSERT) é
+compartilhada por todo o processo: cada mensagem recebida é distribuída em
+memória para as filas dos ouvintes da conversa e da caixa de entrada da
+empresa. N ouvintes custam uma assinatura upstream.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from typing import Any
+
+from app.utils.realtime import RealtimeChannel
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_TOPIC = "api-chat-messages"
+QUEUE_MAX_SIZE = 500
+HEARTBEAT_SECONDS = 15.0
+
+
+class _MessageBroker:
+    """Distribui as mensagens da assinatura Realtime para filas locais."""
+
+    def __init__(self) -> None:
+        self._by_conversation: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._by_empresa: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._realtime = RealtimeChannel(
+            CHANNEL_TOPIC, [("INSERT", "chat_messages")], self._on_insert
+        )
+
+    def _on_insert(self, payload: dict) -> None:
+        record = (payload.get("data") or {}).get("record")
+        if not record:
+            return
+        queues = self._by_conversation.get(record.get("conversation_id"), set())
+        queues = queues | self._by_empresa.get(record.get("empresa_id"), set())
+        for queue in queues:
+            if queue.full():
+                # Ouvinte lento: descarta a mais antiga para não bloquear os demais
+                queue.get_nowait()
+            queue.put_nowait(record)
+
+    async def ensure_subscribed(self) -> None:
+        """Abre a assinatura Realtime compartilhada, se ainda não estiver aberta."""
+        await self._realtime.subscribe()
+
+    def subscribe(
+        self, empresa_id: str, conversation_id: str | None = None
+    ) -> asyncio.Queue:
+        """Registra um ouvinte da conversa (ou da caixa de entrada da empresa)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+        if conversation_id:
+            self._by_conversation[conversation_id].add(queue)
+        else:
+            self._by_empresa[empresa_id].add(queue)
+        return queue
+
+    def unsubscribe(
+        self,
+        queue: asyncio.Queue,
+        empresa_id: str,
+        conversation_id: str | None = None,
+    ) -> None:
+        if conversation_id:
+            registry, key = self._by_conversation, conversation_id
+        else:
+            registry, key = self._by_empresa, empresa_id
+        listeners = registry.get(key)
+        if listeners is None:
+            return
+        listeners.discard(queue)
+        if not listeners:
+            del registry[key]
+
+    async def close(self) -> None:
+        await self._realtime.close()
+
+
+_broker = _MessageBroker()
+
+
+def _format_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\nid: {data.get('id', '')}\ndata: {json.dumps(data)}\n\n"
+
+
+async def open_stream(
+    empresa_id: str, conversation_id: str | None = None
+) -> AsyncIterator[str]:
+    """Abre um stream SSE com as novas mensagens (conversa ou caixa de entrada).
+
+    A assinatura Realtime é aberta antes de retornar, para que falhas de
+    conexão virem erro HTTP e não um stream vazio. A fila do ouvinte só é
+    registrada quando o gerador começa a ser iterado: se o cliente cair
+    antes da resposta começar, não sobra fila órfã no broker.
+    """
+    await _broker.ensure_subscribed()
+    return _event_stream(empresa_id, conversation_id)
+
+
+async def _event_stream(
+    empresa_id: str, conversation_id: str | None
+) -> AsyncIterator[str]:
+    """Gera os eventos SSE, com heartbeat para manter a conexão em proxies."""
+    queue = _broker.subscribe(empresa_id, conversation_id)
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                record = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if record.get("empresa_id") != empresa_id:
+                continue
+            yield _format_event("message", record)
+    finally:
+        _broker.unsubscribe(queue, empresa_id, conversation_id)
+
+
+async def shutdown() -> None:
+    """Encerra a assinatura Realtime compartilhada (shutdown da aplicação)."""
+    await _broker.close()
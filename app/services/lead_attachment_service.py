@@ -1,10 +1,10 @@
 import time
 from datetime import datetime, timezone
-from urllib.parse import urlparse
 
 from fastapi import UploadFile
 
 from app.core.exceptions import NotFoundException, ValidationException
+from app.services import storage_cleanup_service
 from app.utils.supabase_client import get_supabase
 
 BUCKET = "lead-attachments"
@@ -52,29 +52,20 @@ def _get_public_url(file_path: str) -> str:
     return get_supabase().storage.from_(BUCKET).get_public_url(file_path)
 
 
-def _delete_from_storage(file_path: str | None) -> None:
-    if not file_path:
-        return
-    try:
-        get_supabase().storage.from_(BUCKET).remove([file_path])
-    except Exception:
-        pass
-
-
-def _delete_from_storage_by_url(url: str | None) -> None:
-    if not url:
-        return
-    try:
-        parsed = urlparse(url)
-        marker = f"/{BUCKET}/"
-        idx = parsed.path.find(marker)
-        if idx == -1:
-            return
-        object_path = parsed.path[idx + len(marker):]
-        if object_path:
-            get_supabase().storage.from_(BUCKET).remove([object_path])
-    except Exception:
-        pass
+def schedule_storage_cleanup(attachments: list[dict]) -> None:
+    """Agenda a remoção dos arquivos dos anexos (já apagados do banco)."""
+    # `file_path` e o caminho da URL pública costumam ser o mesmo objeto
+    storage_cleanup_service.schedule_removal(
+        BUCKET,
+        [
+            path
+            for attachment in attachments
+            for path in (
+                attachment.get("file_path"),
+                storage_cleanup_service.object_path(attachment.get("url"), BUCKET),
+            )
+        ],
+    )
 
 
 def _log_attachment_history(
@@ -186,7 +177,7 @@ async def upload_attachment(
     result = supabase.table("lead_attachments").insert(payload).execute()
 
     if not result.data:
-        _delete_from_storage(file_path)
+        storage_cleanup_service.schedule_removal(BUCKET, [file_path])
         raise ValidationException("Erro ao registrar anexo no banco de dados")
 
     attachment = result.data[0]
@@ -205,16 +196,15 @@ async def upload_attachment(
 async def delete_attachment(
     empresa_id: str, lead_id: str, attachment_id: str
 ) -> None:
-    """Remove um anexo do storage e do banco de dados."""
+    """Remove um anexo do banco de dados e, em background, do storage."""
     attachment = await get_attachment(empresa_id, lead_id, attachment_id)
 
-    _delete_from_storage_by_url(attachment.get("url"))
-    _delete_from_storage(attachment.get("file_path"))
-
     get_supabase().table("lead_attachments").delete().eq(
         "id", attachment_id
     ).eq("lead_id", lead_id).eq("empresa_id", empresa_id).execute()
 
+    schedule_storage_cleanup([attachment])
+
     _log_attachment_history(
         lead_id=lead_id,
         empresa_id=empresa_id,
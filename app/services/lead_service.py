@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 
 from app.core.exceptions import NotFoundException, ValidationException
+from app.services import lead_attachment_service
 from app.utils.pagination import build_paginated_response, paginate_query
 from app.utils.supabase_client import get_supabase
 
@@ -128,16 +129,30 @@ async def update_lead(empresa_id: str, lead_id: str, data: dict) -> dict:
 
 
 async def delete_lead(empresa_id: str, lead_id: str) -> None:
-    """Deleta um lead."""
+    """Deleta um lead.
+
+    Os arquivos dos anexos são removidos do storage em background, depois
+    do delete no banco.
+    """
     supabase = get_supabase()
 
     # Verificar se existe
     await get_lead(empresa_id, lead_id)
 
+    attachments = (
+        supabase.table("lead_attachments")
+        .select("file_path, url")
+        .eq("lead_id", lead_id)
+        .eq("empresa_id", empresa_id)
+        .execute()
+    )
+
     supabase.table("leads").delete().eq("id", lead_id).eq(
         "empresa_id", empresa_id
     ).execute()
 
+    lead_attachment_service.schedule_storage_cleanup(attachments.data or [])
+
 
 async def move_lead_stage(
     empresa_id: str, lead_id: str, new_stage_id: str, notes: str | None = None
@@ -84,3 +84,55 @@ async def list_stages(empresa_id: str, pipeline_id: str) -> list[dict]:
     )
 
     return result.data or []
+
+
+async def get_pipeline_analytics(
+    empresa_id: str,
+    pipeline_id: str,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict:
+    """Calcula conversão e permanência por stage a partir do histórico.
+
+    A agregação roda inteira no banco (RPC `pipeline_stage_analytics`,
+    ver `migration_pipeline_analytics.sql`) em uma única passada sobre
+    `lead_pipeline_history`.
+    """
+    supabase = get_supabase()
+
+    pipeline = await get_pipeline(empresa_id, pipeline_id)
+
+    result = supabase.rpc(
+        "pipeline_stage_analytics",
+        {
+            "p_empresa_id": empresa_id,
+            "p_pipeline_id": pipeline_id,
+            "p_date_from": date_from,
+            "p_date_to": date_to,
+        },
+    ).execute()
+
+    metrics = {row["stage_id"]: row for row in result.data or []}
+
+    stages = []
+    for stage in pipeline.get("stages") or []:
+        row = metrics.get(stage["id"], {})
+        entries = row.get("entries") or 0
+        advanced = row.get("advanced") or 0
+        stages.append({
+            "stage_id": stage["id"],
+            "name": stage["name"],
+            "position": stage["position"],
+            "entries": entries,
+            "advanced": advanced,
+            "conversion_rate": advanced / entries if entries else None,
+            "dwell_median_seconds": row.get("dwell_median_seconds"),
+            "dwell_p90_seconds": row.get("dwell_p90_seconds"),
+        })
+
+    return {
+        "pipeline_id": pipeline_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "stages": stages,
+    }
@@ -0,0 +1,234 @@
+"""Feed do catálogo ativo para marketplaces (Google Merchant, Meta).
+
+Exporta todos os produtos/serviços ativos da empresa em CSV, XML (RSS 2.0
+com o namespace `g:` do Google Merchant) ou NDJSON. Os itens são lidos
+por keyset em `id`, página a página, e emitidos em streaming: a memória
+fica limitada a uma página, qualquer que seja o tamanho do catálogo.
+
+Antes de gerar o corpo, o ETag/Last-Modified sai da RPC
+`product_feed_validator` (agregado dos produtos + versão de imagens e
+categorias); se nada mudou, a resposta é 304.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+from app.services.product_service import ACTIVE_STATUS
+from app.utils.conditional_get import is_not_modified
+from app.utils.supabase_client import get_supabase
+
+FEED_SELECT = (
+    "id, sku, nome, descricao, marca, preco, preco_promocional, "
+    "quantidade_estoque, tipo, updated_at, "
+    "category:product_categories(nome), images:product_images(url, position)"
+)
+
+FEED_PAGE_SIZE = 1000
+FEED_CURRENCY = "BRL"
+# Limite de imagens adicionais do Google Merchant
+MAX_ADDITIONAL_IMAGES = 10
+
+FEED_FIELDS = (
+    "id",
+    "sku",
+    "title",
+    "description",
+    "brand",
+    "product_type",
+    "price",
+    "sale_price",
+    "availability",
+    "quantity",
+    "image_link",
+    "additional_image_link",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# =====================================================
+# Formatação dos itens
+# =====================================================
+
+
+def _price(value) -> str | None:
+    if value is None:
+        return None
+    return f"{float(value):.2f} {FEED_CURRENCY}"
+
+
+def _feed_item(product: dict) -> dict:
+    images = sorted(product.get("images") or [], key=lambda img: img.get("position", 0))
+    urls = [img["url"] for img in images if img.get("url")]
+    in_stock = product.get("tipo") == "servico" or (product.get("quantidade_estoque") or 0) > 0
+
+    return {
+        "id": product["id"],
+        "sku": product.get("sku"),
+        "title": product.get("nome"),
+        "description": product.get("descricao") or product.get("nome"),
+        "brand": product.get("marca"),
+        "product_type": (product.get("category") or {}).get("nome"),
+        "price": _price(product.get("preco")),
+        "sale_price": _price(product.get("preco_promocional")),
+        "availability": "in_stock" if in_stock else "out_of_stock",
+        "quantity": product.get("quantidade_estoque") or 0,
+        "image_link": urls[0] if urls else None,
+        "additional_image_link": urls[1:1 + MAX_ADDITIONAL_IMAGES],
+    }
+
+
+def _csv_rows(rows: list[list]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\r\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def _csv_page(items: list[dict]) -> str:
+    return _csv_rows([
+        [
+            ",".join(item[field]) if field == "additional_image_link"
+            else "" if item[field] is None else item[field]
+            for field in FEED_FIELDS
+        ]
+        for item in items
+    ])
+
+
+def _xml_item(item: dict) -> str:
+    parts = ["<item>"]
+    for field in FEED_FIELDS:
+        values = item[field] if field == "additional_image_link" else [item[field]]
+        for value in values:
+            if value is not None:
+                parts.append(f"<g:{field}>{escape(str(value))}</g:{field}>")
+    parts.append("</item>\n")
+    return "".join(parts)
+
+
+def _xml_page(items: list[dict]) -> str:
+    return "".join(_xml_item(item) for item in items)
+
+
+def _ndjson_page(items: list[dict]) -> str:
+    return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+
+
+_XML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+    "<channel>\n<title>Catálogo</title>\n<description>Catálogo de produtos</description>\n"
+)
+
+# formato -> (cabeçalho, página, rodapé)
+_FORMATS: dict[str, tuple[str, Callable[[list[dict]], str], str]] = {
+    "csv": (_csv_rows([list(FEED_FIELDS)]), _csv_page, ""),
+    "xml": (_XML_HEADER, _xml_page, "</channel>\n</rss>\n"),
+    "ndjson": ("", _ndjson_page, ""),
+}
+
+
+# =====================================================
+# Consulta e validadores HTTP
+# =====================================================
+
+
+def _validators(empresa_id: str, feed_format: str) -> tuple[str, datetime | None]:
+    """ETag e Last-Modified do feed (`migration_product_feed.sql`).
+
+    Combina a contagem de produtos ativos e o maior `updated_at` dos
+    produtos da empresa com a versão de imagens e categorias, então
+    inativação, exclusão, venda, reordenação de imagens e renomeação de
+    categorias invalidam o feed; movimentos de reserva não.
+    """
+    result = get_supabase().rpc(
+        "product_feed_validator", {"p_empresa_id": empresa_id}
+    ).execute()
+    row = result.data[0] if result.data else {}
+    last_modified = (
+        datetime.fromisoformat(row["last_modified"]).astimezone(timezone.utc)
+        if row.get("last_modified")
+        else None
+    )
+
+    raw = "|".join(
+        str(part)
+        for part in (
+            empresa_id,
+            feed_format,
+            row.get("active_count", 0),
+            row.get("products_updated_at"),
+            row.get("catalog_version", 0),
+        )
+    )
+    etag = f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+    return etag, last_modified
+
+
+async def _feed_stream(empresa_id: str, feed_format: str) -> AsyncIterator[str]:
+    header, page, footer = _FORMATS[feed_format]
+    if header:
+        yield header
+
+    cursor: str | None = None
+    while True:
+        query = (
+            get_supabase()
+            .table("products")
+            .select(FEED_SELECT)
+            .eq("empresa_id", empresa_id)
+            .eq("status", ACTIVE_STATUS)
+        )
+        if cursor:
+            query = query.gt("id", cursor)
+        rows = query.order("id").limit(FEED_PAGE_SIZE).execute().data or []
+
+        if rows:
+            yield page([_feed_item(row) for row in rows])
+
+        if len(rows) < FEED_PAGE_SIZE:
+            break
+        cursor = rows[-1]["id"]
+
+    if footer:
+        yield footer
+
+
+async def build_feed(
+    empresa_id: str,
+    feed_format: str,
+    *,
+    if_none_match: str | None = None,
+    if_modified_since: str | None = None,
+) -> dict:
+    """Prepara o feed do catálogo ativo no formato pedido.
+
+    Retorna `headers` (ETag, Last-Modified), `media_type` e `stream`;
+    `stream` é `None` quando o cliente já tem a versão atual (responder 304).
+    """
+    etag, last_modified = _validators(empresa_id, feed_format)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return {"headers": headers, "media_type": MEDIA_TYPES[feed_format], "stream": None}
+
+    return {
+        "headers": headers,
+        "media_type": MEDIA_TYPES[feed_format],
+        "stream": _feed_stream(empresa_id, feed_format),
+    }
@@ -1,9 +1,18 @@
+from postgrest.exceptions import APIError
+
 from app.core.exceptions import NotFoundException, ValidationException
-from app.services.product_service import _delete_image_from_storage
+from app.services import storage_cleanup_service
+from app.services.product_service import PRODUCT_IMAGES_BUCKET
 from app.utils.supabase_client import get_supabase
 
 IMAGE_SELECT = "id, product_id, empresa_id, url, position, created_at"
 
+# SQLSTATEs da RPC reorder_product_images
+NO_DATA_FOUND = "P0002"
+INVALID_PARAMETER_VALUE = "22023"
+# Id que não é UUID no cast de `p_image_ids`
+INVALID_TEXT_REPRESENTATION = "22P02"
+
 
 async def list_product_images(empresa_id: str, product_id: str) -> list[dict]:
     """Lista imagens de um produto, ordenadas por position."""
@@ -55,36 +64,58 @@ async def attach_product_image(
 
 
 async def delete_product_image(empresa_id: str, image_id: str) -> None:
-    """Remove a imagem do banco e do storage."""
+    """Remove a imagem do banco e, em background, do storage."""
     image = await get_product_image(empresa_id, image_id)
 
-    _delete_image_from_storage(image.get("url"))
-
     get_supabase().table("product_images").delete().eq("id", image_id).eq(
         "empresa_id", empresa_id
     ).execute()
 
+    storage_cleanup_service.schedule_removal(
+        PRODUCT_IMAGES_BUCKET,
+        [storage_cleanup_service.object_path(image.get("url"), PRODUCT_IMAGES_BUCKET)],
+    )
+
 
 async def reorder_product_images(
     empresa_id: str, product_id: str, image_ids: list[str]
 ) -> list[dict]:
-    """Reordena as imagens de um produto pela ordem dos IDs informados."""
+    """Reordena as imagens de um produto pela ordem dos IDs informados.
+
+    As imagens informadas ficam nas posições 0..n-1 e as demais seguem
+    depois, na ordem atual. A renumeração é um único UPDATE atômico
+    (RPC `reorder_product_images`), que já retorna a lista ordenada.
+    """
     if not image_ids:
         raise ValidationException("Informe pelo menos um image_id")
 
     supabase = get_supabase()
 
-    existing = await list_product_images(empresa_id, product_id)
-    existing_ids = {img["id"] for img in existing}
-    missing = [img_id for img_id in image_ids if img_id not in existing_ids]
-    if missing:
-        raise ValidationException(
-            f"Imagens não pertencem ao produto: {', '.join(missing)}"
+    try:
+        result = (
+            supabase.rpc(
+                "reorder_product_images",
+                {
+                    "p_empresa_id": empresa_id,
+                    "p_product_id": product_id,
+                    "p_image_ids": list(dict.fromkeys(image_ids)),
+                },
+            )
+            .select(IMAGE_SELECT)
+            .order("position")
+            .execute()
         )
+    except APIError as exc:
+        if exc.code == NO_DATA_FOUND:
+            raise NotFoundException(f"Produto '{product_id}' não encontrado") from exc
+        if exc.code == INVALID_PARAMETER_VALUE:
+            raise ValidationException(
+                f"Imagens não pertencem ao produto: {exc.details}"
+            ) from exc
+        if exc.code == INVALID_TEXT_REPRESENTATION:
+            raise ValidationException(
+                f"Imagens não pertencem ao produto: {exc.message}"
+            ) from exc
+        raise
 
-    for index, image_id in enumerate(image_ids):
-        supabase.table("product_images").update({"position": index}).eq(
-            "id", image_id
-        ).eq("product_id", product_id).eq("empresa_id", empresa_id).execute()
-
-    return await list_product_images(empresa_id, product_id)
+    return result.data or []
@@ -0,0 +1,210 @@
+"""Reservas de estoque com expiração, para fluxos de checkout.
+
+A reserva segura a quantidade em `products.quantidade_reservada` até ser
+confirmada (vira venda) ou liberada. Reservas não encerradas expiram em
+`expires_at`; um sweeper em background as libera em lote, e as funções de
+reserva/venda também expiram as vencidas do produto antes de decidir.
+Toda a contabilidade roda em RPCs atômicas
+(`migration_product_reservations.sql`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from postgrest.exceptions import APIError
+
+from app.core.config import get_settings
+from app.core.exceptions import (
+    ConflictException,
+    NotFoundException,
+    ValidationException,
+)
+from app.utils.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_SELECT = (
+    "id, empresa_id, product_id, quantidade, status, expires_at, reference, "
+    "created_at, updated_at"
+)
+
+# SQLSTATEs das RPCs de reserva
+NO_DATA_FOUND = "P0002"
+CHECK_VIOLATION = "23514"
+INVALID_PARAMETER_VALUE = "22023"
+NOT_IN_PREREQUISITE_STATE = "55000"
+
+_CLOSED_MESSAGES = {
+    "reservation_expired": "Reserva expirada",
+    "reservation_released": "Reserva já liberada",
+    "reservation_committed": "Reserva já confirmada",
+}
+
+_sweeper: asyncio.Task | None = None
+_stop = asyncio.Event()
+
+
+def _reservation_rpc(function: str, params: dict) -> dict:
+    try:
+        result = get_supabase().rpc(function, params).execute()
+    except APIError as exc:
+        if exc.code == NO_DATA_FOUND:
+            if "p_reservation_id" in params:
+                raise NotFoundException(
+                    f"Reserva '{params['p_reservation_id']}' não encontrada"
+                ) from exc
+            raise NotFoundException(
+                f"Produto '{params['p_product_id']}' não encontrado"
+            ) from exc
+        if exc.code == CHECK_VIOLATION:
+            raise ConflictException("Estoque disponível insuficiente") from exc
+        if exc.code == INVALID_PARAMETER_VALUE:
+            raise ValidationException("Serviços não têm estoque para reservar") from exc
+        if exc.code == NOT_IN_PREREQUISITE_STATE:
+            raise ConflictException(
+                _CLOSED_MESSAGES.get(exc.message or "", "Reserva encerrada")
+            ) from exc
+        raise
+
+    return result.data[0]
+
+
+# =====================================================
+# Reservas
+# =====================================================
+
+
+async def create_reservation(
+    empresa_id: str,
+    product_id: str,
+    *,
+    quantidade: int,
+    ttl_seconds: int,
+    reference: str | None = None,
+) -> dict:
+    """Reserva `quantidade` do estoque disponível por `ttl_seconds`.
+
+    Retorna 409 se o estoque disponível (estoque menos reservas ativas)
+    não comportar a quantidade.
+    """
+    return _reservation_rpc(
+        "reserve_product_stock",
+        {
+            "p_empresa_id": empresa_id,
+            "p_product_id": product_id,
+            "p_quantidade": quantidade,
+            "p_ttl_seconds": ttl_seconds,
+            "p_reference": reference,
+        },
+    )
+
+
+async def get_reservation(
+    empresa_id: str, product_id: str, reservation_id: str
+) -> dict:
+    """Busca uma reserva do produto."""
+    result = (
+        get_supabase()
+        .table("product_reservations")
+        .select(RESERVATION_SELECT)
+        .eq("id", reservation_id)
+        .eq("product_id", product_id)
+        .eq("empresa_id", empresa_id)
+        .execute()
+    )
+
+    if not result.data:
+        raise NotFoundException(f"Reserva '{reservation_id}' não encontrada")
+
+    return result.data[0]
+
+
+async def commit_reservation(
+    empresa_id: str, product_id: str, reservation_id: str
+) -> dict:
+    """Confirma a reserva como venda, baixando o estoque reservado.
+
+    Idempotente para reservas já confirmadas; reservas liberadas ou
+    expiradas retornam 409.
+    """
+    return _reservation_rpc(
+        "commit_product_reservation",
+        {
+            "p_empresa_id": empresa_id,
+            "p_product_id": product_id,
+            "p_reservation_id": reservation_id,
+        },
+    )
+
+
+async def release_reservation(
+    empresa_id: str, product_id: str, reservation_id: str
+) -> dict:
+    """Libera a reserva, devolvendo a quantidade ao estoque disponível.
+
+    Idempotente para reservas já liberadas ou expiradas; reservas
+    confirmadas retornam 409.
+    """
+    return _reservation_rpc(
+        "release_product_reservation",
+        {
+            "p_empresa_id": empresa_id,
+            "p_product_id": product_id,
+            "p_reservation_id": reservation_id,
+        },
+    )
+
+
+# =====================================================
+# Sweeper de reservas expiradas
+# =====================================================
+
+
+def _expire_batch() -> int:
+    settings = get_settings()
+    result = get_supabase().rpc(
+        "expire_product_reservations",
+        {"p_limit": settings.RESERVATION_SWEEP_BATCH_SIZE},
+    ).execute()
+    return result.data or 0
+
+
+async def _sweep() -> None:
+    settings = get_settings()
+
+    while not _stop.is_set():
+        try:
+            expired = _expire_batch()
+        except Exception:
+            logger.exception("Falha ao expirar reservas de estoque")
+            expired = 0
+
+        # Lote cheio: provavelmente há mais vencidas, segue sem esperar
+        if expired >= settings.RESERVATION_SWEEP_BATCH_SIZE:
+            continue
+
+        try:
+            await asyncio.wait_for(
+                _stop.wait(), timeout=settings.RESERVATION_SWEEP_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_sweeper() -> None:
+    """Sobe o sweeper de reservas expiradas (startup da aplicação)."""
+    global _sweeper
+    _stop.clear()
+    _sweeper = asyncio.create_task(_sweep())
+
+
+async def stop_sweeper() -> None:
+    """Para o sweeper; reservas vencidas são liberadas no próximo startup."""
+    global _sweeper
+    _stop.set()
+    if _sweeper is not None:
+        _sweeper.cancel()
+        await asyncio.gather(_sweeper, return_exceptions=True)
+        _sweeper = None
@@ -1,13 +1,20 @@
 from datetime import datetime, timezone
-from urllib.parse import urlparse
 
-from app.core.exceptions import NotFoundException, ValidationException
+from postgrest.exceptions import APIError
+
+from app.core.exceptions import (
+    ConflictException,
+    NotFoundException,
+    ValidationException,
+)
+from app.services import storage_cleanup_service
 from app.utils.pagination import build_paginated_response, paginate_query
 from app.utils.supabase_client import get_supabase
 
 PRODUCT_SELECT = (
     "id, empresa_id, nome, descricao, sku, categoria_id, marca, preco, "
-    "preco_promocional, quantidade_estoque, unidade_medida, status, tipo, "
+    "preco_promocional, quantidade_estoque, quantidade_reservada, "
+    "unidade_medida, status, tipo, "
     "duracao_estimada, recorrencia, created_at, updated_at, "
     "category:product_categories(id, empresa_id, nome, descricao, created_at), "
     "images:product_images(id, product_id, empresa_id, url, position, created_at)"
@@ -17,6 +24,17 @@ SOLD_STATUS = "vendido"
 ACTIVE_STATUS = "ativo"
 PRODUCT_IMAGES_BUCKET = "product-images"
 
+# Sincronização em lote por SKU
+BULK_LOOKUP_CHUNK = 200
+BULK_WRITE_CHUNK = 1000
+BULK_FIELDS = ("nome", "preco", "preco_promocional", "quantidade_estoque", "status")
+# Campos que aceitam `null` explícito (ex.: remover a promoção)
+BULK_NULLABLE_FIELDS = ("preco", "preco_promocional")
+
+# SQLSTATEs das RPCs de estoque (migration_product_stock.sql)
+NO_DATA_FOUND = "P0002"
+CHECK_VIOLATION = "23514"
+
 
 # =====================================================
 # Helpers
@@ -28,10 +46,18 @@ def _now_iso() -> str:
 
 
 def _normalize_product(product: dict) -> dict:
-    """Ordena imagens por position (espelha o comportamento do frontend)."""
+    """Ordena imagens por position (espelha o comportamento do frontend).
+
+    Também calcula `quantidade_disponivel` (estoque fora de reservas ativas).
+    """
     images = product.get("images") or []
     images.sort(key=lambda img: img.get("position", 0))
     product["images"] = images
+    product["quantidade_disponivel"] = max(
+        0,
+        (product.get("quantidade_estoque") or 0)
+        - (product.get("quantidade_reservada") or 0),
+    )
     return product
 
 
@@ -48,7 +74,11 @@ def _apply_filters(
     only_promotion: bool,
     status_produto: str | None,
 ):
-    """Replica `applyProductFilters` do frontend (productService.ts)."""
+    """Replica `applyProductFilters` do frontend (productService.ts).
+
+    A RPC `product_facets` (`migration_product_facets.sql`) aplica os mesmos
+    filtros em SQL; alterações aqui devem ser refletidas lá.
+    """
     if search:
         like = f"%{search}%"
         query = query.or_(
@@ -110,6 +140,28 @@ def _apply_sort(query, sort_by: str | None):
     return query.order(column, desc=not ascending, nullsfirst=False)
 
 
+def _stock_rpc(function: str, params: dict, *, insufficient: Exception) -> dict:
+    """Executa uma RPC de estoque (`migration_product_stock.sql`).
+
+    Retorna o produto alterado já com categoria e imagens; estoque
+    insuficiente levanta `insufficient`.
+    """
+    supabase = get_supabase()
+
+    try:
+        result = supabase.rpc(function, params).select(PRODUCT_SELECT).execute()
+    except APIError as exc:
+        if exc.code == NO_DATA_FOUND:
+            raise NotFoundException(
+                f"Produto '{params['p_product_id']}' não encontrado"
+            ) from exc
+        if exc.code == CHECK_VIOLATION:
+            raise insufficient from exc
+        raise
+
+    return _normalize_product(result.data[0])
+
+
 # =====================================================
 # CRUD
 # =====================================================
@@ -167,6 +219,59 @@ async def list_products(
     )
 
 
+async def get_product_facets(
+    empresa_id: str,
+    *,
+    search: str | None = None,
+    categoria_id: str | None = None,
+    tipo: str | None = None,
+    status: list[str] | None = None,
+    marca: list[str] | None = None,
+    preco_min: float | None = None,
+    preco_max: float | None = None,
+    only_promotion: bool = False,
+    status_produto: str | None = None,
+    buckets: int = 10,
+) -> dict:
+    """Contagens por categoria, marca, tipo e status, faixa de preços e histograma.
+
+    Aceita os mesmos filtros de `list_products`; a agregação roda inteira no
+    banco (RPC `product_facets`), numa única consulta sobre o conjunto filtrado.
+    """
+    supabase = get_supabase()
+
+    result = supabase.rpc(
+        "product_facets",
+        {
+            "p_empresa_id": empresa_id,
+            "p_search": search or None,
+            "p_categoria_id": categoria_id,
+            "p_tipo": tipo,
+            "p_status": status or None,
+            "p_marca": marca or None,
+            "p_preco_min": preco_min,
+            "p_preco_max": preco_max,
+            "p_only_promotion": only_promotion,
+            "p_status_produto": status_produto,
+            "p_buckets": buckets,
+        },
+    ).execute()
+
+    facets = result.data or {}
+    counts = facets.get("counts") or {}
+
+    return {
+        "total": facets.get("total") or 0,
+        "categoria_id": counts.get("categoria_id") or [],
+        "marca": counts.get("marca") or [],
+        "tipo": counts.get("tipo") or [],
+        "status": counts.get("status") or [],
+        "preco": facets.get("preco") or {},
+        "preco_promocional": facets.get("preco_promocional") or {},
+        "histogram": facets.get("histogram") or [],
+    }
+
+
 async def get_product(empresa_id: str, product_id: str) -> dict:
     """Busca um produto/serviço por ID."""
     supabase = get_supabase()
@@ -196,11 +301,24 @@ async def create_product(empresa_id: str, data: dict) -> dict:
 
 
 async def update_product(empresa_id: str, product_id: str, data: dict) -> dict:
-    """Atualiza parcialmente um produto/serviço."""
+    """Atualiza parcialmente um produto/serviço.
+
+    `quantidade_estoque` passa por `adjust_stock` (atômico, 409 abaixo do
+    reservado) antes dos demais campos; um `status` enviado junto prevalece
+    sobre o derivado do estoque.
+    """
     supabase = get_supabase()
 
     await get_product(empresa_id, product_id)
 
+    if data.get("quantidade_estoque") is not None:
+        product = await adjust_stock(
+            empresa_id, product_id, quantidade_estoque=data.pop("quantidade_estoque")
+        )
+        if not data:
+            return product
+    data.pop("quantidade_estoque", None)
+
     data["updated_at"] = _now_iso()
     supabase.table("products").update(data).eq("id", product_id).eq(
         "empresa_id", empresa_id
@@ -210,7 +328,11 @@ async def update_product(empresa_id: str, product_id: str, data: dict) -> dict:
 
 
 async def delete_product(empresa_id: str, product_id: str) -> None:
-    """Deleta um produto/serviço (e remove imagens associadas do storage)."""
+    """Deleta um produto/serviço (e remove imagens associadas do storage).
+
+    As imagens são removidas do storage em background, num único lote,
+    depois do delete no banco.
+    """
     supabase = get_supabase()
 
     await get_product(empresa_id, product_id)
@@ -223,13 +345,18 @@ async def delete_product(empresa_id: str, product_id: str) -> None:
         .execute()
     )
 
-    for image in images.data or []:
-        _delete_image_from_storage(image.get("url"))
-
     supabase.table("products").delete().eq("id", product_id).eq(
         "empresa_id", empresa_id
     ).execute()
 
+    storage_cleanup_service.schedule_removal(
+        PRODUCT_IMAGES_BUCKET,
+        [
+            storage_cleanup_service.object_path(image.get("url"), PRODUCT_IMAGES_BUCKET)
+            for image in images.data or []
+        ],
+    )
+
 
 # =====================================================
 # Ações especiais
@@ -243,33 +370,23 @@ async def mark_product_as_sold(
 
     - Serviço (`tipo='servico'`): muda status para `vendido` sem mexer em estoque.
     - Produto: decrementa estoque; quando chega a 0, status vira `vendido`.
+      Vender mais que o estoque disponível retorna 409.
+
+    A baixa é atômica (RPC `sell_product`): vendas simultâneas não perdem
+    atualizações nem vendem além do estoque.
     """
     if quantidade_vendida <= 0:
         raise ValidationException("A quantidade vendida deve ser maior que zero")
 
-    supabase = get_supabase()
-    product = await get_product(empresa_id, product_id)
-
-    is_service = (product.get("tipo") or "produto") == "servico"
-    now = _now_iso()
-
-    if is_service:
-        update_payload = {"status": SOLD_STATUS, "updated_at": now}
-    else:
-        estoque_atual = product.get("quantidade_estoque") or 0
-        novo_estoque = max(0, estoque_atual - quantidade_vendida)
-        novo_status = SOLD_STATUS if novo_estoque == 0 else ACTIVE_STATUS
-        update_payload = {
-            "quantidade_estoque": novo_estoque,
-            "status": novo_status,
-            "updated_at": now,
-        }
-
-    supabase.table("products").update(update_payload).eq("id", product_id).eq(
-        "empresa_id", empresa_id
-    ).execute()
-
-    return await get_product(empresa_id, product_id)
+    return _stock_rpc(
+        "sell_product",
+        {
+            "p_empresa_id": empresa_id,
+            "p_product_id": product_id,
+            "p_quantidade": quantidade_vendida,
+        },
+        insufficient=ConflictException("Estoque insuficiente para a quantidade vendida"),
+    )
 
 
 async def mark_product_as_available(empresa_id: str, product_id: str) -> dict:
@@ -291,44 +408,167 @@ async def adjust_stock(
     delta: int | None = None,
     quantidade_estoque: int | None = None,
 ) -> dict:
-    """Ajusta o estoque por delta (relativo) ou valor absoluto."""
-    supabase = get_supabase()
-    product = await get_product(empresa_id, product_id)
+    """Ajusta o estoque por delta (relativo) ou valor absoluto.
 
-    if quantidade_estoque is not None:
-        novo_estoque = quantidade_estoque
-    else:
-        atual = product.get("quantidade_estoque") or 0
-        novo_estoque = atual + (delta or 0)
-
-    if novo_estoque < 0:
+    Atômico (RPC `adjust_product_stock`): ajustes simultâneos se somam, e
+    deixar o estoque abaixo do reservado em reservas ativas (ou negativo)
+    retorna 409. Produto que zera vira `vendido`; produto `vendido`
+    reabastecido volta a `ativo`.
+    """
+    if quantidade_estoque is not None and quantidade_estoque < 0:
         raise ValidationException("Estoque não pode ficar negativo")
 
-    supabase.table("products").update(
-        {"quantidade_estoque": novo_estoque, "updated_at": _now_iso()}
-    ).eq("id", product_id).eq("empresa_id", empresa_id).execute()
-
-    return await get_product(empresa_id, product_id)
+    return _stock_rpc(
+        "adjust_product_stock",
+        {
+            "p_empresa_id": empresa_id,
+            "p_product_id": product_id,
+            "p_delta": delta,
+            "p_quantidade": quantidade_estoque,
+        },
+        insufficient=ConflictException("Estoque insuficiente para o ajuste"),
+    )
 
 
 # =====================================================
-# Storage helpers
+# Sincronização em lote (ERP)
 # =====================================================
 
 
-def _delete_image_from_storage(image_url: str | None) -> None:
-    """Remove um arquivo do bucket `product-images` a partir da URL pública."""
-    if not image_url:
-        return
-    try:
-        parsed = urlparse(image_url)
-        marker = f"/{PRODUCT_IMAGES_BUCKET}/"
-        idx = parsed.path.find(marker)
-        if idx == -1:
-            return
-        object_path = parsed.path[idx + len(marker):]
-        if object_path:
-            get_supabase().storage.from_(PRODUCT_IMAGES_BUCKET).remove([object_path])
-    except Exception:
-        # Falha em remover do storage não deve bloquear o delete do registro
-        pass
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _same_value(current, new) -> bool:
+    if isinstance(current, (int, float)) and isinstance(new, (int, float)):
+        return abs(float(current) - float(new)) < 1e-9
+    return current == new
+
+
+async def bulk_upsert_products(
+    empresa_id: str, items: list[dict], *, create_missing: bool = False
+) -> dict:
+    """Sincroniza preço/estoque de um lote de itens, identificados por SKU.
+
+    - Resolve os SKUs em consultas `in` de até `BULK_LOOKUP_CHUNK`.
+    - Compara cada item com os valores atuais e grava só o que mudou, num
+      UPDATE por lote (RPC `bulk_update_products`) que altera apenas os
+      campos enviados.
+    - Com `create_missing`, SKUs inexistentes que trazem `nome` são criados
+      em INSERTs multi-linha.
+    - Estoque segue as regras de `adjust_stock`: não fica abaixo do
+      reservado (o SKU vira `error`) e, sem `status` no item, o produto que
+      zera vira `vendido` e o `vendido` reabastecido volta a `ativo`.
+
+    Retorna o resultado por SKU (`created`, `updated`, `unchanged`,
+    `not_found` ou `error`).
+    """
+    supabase = get_supabase()
+
+    select = "id, sku, " + ", ".join(BULK_FIELDS)
+    skus = list(dict.fromkeys(item["sku"] for item in items))
+    current: dict[str, list[dict]] = {}
+    for chunk in _chunks(skus, BULK_LOOKUP_CHUNK):
+        result = (
+            supabase.table("products")
+            .select(select)
+            .eq("empresa_id", empresa_id)
+            .in_("sku", chunk)
+            .execute()
+        )
+        for row in result.data or []:
+            current.setdefault(row["sku"], []).append(row)
+
+    results: list[dict] = []
+    updates: list[dict] = []
+    inserts: list[dict] = []
+    seen: set[str] = set()
+
+    for item in items:
+        sku = item["sku"]
+        if sku in seen:
+            results.append({"sku": sku, "status": "error", "error": "SKU repetido no lote"})
+            continue
+        seen.add(sku)
+
+        matches = current.get(sku) or []
+        if len(matches) > 1:
+            results.append({
+                "sku": sku,
+                "status": "error",
+                "error": "SKU associado a mais de um produto",
+            })
+            continue
+
+        if not matches:
+            if create_missing and item.get("nome"):
+                inserts.append({**item, "empresa_id": empresa_id})
+                results.append({"sku": sku, "status": "created"})
+            elif create_missing:
+                results.append({
+                    "sku": sku,
+                    "status": "error",
+                    "error": "`nome` é obrigatório para criar o produto",
+                })
+            else:
+                results.append({"sku": sku, "status": "not_found"})
+            continue
+
+        product = matches[0]
+        changes = {
+            field: item[field]
+            for field in BULK_FIELDS
+            if field in item
+            and (item[field] is not None or field in BULK_NULLABLE_FIELDS)
+            and not _same_value(product.get(field), item[field])
+        }
+        if changes:
+            updates.append({"id": product["id"], **changes})
+            results.append({"sku": sku, "id": product["id"], "status": "updated"})
+        else:
+            results.append({"sku": sku, "id": product["id"], "status": "unchanged"})
+
+    # Um lote rejeitado pelo banco marca só os próprios SKUs como erro
+    failed: dict[str, str] = {}
+    for chunk in _chunks(updates, BULK_WRITE_CHUNK):
+        try:
+            result = supabase.rpc(
+                "bulk_update_products", {"p_empresa_id": empresa_id, "p_rows": chunk}
+            ).execute()
+        except APIError as exc:
+            failed.update({row["id"]: exc.message or "Falha ao atualizar" for row in chunk})
+            continue
+        # A RPC não altera linhas cujo estoque ficaria abaixo do reservado
+        updated_ids = {row["id"] for row in result.data or []}
+        failed.update({
+            row["id"]: "Estoque menor que a quantidade reservada"
+            for row in chunk
+            if row["id"] not in updated_ids
+        })
+
+    created_ids: dict[str, str] = {}
+    for chunk in _chunks(inserts, BULK_WRITE_CHUNK):
+        try:
+            result = (
+                supabase.table("products")
+                .insert(chunk, default_to_null=False)
+                .execute()
+            )
+        except APIError as exc:
+            failed.update({row["sku"]: exc.message or "Falha ao criar" for row in chunk})
+            continue
+        created_ids.update({row["sku"]: row["id"] for row in result.data or []})
+
+    for entry in results:
+        if entry["status"] == "created":
+            entry["id"] = created_ids.get(entry["sku"])
+        key = entry.get("id") or entry["sku"]
+        if entry["status"] in ("created", "updated") and key in failed:
+            entry["status"], entry["error"] = "error", failed[key]
+
+    summary = {
+        status: sum(1 for entry in results if entry["status"] == status)
+        for status in ("created", "updated", "unchanged", "not_found", "error")
+    }
+    return {"received": len(items), **summary, "results": results}
@@ -0,0 +1,192 @@
+"""Remoção de arquivos do Supabase Storage em background, em lote.
+
+Os deletes de produtos, imagens e anexos apagam o registro no banco e só
+enfileiram os caminhos em `storage_cleanup_queue`; a resposta não espera o
+storage. Um worker em background reserva lotes da fila
+(`claim_storage_cleanup`, com lease), remove por bucket em chamadas
+`remove([...])` de até `REMOVE_BATCH_SIZE` e apaga as linhas removidas.
+Falhas voltam para a fila com backoff exponencial e são tentadas de novo
+até dar certo; como a fila é persistente, um restart ou queda do processo
+não deixa arquivos órfãos.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+from app.core.config import get_settings
+from app.utils.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# Limite de caminhos por chamada `remove` da Storage API
+REMOVE_BATCH_SIZE = 1000
+# Tempo até outro worker reassumir um lote reservado e não concluído
+LEASE_SECONDS = 300
+
+_worker: asyncio.Task | None = None
+_stop = asyncio.Event()
+_wake = asyncio.Event()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def object_path(url: str | None, bucket: str) -> str | None:
+    """Caminho do objeto no bucket a partir da URL pública (ou `None`)."""
+    if not url:
+        return None
+    marker = f"/{bucket}/"
+    path = urlparse(url).path
+    idx = path.find(marker)
+    if idx == -1:
+        return None
+    return path[idx + len(marker):] or None
+
+
+def schedule_removal(bucket: str, paths: list[str | None]) -> None:
+    """Enfileira a remoção dos arquivos (caminhos vazios são ignorados)."""
+    rows = [{"bucket": bucket, "path": path} for path in dict.fromkeys(paths) if path]
+    if not rows:
+        return
+    try:
+        get_supabase().table("storage_cleanup_queue").upsert(
+            rows, on_conflict="bucket,path", ignore_duplicates=True
+        ).execute()
+    except Exception:
+        # O registro já foi apagado: não falha a requisição por causa do arquivo
+        logger.exception(
+            "Falha ao enfileirar %d arquivo(s) do bucket %s; órfãos: %s",
+            len(rows), bucket, [row["path"] for row in rows],
+        )
+        return
+    _wake.set()
+
+
+# =====================================================
+# Worker
+# =====================================================
+
+
+def _backoff_seconds(attempts: int) -> float:
+    settings = get_settings()
+    return min(
+        settings.STORAGE_CLEANUP_BACKOFF_MAX_SECONDS,
+        settings.STORAGE_CLEANUP_BACKOFF_SECONDS * 2 ** (attempts - 1),
+    )
+
+
+def _claim_batch() -> list[dict]:
+    result = get_supabase().rpc(
+        "claim_storage_cleanup",
+        {
+            "p_limit": get_settings().STORAGE_CLEANUP_BATCH_SIZE,
+            "p_lease_seconds": LEASE_SECONDS,
+        },
+    ).execute()
+    return result.data or []
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _remove(bucket: str, jobs: list[dict]) -> None:
+    supabase = get_supabase()
+    ids = [job["id"] for job in jobs]
+
+    try:
+        await asyncio.to_thread(
+            supabase.storage.from_(bucket).remove, [job["path"] for job in jobs]
+        )
+    except Exception as exc:
+        attempts = min(job["attempts"] for job in jobs)
+        if attempts >= get_settings().STORAGE_CLEANUP_MAX_ATTEMPTS:
+            logger.exception(
+                "Falha ao remover %d arquivo(s) do bucket %s após %d tentativas; "
+                "seguem na fila",
+                len(jobs), bucket, attempts,
+            )
+        retry_at = _now() + timedelta(seconds=_backoff_seconds(attempts))
+        supabase.table("storage_cleanup_queue").update({
+            "next_attempt_at": retry_at.isoformat(),
+            "locked_until": None,
+            "last_error": str(exc)[:1000],
+        }).in_("id", ids).execute()
+        return
+
+    supabase.table("storage_cleanup_queue").delete().in_("id", ids).execute()
+
+
+async def _process(jobs: list[dict]) -> None:
+    by_bucket: dict[str, list[dict]] = defaultdict(list)
+    for job in jobs:
+        by_bucket[job["bucket"]].append(job)
+
+    results = await asyncio.gather(
+        *(
+            _remove(bucket, batch)
+            for bucket, bucket_jobs in by_bucket.items()
+            for batch in _batches(bucket_jobs, REMOVE_BATCH_SIZE)
+        ),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            # Linhas não atualizadas voltam à fila quando o lease expirar
+            logger.error("Falha ao registrar remoção de arquivos", exc_info=result)
+
+
+async def _run() -> None:
+    settings = get_settings()
+
+    while not _stop.is_set():
+        try:
+            jobs = _claim_batch()
+        except Exception:
+            logger.exception("Falha ao reservar arquivos da fila de remoção")
+            jobs = []
+
+        if jobs:
+            await _process(jobs)
+            if len(jobs) >= settings.STORAGE_CLEANUP_BATCH_SIZE:
+                continue
+
+        _wake.clear()
+        try:
+            await asyncio.wait_for(
+                _wake.wait(), timeout=settings.STORAGE_CLEANUP_POLL_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            continue
+        # Acordado por um delete: espera mais caminhos para o mesmo lote
+        try:
+            await asyncio.wait_for(
+                _stop.wait(), timeout=settings.STORAGE_CLEANUP_DELAY_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_worker() -> None:
+    """Sobe o worker da fila de remoção (startup da aplicação)."""
+    global _worker
+    _stop.clear()
+    _worker = asyncio.create_task(_run())
+
+
+async def stop_worker() -> None:
+    """Para o worker; o que estiver pendente é removido no próximo startup."""
+    global _worker
+    _stop.set()
+    _wake.set()
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+        _worker = None
@@ -0,0 +1,233 @@
+"""Broadcast (campanha) de uma mensagem WhatsApp para várias conversas.
+
+Os alvos e seus `instance_id` são resolvidos em lote; o envio passa por um
+pool de tarefas com limite global de concorrência e um token bucket por
+instância (compartilhado entre broadcasts do processo), respeitando a vazão
+suportada por cada número de WhatsApp. Cada resultado é emitido assim que
+o envio termina.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.exceptions import ValidationException
+from app.services.whatsapp_send_service import build_webhook_payload, post_to_gateway
+from app.utils.rate_limit import TokenBucket
+from app.utils.supabase_client import get_supabase
+
+TARGET_SELECT = 'id, instance_id, fone, "Nome_Whatsapp"'
+
+# Tamanho dos lotes: ids por consulta `in` e linhas por página no filtro
+LOOKUP_CHUNK = 200
+PAGE_SIZE = 1000
+
+_instance_buckets: dict[str, TokenBucket] = {}
+
+
+def _bucket_for(instance_id: str) -> TokenBucket:
+    bucket = _instance_buckets.get(instance_id)
+    if bucket is None:
+        settings = get_settings()
+        bucket = TokenBucket(
+            rate=settings.BROADCAST_RATE_PER_INSTANCE,
+            capacity=settings.BROADCAST_BURST_PER_INSTANCE,
+        )
+        _instance_buckets[instance_id] = bucket
+    return bucket
+
+
+# =====================================================
+# Resolução dos alvos
+# =====================================================
+
+
+def _resolve_by_ids(empresa_id: str, conversation_ids: list[str]) -> list[dict]:
+    supabase = get_supabase()
+    found: dict[str, dict] = {}
+
+    for start in range(0, len(conversation_ids), LOOKUP_CHUNK):
+        chunk = conversation_ids[start:start + LOOKUP_CHUNK]
+        result = (
+            supabase.table("chat_conversations")
+            .select(TARGET_SELECT)
+            .eq("empresa_id", empresa_id)
+            .in_("id", chunk)
+            .execute()
+        )
+        found.update({row["id"]: row for row in result.data or []})
+
+    return [found.get(cid, {"id": cid, "missing": True}) for cid in conversation_ids]
+
+
+def _resolve_by_filter(empresa_id: str, filters: dict[str, Any]) -> list[dict]:
+    supabase = get_supabase()
+    max_targets = get_settings().BROADCAST_MAX_TARGETS
+    targets: list[dict] = []
+
+    while True:
+        query = (
+            supabase.table("chat_conversations")
+            .select(TARGET_SELECT)
+            .eq("empresa_id", empresa_id)
+        )
+        for column, value in filters.items():
+            query = query.eq(column, value)
+
+        start = len(targets)
+        rows = query.order("id").range(start, start + PAGE_SIZE - 1).execute().data or []
+        targets.extend(rows)
+
+        if len(targets) > max_targets:
+            raise ValidationException(
+                f"O filtro seleciona mais de {max_targets} conversas"
+            )
+        if len(rows) < PAGE_SIZE:
+            return targets
+
+
+# =====================================================
+# Envio
+# =====================================================
+
+
+def _render(template: str | None, target: dict) -> str | None:
+    """Substitui `{nome}` e `{fone}` pelos dados da conversa."""
+    if template is None:
+        return None
+    return (
+        template.replace("{nome}", target.get("Nome_Whatsapp") or "")
+        .replace("{fone}", target.get("fone") or "")
+    )
+
+
+async def _send_target(
+    empresa_id: str, target: dict, message: dict[str, Any]
+) -> dict[str, Any]:
+    payload = {**message, "content": _render(message.get("content"), target)}
+    body = build_webhook_payload(
+        empresa_id=empresa_id,
+        conversation_id=target["id"],
+        instance_id=target["instance_id"],
+        payload=payload,
+    )
+
+    try:
+        await post_to_gateway(body)
+    except HTTPException as exc:
+        return {"conversation_id": target["id"], "status": "failed", "error": str(exc.detail)}
+
+    return {"conversation_id": target["id"], "status": "sent", "error": None}
+
+
+async def _dispatch_instance(
+    empresa_id: str,
+    instance_id: str,
+    targets: list[dict],
+    message: dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    results: asyncio.Queue,
+) -> None:
+    bucket = _bucket_for(instance_id)
+
+    async def send_one(target: dict) -> None:
+        async with semaphore:
+            try:
+                result = await _send_target(empresa_id, target, message)
+            except Exception as exc:
+                result = {
+                    "conversation_id": target["id"],
+                    "status": "failed",
+                    "error": str(exc),
+                }
+        await results.put(result)
+
+    tasks = []
+    try:
+        for target in targets:
+            await bucket.acquire()
+            tasks.append(asyncio.create_task(send_one(target)))
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def start_broadcast(
+    empresa_id: str,
+    message: dict[str, Any],
+    conversation_ids: list[str] | None = None,
+    filters: dict[str, Any] | None = None,
+) -> AsyncIterator[str]:
+    """Resolve os alvos e retorna o stream NDJSON com o resultado de cada envio.
+
+    A resolução acontece antes de retornar, para que erros de validação
+    virem resposta HTTP e não um stream interrompido.
+    """
+    if conversation_ids:
+        targets = _resolve_by_ids(empresa_id, list(dict.fromkeys(conversation_ids)))
+    else:
+        targets = _resolve_by_filter(empresa_id, filters or {})
+
+    return _broadcast_stream(empresa_id, targets, message)
+
+
+async def _broadcast_stream(
+    empresa_id: str, targets: list[dict], message: dict[str, Any]
+) -> AsyncIterator[str]:
+    settings = get_settings()
+    results: asyncio.Queue = asyncio.Queue()
+    by_instance: dict[str, list[dict]] = {}
+    skipped = []
+
+    for target in targets:
+        if target.get("missing"):
+            skipped.append({
+                "conversation_id": target["id"],
+                "status": "skipped",
+                "error": "Conversa não encontrada",
+            })
+        elif not target.get("instance_id"):
+            skipped.append({
+                "conversation_id": target["id"],
+                "status": "skipped",
+                "error": "Conversa não possui `instance_id` vinculado",
+            })
+        else:
+            by_instance.setdefault(target["instance_id"], []).append(target)
+
+    semaphore = asyncio.Semaphore(settings.BROADCAST_CONCURRENCY)
+    dispatchers = [
+        asyncio.create_task(
+            _dispatch_instance(
+                empresa_id, instance_id, group, message, semaphore, results
+            )
+        )
+        for instance_id, group in by_instance.items()
+    ]
+
+    totals = {"sent": 0, "failed": 0, "skipped": len(skipped)}
+    pending = sum(len(group) for group in by_instance.values())
+
+    try:
+        for result in skipped:
+            yield json.dumps({"type": "result", **result}) + "\n"
+
+        while pending:
+            result = await results.get()
+            pending -= 1
+            totals[result["status"]] += 1
+            yield json.dumps({"type": "result", **result}) + "\n"
+
+        yield json.dumps({"type": "summary", "total": len(targets), **totals}) + "\n"
+    finally:
+        # Cliente desconectou: interrompe os envios ainda não realizados
+        for task in dispatchers:
+            task.cancel()
+        await asyncio.gather(*dispatchers, return_exceptions=True)
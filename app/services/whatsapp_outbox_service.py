@@ -0,0 +1,248 @@
+"""Fila persistente (outbox) de envios WhatsApp.
+
+O envio assíncrono grava a mensagem em `whatsapp_outbox` e responde na
+hora; workers em background entregam ao gateway via
+`whatsapp_send_service.post_to_gateway`, com retry e backoff exponencial
+para falhas transitórias; 4xx do gateway falham na hora.
+A entrega é at-least-once: o `send_id` vai no body para o gateway
+deduplicar reentregas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.exceptions import NotFoundException
+from app.services import whatsapp_send_service
+from app.utils.supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SELECT = (
+    "id, conversation_id, status, attempts, next_attempt_at, last_error, "
+    "webhook_response, sent_at, created_at, updated_at"
+)
+
+# Margem do lease além do timeout do gateway antes de outro worker reassumir
+LEASE_MARGIN_SECONDS = 30
+# Respostas 4xx do gateway que ainda podem dar certo numa nova tentativa
+RETRYABLE_CLIENT_ERRORS = {408, 429}
+
+_workers: list[asyncio.Task] = []
+_stop = asyncio.Event()
+_wake = asyncio.Event()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# =====================================================
+# Enfileiramento e consulta
+# =====================================================
+
+
+async def enqueue_message(
+    empresa_id: str,
+    conversation_id: str,
+    payload: dict[str, Any],
+    idempotency_key: str | None = None,
+) -> dict:
+    """Valida a conversa, grava o envio na outbox e acorda os workers.
+
+    Com `idempotency_key`, repetir a chamada devolve o envio já registrado
+    em vez de criar outro.
+    """
+    supabase = get_supabase()
+
+    send_id = str(uuid.uuid4())
+    body = await whatsapp_send_service.build_send_body(
+        empresa_id, conversation_id, payload
+    )
+    body["send_id"] = send_id
+
+    row = {
+        "id": send_id,
+        "empresa_id": empresa_id,
+        "conversation_id": conversation_id,
+        "idempotency_key": idempotency_key,
+        "payload": body,
+    }
+
+    if idempotency_key:
+        result = (
+            supabase.table("whatsapp_outbox")
+            .upsert(
+                row,
+                on_conflict="empresa_id,idempotency_key",
+                ignore_duplicates=True,
+            )
+            .execute()
+        )
+        if not result.data:
+            existing = (
+                supabase.table("whatsapp_outbox")
+                .select(OUTBOX_SELECT)
+                .eq("empresa_id", empresa_id)
+                .eq("idempotency_key", idempotency_key)
+                .execute()
+            )
+            return existing.data[0]
+    else:
+        supabase.table("whatsapp_outbox").insert(row).execute()
+
+    _wake.set()
+    return await get_send(empresa_id, send_id)
+
+
+async def get_send(empresa_id: str, send_id: str) -> dict:
+    """Busca o estado de entrega de um envio."""
+    supabase = get_supabase()
+
+    result = (
+        supabase.table("whatsapp_outbox")
+        .select(OUTBOX_SELECT)
+        .eq("id", send_id)
+        .eq("empresa_id", empresa_id)
+        .execute()
+    )
+
+    if not result.data:
+        raise NotFoundException(f"Envio '{send_id}' não encontrado")
+
+    return result.data[0]
+
+
+# =====================================================
+# Entrega (workers)
+# =====================================================
+
+
+def _backoff_seconds(attempts: int) -> float:
+    """Backoff exponencial com jitter: base * 2^(n-1), limitado ao máximo."""
+    settings = get_settings()
+    delay = min(
+        settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        settings.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _error_message(exc: HTTPException) -> str:
+    detail = exc.detail
+    if isinstance(detail, dict):
+        return f"{detail.get('message')} (HTTP {detail.get('status_code')})"
+    return str(detail)
+
+
+def _is_permanent(exc: HTTPException) -> bool:
+    """4xx do gateway (payload inválido, número inexistente) não melhora com retry.
+
+    Timeouts (504), falhas de rede (502 sem resposta), circuito aberto (503)
+    e respostas 5xx, 408 e 429 do gateway são transitórios.
+    """
+    detail = exc.detail
+    if not isinstance(detail, dict):
+        return False
+    upstream_status = detail.get("status_code") or 0
+    return 400 <= upstream_status < 500 and upstream_status not in RETRYABLE_CLIENT_ERRORS
+
+
+async def _deliver(job: dict) -> None:
+    supabase = get_supabase()
+    settings = get_settings()
+
+    try:
+        webhook_response = await whatsapp_send_service.post_to_gateway(job["payload"])
+    except HTTPException as exc:
+        attempts = job["attempts"]
+        update: dict[str, Any] = {
+            "last_error": _error_message(exc),
+            "locked_until": None,
+            "updated_at": _now().isoformat(),
+        }
+        if _is_permanent(exc) or attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            update["status"] = "failed"
+        else:
+            retry_at = _now() + timedelta(seconds=_backoff_seconds(attempts))
+            update["status"] = "pending"
+            update["next_attempt_at"] = retry_at.isoformat()
+        supabase.table("whatsapp_outbox").update(update).eq("id", job["id"]).execute()
+        return
+
+    now = _now().isoformat()
+    supabase.table("whatsapp_outbox").update({
+        "status": "sent",
+        "webhook_response": webhook_response,
+        "last_error": None,
+        "locked_until": None,
+        "sent_at": now,
+        "updated_at": now,
+    }).eq("id", job["id"]).execute()
+
+
+def _claim_batch() -> list[dict]:
+    settings = get_settings()
+    lease = int(settings.N8N_WEBHOOK_TIMEOUT_SECONDS) + LEASE_MARGIN_SECONDS
+    result = get_supabase().rpc(
+        "claim_whatsapp_outbox",
+        {"p_limit": settings.OUTBOX_BATCH_SIZE, "p_lease_seconds": lease},
+    ).execute()
+    return result.data or []
+
+
+async def _worker() -> None:
+    settings = get_settings()
+
+    while not _stop.is_set():
+        try:
+            jobs = _claim_batch()
+        except Exception:
+            logger.exception("Falha ao reservar envios da outbox")
+            jobs = []
+
+        if jobs:
+            results = await asyncio.gather(
+                *(_deliver(job) for job in jobs), return_exceptions=True
+            )
+            for job, result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        "Falha ao registrar entrega do envio %s", job["id"],
+                        exc_info=result,
+                    )
+            continue
+
+        _wake.clear()
+        try:
+            await asyncio.wait_for(
+                _wake.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+async def start_workers() -> None:
+    """Sobe os workers da outbox (startup da aplicação)."""
+    settings = get_settings()
+    _stop.clear()
+    for _ in range(settings.OUTBOX_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def stop_workers() -> None:
+    """Para os workers; envios em andamento voltam à fila pelo lease."""
+    _stop.set()
+    _wake.set()
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -6,7 +6,10 @@ facilitando evoluções futuras (retry, circuit-breaker, fila assíncrona, etc.)
 
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import random
+import time
 from typing import Any
 
 import httpx
@@ -14,6 +17,74 @@ from fastapi import HTTPException, status
 
 from app.core.config import get_settings
 from app.services import chat_service
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+_http_client: httpx.AsyncClient | None = None
+_breaker: CircuitBreaker | None = None
+
+
+# =====================================================
+# Cliente HTTP compartilhado
+# =====================================================
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    settings = get_settings()
+    return httpx.AsyncClient(
+        timeout=settings.N8N_WEBHOOK_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.N8N_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.N8N_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.N8N_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        # HTTP/2 exige o pacote `h2` (extra `httpx[http2]`)
+        http2=settings.N8N_HTTP2 and importlib.util.find_spec("h2") is not None,
+        headers={"Accept": "application/json"},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Retorna o cliente HTTP do gateway (singleton com keep-alive)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Retorna o circuit breaker do gateway (singleton por processo)."""
+    global _breaker
+    if _breaker is None:
+        settings = get_settings()
+        _breaker = CircuitBreaker(
+            window_seconds=settings.N8N_BREAKER_WINDOW_SECONDS,
+            min_calls=settings.N8N_BREAKER_MIN_CALLS,
+            error_rate=settings.N8N_BREAKER_ERROR_RATE,
+            open_seconds=settings.N8N_BREAKER_OPEN_SECONDS,
+            half_open_probes=settings.N8N_BREAKER_HALF_OPEN_PROBES,
+            min_timeout=settings.N8N_TIMEOUT_MIN_SECONDS,
+            max_timeout=settings.N8N_WEBHOOK_TIMEOUT_SECONDS,
+            timeout_multiplier=settings.N8N_TIMEOUT_P99_MULTIPLIER,
+        )
+    return _breaker
+
+
+async def startup() -> None:
+    """Cria o cliente HTTP compartilhado (startup da aplicação)."""
+    get_http_client()
+
+
+async def shutdown() -> None:
+    """Fecha o pool de conexões com o gateway (shutdown da aplicação)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# =====================================================
+# Envio
+# =====================================================
 
 
 def _generate_alet_num() -> int:
@@ -21,7 +92,7 @@ def _generate_alet_num() -> int:
     return random.randint(100000, 999999)
 
 
-def _build_webhook_payload(
+def build_webhook_payload(
     *,
     empresa_id: str,
     conversation_id: str,
@@ -51,21 +122,8 @@ def _parse_webhook_response(response: httpx.Response) -> dict[str, Any] | None:
     return data if isinstance(data, dict) else {"data": data}
 
 
-async def send_whatsapp_message(
-    empresa_id: str,
-    conversation_id: str,
-    payload: dict[str, Any],
-) -> dict[str, Any]:
-    """Encaminha a mensagem para o gateway externo de envio.
-
-    Fluxo:
-        1. Valida o tenant + carrega a conversa via `chat_service.get_conversation`.
-        2. Garante que a conversa tenha `instance_id` vinculado.
-        3. Faz POST no gateway configurado em `WEBHOOK_SEND_MESSAGE_URL`.
-        4. Mapeia erros de timeout (504) e respostas não-2xx (502).
-    """
-    conversation = await chat_service.get_conversation(empresa_id, conversation_id)
-
+def _require_instance_id(conversation: dict[str, Any]) -> str:
+    """Garante que a conversa tenha `instance_id` vinculado (400 caso contrário)."""
     instance_id = conversation.get("instance_id")
     if not instance_id:
         raise HTTPException(
@@ -75,34 +133,85 @@ async def send_whatsapp_message(
                 "mensagem via WhatsApp."
             ),
         )
+    return instance_id
 
-    settings = get_settings()
-    body = _build_webhook_payload(
+
+async def build_send_body(
+    empresa_id: str, conversation_id: str, payload: dict[str, Any]
+) -> dict[str, Any]:
+    """Valida a conversa do tenant e monta o body do gateway."""
+    conversation = await chat_service.get_conversation(empresa_id, conversation_id)
+
+    return build_webhook_payload(
         empresa_id=empresa_id,
         conversation_id=conversation_id,
-        instance_id=instance_id,
+        instance_id=_require_instance_id(conversation),
         payload=payload,
     )
 
+
+async def post_to_gateway(body: dict[str, Any]) -> dict[str, Any] | None:
+    """Faz POST no gateway e devolve a resposta decodificada.
+
+    Passa pelo circuit breaker: com o circuito aberto, falha na hora (503)
+    sem contatar o gateway; o timeout acompanha o p99 observado.
+    Mapeia erros de timeout (504) e respostas não-2xx / falhas de rede (502)
+    para `HTTPException`. Timeouts, falhas de rede e 5xx contam como erro
+    para o breaker.
+    """
+    settings = get_settings()
+    breaker = get_circuit_breaker()
+
     try:
-        async with httpx.AsyncClient(
-            timeout=settings.N8N_WEBHOOK_TIMEOUT_SECONDS
-        ) as client:
-            response = await client.post(
-                settings.N8N_WEBHOOK_SEND_MESSAGE_URL,
-                json=body,
-                headers={"Accept": "application/json"},
-            )
+        timeout = breaker.before_call()
+    except CircuitOpenError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Serviço de envio do WhatsApp indisponível no momento "
+                "(circuit breaker aberto)."
+            ),
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        ) from exc
+
+    started = time.monotonic()
+    try:
+        response = await get_http_client().post(
+            settings.N8N_WEBHOOK_SEND_MESSAGE_URL, json=body, timeout=timeout
+        )
+    except httpx.PoolTimeout as exc:
+        # Pool local de conexões esgotado: o gateway nem foi contatado
+        breaker.release()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Limite de conexões com o serviço de envio do WhatsApp atingido.",
+            headers={"Retry-After": "1"},
+        ) from exc
     except httpx.TimeoutException as exc:
+        breaker.record_failure(time.monotonic() - started)
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Timeout ao contatar o serviço de envio do WhatsApp.",
         ) from exc
     except httpx.HTTPError as exc:
+        breaker.record_failure(time.monotonic() - started)
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"Falha ao contatar o serviço de envio do WhatsApp: {exc}",
         ) from exc
+    except asyncio.CancelledError:
+        # Cliente desconectou ou shutdown: não diz nada sobre o gateway
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure(time.monotonic() - started)
+        raise
+
+    latency = time.monotonic() - started
+    if response.status_code >= 500:
+        breaker.record_failure(latency)
+    else:
+        breaker.record_success(latency)
 
     webhook_response = _parse_webhook_response(response)
 
@@ -116,6 +225,25 @@ async def send_whatsapp_message(
             },
         )
 
+    return webhook_response
+
+
+async def send_whatsapp_message(
+    empresa_id: str,
+    conversation_id: str,
+    payload: dict[str, Any],
+) -> dict[str, Any]:
+    """Encaminha a mensagem para o gateway externo de envio.
+
+    Fluxo:
+        1. Valida o tenant + carrega a conversa via `chat_service.get_conversation`.
+        2. Garante que a conversa tenha `instance_id` vinculado.
+        3. Faz POST no gateway configurado em `WEBHOOK_SEND_MESSAGE_URL`.
+        4. Mapeia circuito aberto (503), timeout (504) e respostas não-2xx (502).
+    """
+    body = await build_send_body(empresa_id, conversation_id, payload)
+    webhook_response = await post_to_gateway(body)
+
     return {
         "status": "sent",
         "webhook_response": webhook_response,
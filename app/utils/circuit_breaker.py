@@ -0,0 +1,141 @@
+import math
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito está aberto."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Circuito aberto")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com janela deslizante e timeout adaptativo.
+
+    - closed: chamadas passam; abre quando a taxa de erro na janela atinge
+      `error_rate` (com pelo menos `min_calls` chamadas).
+    - open: recusa na hora (`CircuitOpenError`) por `open_seconds`.
+    - half_open: deixa passar até `half_open_probes` chamadas simultâneas;
+      sucesso fecha o circuito, falha reabre.
+
+    O timeout de cada chamada acompanha o p99 das latências de sucesso na
+    janela (`p99 * timeout_multiplier`), limitado a [min_timeout, max_timeout].
+
+    Estado em memória, por processo.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_seconds: float,
+        min_calls: int,
+        error_rate: float,
+        open_seconds: float,
+        half_open_probes: int,
+        min_timeout: float,
+        max_timeout: float,
+        timeout_multiplier: float,
+        max_samples: int = 1000,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+        self._calls: deque[tuple[float, bool, float]] = deque(maxlen=max_samples)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and self._remaining_open() <= 0:
+            return "half_open"
+        return self._state
+
+    def _remaining_open(self) -> float:
+        return self._opened_at + self.open_seconds - time.monotonic()
+
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self) -> None:
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        """Percentil (0-100) das latências de sucesso na janela, em segundos."""
+        self._prune(time.monotonic())
+        latencies = sorted(latency for _, ok, latency in self._calls if ok)
+        if not latencies:
+            return None
+        index = max(0, math.ceil(percentile / 100 * len(latencies)) - 1)
+        return latencies[index]
+
+    def current_timeout(self) -> float:
+        """Timeout para a próxima chamada, adaptado ao p99 observado."""
+        successes = sum(1 for _, ok, _ in self._calls if ok)
+        p99 = self.latency_percentile(99)
+        if p99 is None or successes < self.min_calls:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def before_call(self) -> float:
+        """
+        Autoriza uma chamada e retorna o timeout a usar.
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto (ou sem vaga de probe)
+        """
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self._remaining_open())
+        if state == "half_open":
+            if self._probes_in_flight >= self.half_open_probes:
+                raise CircuitOpenError(self.open_seconds)
+            self._state = "half_open"
+            self._probes_in_flight += 1
+            return self.max_timeout
+        return self.current_timeout()
+
+    def record_success(self, latency: float) -> None:
+        if self._state == "half_open":
+            # Probe ok: fecha e descarta as falhas antigas da janela
+            self._state = "closed"
+            self._probes_in_flight = 0
+            self._calls.clear()
+        self._calls.append((time.monotonic(), True, latency))
+
+    def release(self) -> None:
+        """Chamada abandonada sem resultado (ex.: cancelada): não conta como erro.
+
+        No half-open, só devolve a vaga de probe.
+        """
+        if self._state == "half_open" and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def record_failure(self, latency: float) -> None:
+        if self._state == "half_open":
+            self._open()
+            return
+        if self._state == "open":
+            # Chamada iniciada antes da abertura: não prorroga o circuito
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, False, latency))
+        self._prune(now)
+
+        total = len(self._calls)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        if total >= self.min_calls and failures / total >= self.error_rate:
+            self._open()
@@ -0,0 +1,26 @@
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+
+def is_not_modified(
+    etag: str,
+    last_modified: datetime | None,
+    if_none_match: str | None,
+    if_modified_since: str | None,
+) -> bool:
+    """
+    Avalia um GET condicional (RFC 9110): `True` quando a resposta é 304.
+
+    `If-None-Match` tem precedência sobre `If-Modified-Since`; a comparação
+    de ETags é fraca (ignora o prefixo `W/`).
+    """
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
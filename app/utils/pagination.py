@@ -1,4 +1,10 @@
+import base64
+import json
 import math
+import uuid
+from datetime import datetime
+
+from app.core.exceptions import ValidationException
 
 
 def paginate_query(query, page: int, limit: int):
@@ -37,3 +43,99 @@ def build_paginated_response(data: list, total: int, page: int, limit: int) -> d
         "limit": limit,
         "total_pages": math.ceil(total / limit) if limit > 0 else 0,
     }
+
+
+def encode_cursor(*values: str) -> str:
+    """
+    Codifica os valores da chave de ordenação em um cursor opaco.
+
+    Args:
+        values: Valores da chave (ex: timestamp e id do último item)
+
+    Returns:
+        String base64 url-safe para ser devolvida ao cliente
+    """
+    raw = json.dumps(list(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[str]:
+    """
+    Decodifica um cursor gerado por `encode_cursor`.
+
+    Args:
+        cursor: Cursor recebido do cliente
+        size: Quantidade esperada de valores na chave
+
+    Returns:
+        Lista com os valores da chave de ordenação
+
+    Raises:
+        ValidationException: Se o cursor for inválido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValidationException("Cursor inválido") from exc
+
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(v, str) for v in values)
+    ):
+        raise ValidationException("Cursor inválido")
+
+    return values
+
+
+def decode_timestamp_cursor(cursor: str) -> tuple[str, str]:
+    """
+    Decodifica um cursor `(timestamp, id)` e valida os dois valores.
+
+    Os valores voltam normalizados (ISO 8601 e UUID canônico), seguros para
+    interpolar em filtros do PostgREST.
+
+    Args:
+        cursor: Cursor recebido do cliente
+
+    Returns:
+        Tupla (timestamp ISO, id UUID)
+
+    Raises:
+        ValidationException: Se o cursor for inválido
+    """
+    timestamp, item_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(timestamp).isoformat(), str(uuid.UUID(item_id))
+    except ValueError as exc:
+        raise ValidationException("Cursor inválido") from exc
+
+
+def build_cursor_response(
+    data: list,
+    limit: int,
+    has_more: bool,
+    next_before: str | None,
+    next_after: str | None,
+) -> dict:
+    """
+    Monta o dict de resposta paginada por cursor.
+
+    Args:
+        data: Lista de items retornados
+        limit: Limite por página
+        has_more: Se existem mais items na direção consultada
+        next_before: Cursor para buscar items anteriores
+        next_after: Cursor para buscar items posteriores
+
+    Returns:
+        Dict compatível com CursorPaginatedResponse
+    """
+    return {
+        "data": data,
+        "limit": limit,
+        "has_more": has_more,
+        "next_before": next_before,
+        "next_after": next_after,
+    }
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket assíncrono: `rate` fichas por segundo, até `capacity` acumuladas.
+
+    `acquire()` espera até haver uma ficha disponível, garantindo que a vazão
+    média não passe de `rate` (com rajadas de até `capacity`).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
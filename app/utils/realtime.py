@@ -0,0 +1,63 @@
+"""Canal Supabase Realtime compartilhado pelo processo."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from app.utils.supabase_client import get_async_supabase
+
+logger = logging.getLogger(__name__)
+
+
+class RealtimeChannel:
+    """Assinatura de mudanças (`postgres_changes`) aberta uma vez por processo.
+
+    `subscribe` é idempotente e serializado por um lock: chamadas
+    simultâneas não abrem canais duplicados.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        changes: Iterable[tuple[str, str]],
+        callback: Callable[[dict], None],
+    ) -> None:
+        self._topic = topic
+        self._changes = tuple(changes)
+        self._callback = callback
+        self._channel: Any = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def subscribed(self) -> bool:
+        return self._channel is not None
+
+    async def subscribe(self) -> bool:
+        """Assina o canal, se preciso. Retorna `True` se a assinatura foi aberta agora."""
+        if self._channel is not None:
+            return False
+        async with self._lock:
+            if self._channel is not None:
+                return False
+            client = await get_async_supabase()
+            channel = client.channel(self._topic)
+            for event, table in self._changes:
+                channel.on_postgres_changes(
+                    event, schema="public", table=table, callback=self._callback
+                )
+            await channel.subscribe()
+            self._channel = channel
+            return True
+
+    async def close(self) -> None:
+        if self._channel is None:
+            return
+        client = await get_async_supabase()
+        try:
+            await client.remove_channel(self._channel)
+        except Exception:
+            logger.exception("Falha ao encerrar o canal Realtime %s", self._topic)
+        self._channel = None
@@ -1,7 +1,8 @@
-from supabase import create_client, Client
+from supabase import AsyncClient, Client, acreate_client, create_client
 from app.core.config import get_settings
 
 _supabase_client: Client | None = None
+_async_supabase_client: AsyncClient | None = None
 
 
 def get_supabase() -> Client:
@@ -14,3 +15,15 @@ def get_supabase() -> Client:
             settings.SUPABASE_SERVICE_ROLE_KEY,
         )
     return _supabase_client
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Retorna o cliente Supabase assíncrono (singleton), usado pelo Realtime."""
+    global _async_supabase_client
+    if _async_supabase_client is None:
+        settings = get_settings()
+        _async_supabase_client = await acreate_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_SERVICE_ROLE_KEY,
+        )
+    return _async_supabase_client
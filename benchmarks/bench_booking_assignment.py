@@ -0,0 +1,89 @@
+"""Distribuição da atribuição automática de responsáveis num dia.
+
+Simula um dia de agenda em que parte dos membros já começa com
+agendamentos (criados manualmente) e atribui novos agendamentos pelo
+rodízio de `booking_assignment_service`, comparando com o round-robin
+ponderado suave puro (carga só como desempate), que era a versão anterior.
+Mostra, por membro, peso, carga inicial, atribuídos e carga final / peso.
+
+Uso:
+    uv run python -m benchmarks.bench_booking_assignment --bookings 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+
+from app.services.booking_assignment_service import WeightedRoundRobin  # noqa: E402
+
+WEIGHTS = {"owner-a": 1, "owner-b": 1, "owner-c": 2, "owner-d": 1}
+INITIAL_LOADS = {"owner-a": 6, "owner-b": 0, "owner-c": 2, "owner-d": 1}
+
+
+class _SmoothOnly:
+    """Referência: round-robin ponderado suave, carga só como desempate."""
+
+    def __init__(self) -> None:
+        self._current: dict[str, int] = {}
+
+    def pick(self, calendar_id: str, weights: dict[str, int], loads: dict[str, int]) -> str:
+        for owner_id, weight in weights.items():
+            self._current[owner_id] = self._current.get(owner_id, 0) + weight
+        chosen = max(weights, key=lambda o: (self._current[o], -loads.get(o, 0)))
+        self._current[chosen] -= sum(weights.values())
+        return chosen
+
+
+def _simulate(picker, bookings: int, busy: float, seed: int) -> dict[str, int]:
+    """Atribui `bookings` agendamentos; cada membro está ocupado no horário
+    com probabilidade `busy` (mesma sequência para os dois algoritmos)."""
+    rng = random.Random(seed)
+    loads = dict(INITIAL_LOADS)
+    assigned = dict.fromkeys(WEIGHTS, 0)
+    for _ in range(bookings):
+        free = {o: w for o, w in WEIGHTS.items() if rng.random() >= busy}
+        if not free:
+            continue
+        owner_id = picker.pick("cal-1", free, loads)
+        loads[owner_id] += 1
+        assigned[owner_id] += 1
+    return assigned
+
+
+def _report(title: str, assigned: dict[str, int]) -> None:
+    print(title)
+    print(f"  {'membro':<10} {'peso':>4} {'inicial':>8} {'atribuídos':>11} {'final/peso':>11}")
+    for owner_id, weight in WEIGHTS.items():
+        final = INITIAL_LOADS[owner_id] + assigned[owner_id]
+        print(
+            f"  {owner_id:<10} {weight:>4} {INITIAL_LOADS[owner_id]:>8} "
+            f"{assigned[owner_id]:>11} {final / weight:>11.1f}"
+        )
+    ratios = [
+        (INITIAL_LOADS[o] + assigned[o]) / w for o, w in WEIGHTS.items()
+    ]
+    print(f"  spread de carga/peso: {max(ratios) - min(ratios):.1f}")
+
+
+def main(bookings: int, busy: float, seed: int) -> None:
+    print(f"{bookings} agendamentos, ocupação por horário {busy:.0%}, seed {seed}\n")
+    _report("round-robin suave (anterior)", _simulate(_SmoothOnly(), bookings, busy, seed))
+    print()
+    _report(
+        "menor carga relativa + round-robin",
+        _simulate(WeightedRoundRobin(), bookings, busy, seed),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=40)
+    parser.add_argument("--busy", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.bookings, args.busy, args.seed)
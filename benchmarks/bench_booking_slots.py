@@ -0,0 +1,171 @@
+"""Benchmark do cálculo de slots em agendas cheias.
+
+Gera uma agenda sintética (vários responsáveis, seg-sáb 08h-20h, muitos
+agendamentos e bloqueios) e mede `booking_slot_service.compute_slots` num
+período de um mês, comparando com a verificação ingênua (cada candidato
+contra todos os agendamentos), que é o que os clientes faziam localmente.
+
+Uso:
+    uv run python -m benchmarks.bench_booking_slots --owners 10 --bookings 3000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+
+from app.services import booking_slot_service  # noqa: E402
+
+TZ = ZoneInfo("America/Sao_Paulo")
+TYPE = {
+    "id": "type-1",
+    "duration_minutes": 30,
+    "buffer_before_minutes": 10,
+    "buffer_after_minutes": 10,
+    "max_per_day": None,
+    "min_advance_hours": 0,
+}
+
+
+def _calendar(owners: int) -> dict:
+    return {
+        "id": "cal-1",
+        "timezone": str(TZ),
+        "min_advance_hours": 0,
+        "max_advance_days": 120,
+        "booking_availability": [
+            {"day_of_week": day, "start_time": "08:00:00", "end_time": "20:00:00"}
+            for day in range(1, 7)
+        ],
+        "booking_calendar_owners": [
+            {"user_id": f"owner-{i}", "can_receive_bookings": True}
+            for i in range(owners)
+        ],
+    }
+
+
+def _iso(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def _data(start: datetime, days: int, owners: int, bookings: int, blocks: int):
+    rng = random.Random(42)
+    booking_rows = []
+    for i in range(bookings):
+        day = start + timedelta(days=rng.randrange(days))
+        begin = day.replace(hour=8) + timedelta(minutes=15 * rng.randrange(44))
+        booking_rows.append({
+            "id": f"b{i}",
+            "calendar_id": "cal-1",
+            "booking_type_id": "type-1",
+            "assigned_to": f"owner-{rng.randrange(owners)}",
+            "start_datetime": _iso(begin),
+            "end_datetime": _iso(begin + timedelta(minutes=30)),
+            "booking_types": TYPE,
+        })
+
+    block_rows = []
+    for i in range(blocks):
+        day = start + timedelta(days=rng.randrange(days))
+        begin = day.replace(hour=12)
+        block_rows.append({
+            "id": f"k{i}",
+            "start_datetime": _iso(begin),
+            "end_datetime": _iso(begin + timedelta(hours=1)),
+        })
+    return booking_rows, block_rows
+
+
+def _naive(calendar, bookings, blocks, range_start, range_end, step_minutes) -> int:
+    """Referência: cada candidato testado contra cada agendamento/bloqueio."""
+    duration = timedelta(minutes=TYPE["duration_minutes"])
+    before = timedelta(minutes=TYPE["buffer_before_minutes"])
+    after = timedelta(minutes=TYPE["buffer_after_minutes"])
+    parsed = [
+        (
+            b["assigned_to"],
+            datetime.fromisoformat(b["start_datetime"]),
+            datetime.fromisoformat(b["end_datetime"]),
+        )
+        for b in bookings
+    ]
+    parsed_blocks = [
+        (datetime.fromisoformat(b["start_datetime"]), datetime.fromisoformat(b["end_datetime"]))
+        for b in blocks
+    ]
+    owners = [o["user_id"] for o in calendar["booking_calendar_owners"]]
+
+    found = 0
+    day = range_start
+    while day < range_end:
+        if (day.weekday() + 1) % 7 in range(1, 7):
+            candidate = day.replace(hour=8)
+            close = day.replace(hour=20)
+            while candidate + duration <= close:
+                lo, hi = candidate - before, candidate + duration + after
+                blocked = any(s < hi and e > lo for s, e in parsed_blocks)
+                if not blocked and any(
+                    not any(
+                        who == owner and (
+                            (s < hi and e > lo)
+                            or (s - before < candidate + duration and e + after > candidate)
+                        )
+                        for who, s, e in parsed
+                    )
+                    for owner in owners
+                ):
+                    found += 1
+                candidate += timedelta(minutes=step_minutes)
+        day += timedelta(days=1)
+    return found
+
+
+def main(owners: int, bookings: int, blocks: int, days: int, repeat: int) -> None:
+    range_start = datetime(2030, 3, 1, tzinfo=TZ)
+    range_end = range_start + timedelta(days=days)
+    calendar = _calendar(owners)
+    booking_rows, block_rows = _data(range_start, days, owners, bookings, blocks)
+    now = range_start.astimezone(timezone.utc) - timedelta(days=1)
+
+    print(
+        f"{days} dias, {owners} responsáveis, {bookings} agendamentos, "
+        f"{blocks} bloqueios, passo 15 min"
+    )
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        slots = booking_slot_service.compute_slots(
+            calendar=calendar,
+            booking_type=TYPE,
+            blocks=block_rows,
+            bookings=booking_rows,
+            range_start=range_start,
+            range_end=range_end,
+            now=now,
+            interval_minutes=15,
+        )
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{'intervalos mesclados':<24} {elapsed * 1000:10.1f} ms  ({len(slots)} slots)")
+
+    started = time.perf_counter()
+    found = _naive(calendar, booking_rows, block_rows, range_start, range_end, 15)
+    elapsed = time.perf_counter() - started
+    print(f"{'verificação ingênua':<24} {elapsed * 1000:10.1f} ms  ({found} slots)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owners", type=int, default=10)
+    parser.add_argument("--bookings", type=int, default=3000)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.owners, args.bookings, args.blocks, args.days, args.repeat)
@@ -0,0 +1,114 @@
+"""Benchmark do envio ao gateway WhatsApp contra um webhook stub local.
+
+Compara o cliente HTTP criado por mensagem (comportamento antigo) com o
+cliente compartilhado de `whatsapp_send_service` (pool + keep-alive).
+O stub responde na hora, então o resultado mede só o custo de conexão;
+contra o n8n real (TLS) a diferença é maior.
+
+Uso:
+    uv run python -m benchmarks.bench_whatsapp_send --sends 2000 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+import httpx
+import uvicorn
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+
+from app.core.config import get_settings  # noqa: E402
+from app.services import whatsapp_send_service  # noqa: E402
+
+
+async def _stub_webhook(scope, receive, send) -> None:
+    if scope["type"] != "http":
+        return
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _body() -> dict:
+    return whatsapp_send_service.build_webhook_payload(
+        empresa_id="bench",
+        conversation_id="bench",
+        instance_id="bench",
+        payload={"message_type": "text", "content": "benchmark"},
+    )
+
+
+async def _send_new_client(url: str) -> None:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        (await client.post(url, json=_body())).raise_for_status()
+
+
+async def _send_pooled(url: str) -> None:
+    client = whatsapp_send_service.get_http_client()
+    (await client.post(url, json=_body())).raise_for_status()
+
+
+async def _run(label: str, send, url: str, sends: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await send(url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(sends)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {sends / elapsed:10.1f} envios/s  ({elapsed:.2f}s)")
+
+
+async def main(sends: int, concurrency: int) -> None:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/webhook"
+    server = uvicorn.Server(
+        uvicorn.Config(_stub_webhook, host="127.0.0.1", port=port, log_level="warning")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    settings = get_settings()
+    print(
+        f"{sends} envios, concorrência {concurrency}, "
+        f"pool max={settings.N8N_HTTP_MAX_CONNECTIONS} "
+        f"keepalive={settings.N8N_HTTP_MAX_KEEPALIVE_CONNECTIONS}"
+    )
+    try:
+        await _run("cliente por mensagem", _send_new_client, url, sends, concurrency)
+        await whatsapp_send_service.startup()
+        await _run("cliente compartilhado", _send_pooled, url, sends, concurrency)
+    finally:
+        await whatsapp_send_service.shutdown()
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sends", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sends, args.concurrency))
@@ -0,0 +1,42 @@
+-- =====================================================
+-- Realtime da configuração das agendas
+-- =====================================================
+-- Publica as mudanças de booking_calendars, booking_availability,
+-- booking_types e booking_calendar_owners no Supabase Realtime, usadas para
+-- invalidar o cache de configuração das agendas da API (slots, tipos,
+-- disponibilidade e verificação de posse).
+--
+-- REPLICA IDENTITY FULL faz os DELETEs carregarem o calendar_id, para
+-- invalidar só a agenda afetada em vez do cache inteiro.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+alter table public.booking_availability replica identity full;
+alter table public.booking_types replica identity full;
+alter table public.booking_calendar_owners replica identity full;
+
+do $$
+declare
+    v_table text;
+begin
+    foreach v_table in array array[
+        'booking_calendars',
+        'booking_availability',
+        'booking_types',
+        'booking_calendar_owners'
+    ]
+    loop
+        if not exists (
+            select 1 from pg_publication_tables
+            where pubname = 'supabase_realtime'
+              and schemaname = 'public'
+              and tablename = v_table
+        ) then
+            execute format(
+                'alter publication supabase_realtime add table public.%I',
+                v_table
+            );
+        end if;
+    end loop;
+end;
+$$;
@@ -0,0 +1,122 @@
+-- =====================================================
+-- Agendamentos sem sobreposição por responsável
+-- =====================================================
+-- Constraint de exclusão (GiST sobre tstzrange) que impede dois
+-- agendamentos ativos do mesmo responsável no mesmo horário, inclusive
+-- com requisições concorrentes, e a RPC create_booking_checked usada por
+-- `POST /bookings`.
+--
+-- Horários bloqueados da agenda (booking_blocks) são recusados pelo
+-- trigger trg_bookings_check_blocks em todo INSERT e em todo UPDATE que
+-- muda horário, agenda ou status para ativo (PATCH, confirmar, reativar,
+-- lote), qualquer que seja o caminho de escrita.
+-- Os dois índices GiST mantêm a verificação em tempo logarítmico,
+-- independente do tamanho da tabela.
+--
+-- Conflitos são erros 23P01 (exclusion_violation), mapeados para 409
+-- pela API; a mensagem indica a origem (booking_conflict/block_conflict).
+--
+-- Se já existirem sobreposições, a criação da constraint falha. Para
+-- listá-las:
+--   select a.id, b.id, a.assigned_to, a.start_datetime, a.end_datetime
+--     from public.bookings a
+--     join public.bookings b
+--       on b.assigned_to = a.assigned_to
+--      and b.id > a.id
+--      and tstzrange(b.start_datetime, b.end_datetime, '[)')
+--          && tstzrange(a.start_datetime, a.end_datetime, '[)')
+--    where a.status <> 'cancelled' and b.status <> 'cancelled';
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create extension if not exists btree_gist;
+
+alter table public.bookings
+    drop constraint if exists bookings_no_overlap;
+
+alter table public.bookings
+    add constraint bookings_no_overlap
+    exclude using gist (
+        assigned_to with =,
+        tstzrange(start_datetime, end_datetime, '[)') with &&
+    )
+    where (status <> 'cancelled');
+
+create index if not exists idx_booking_blocks_calendar_range
+    on public.booking_blocks
+    using gist (calendar_id, tstzrange(start_datetime, end_datetime, '[)'));
+
+create or replace function public.check_booking_blocks()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.status = 'cancelled' then
+        return new;
+    end if;
+    if tg_op = 'UPDATE'
+       and new.start_datetime = old.start_datetime
+       and new.end_datetime = old.end_datetime
+       and new.calendar_id is not distinct from old.calendar_id
+       and new.status is not distinct from old.status then
+        return new;
+    end if;
+
+    perform 1
+       from public.booking_blocks
+      where calendar_id = new.calendar_id
+        and tstzrange(start_datetime, end_datetime, '[)')
+            && tstzrange(new.start_datetime, new.end_datetime, '[)');
+
+    if found then
+        raise exception 'block_conflict'
+            using errcode = '23P01';
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_bookings_check_blocks on public.bookings;
+create trigger trg_bookings_check_blocks
+    before insert or update on public.bookings
+    for each row
+    execute function public.check_booking_blocks();
+
+create or replace function public.create_booking_checked(
+    p_empresa_id uuid,
+    p_data jsonb
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_row public.bookings := jsonb_populate_record(null::public.bookings, p_data);
+    v_id public.bookings.id%type;
+begin
+    begin
+        insert into public.bookings (
+            empresa_id, calendar_id, booking_type_id, assigned_to, created_by,
+            lead_id, client_name, client_phone, client_email,
+            start_datetime, end_datetime, status, notes
+        )
+        values (
+            p_empresa_id, v_row.calendar_id, v_row.booking_type_id,
+            v_row.assigned_to, v_row.created_by, v_row.lead_id,
+            v_row.client_name, v_row.client_phone, v_row.client_email,
+            v_row.start_datetime, v_row.end_datetime,
+            coalesce(v_row.status, 'confirmed'), v_row.notes
+        )
+        returning id into v_id;
+    exception
+        when exclusion_violation then
+            -- Bloqueio (trigger) mantém a própria mensagem
+            if sqlerrm = 'block_conflict' then
+                raise;
+            end if;
+            raise exception 'booking_conflict'
+                using errcode = '23P01';
+    end;
+
+    return v_id::text;
+end;
+$$;
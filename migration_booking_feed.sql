@@ -0,0 +1,15 @@
+-- =====================================================
+-- Índices dos feeds iCalendar de agendamentos
+-- =====================================================
+-- Suportam a leitura por keyset em (start_datetime, id) dos feeds
+-- `GET /bookings/calendars/{id}/feed.ics` (por agenda) e
+-- `GET /bookings/owners/{user_id}/feed.ics` (por responsável), além da
+-- consulta de validação (ETag/Last-Modified) na mesma janela.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_bookings_calendar_start_id
+    on public.bookings (calendar_id, start_datetime, id);
+
+create index if not exists idx_bookings_assigned_start_id
+    on public.bookings (assigned_to, start_datetime, id);
@@ -0,0 +1,92 @@
+-- =====================================================
+-- Séries de agendamentos recorrentes
+-- =====================================================
+-- Tabela booking_series (uma linha por série, com a RRULE) usada por
+-- `/bookings/series`. As ocorrências são expandidas pela API; só as
+-- ocorrências alteradas/canceladas viram linhas em bookings, ligadas à
+-- série por (series_id, series_occurrence_start).
+--
+-- Recria create_booking_checked para gravar também as colunas da série;
+-- executar DEPOIS de migration_booking_conflicts.sql.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create table if not exists public.booking_series (
+    id uuid primary key default gen_random_uuid(),
+    empresa_id uuid not null,
+    calendar_id uuid not null references public.booking_calendars(id) on delete cascade,
+    booking_type_id uuid not null references public.booking_types(id),
+    assigned_to uuid not null,
+    created_by uuid not null,
+    lead_id uuid,
+    client_name text,
+    client_phone text,
+    client_email text,
+    dtstart timestamptz not null,
+    duration_minutes integer not null check (duration_minutes > 0),
+    timezone text not null,
+    rrule text not null,
+    -- Fim da última ocorrência ('infinity' para séries sem fim)
+    ends_at timestamptz not null default 'infinity',
+    status text not null default 'confirmed',
+    notes text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists idx_booking_series_calendar_window
+    on public.booking_series (calendar_id, dtstart, ends_at)
+    where status <> 'cancelled';
+
+create index if not exists idx_booking_series_assigned_window
+    on public.booking_series (assigned_to, dtstart, ends_at)
+    where status <> 'cancelled';
+
+alter table public.bookings
+    add column if not exists series_id uuid
+        references public.booking_series(id) on delete cascade,
+    add column if not exists series_occurrence_start timestamptz;
+
+create unique index if not exists uq_bookings_series_occurrence
+    on public.bookings (series_id, series_occurrence_start);
+
+create or replace function public.create_booking_checked(
+    p_empresa_id uuid,
+    p_data jsonb
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_row public.bookings := jsonb_populate_record(null::public.bookings, p_data);
+    v_id public.bookings.id%type;
+begin
+    begin
+        insert into public.bookings (
+            empresa_id, calendar_id, booking_type_id, assigned_to, created_by,
+            lead_id, client_name, client_phone, client_email,
+            start_datetime, end_datetime, status, notes,
+            series_id, series_occurrence_start
+        )
+        values (
+            p_empresa_id, v_row.calendar_id, v_row.booking_type_id,
+            v_row.assigned_to, v_row.created_by, v_row.lead_id,
+            v_row.client_name, v_row.client_phone, v_row.client_email,
+            v_row.start_datetime, v_row.end_datetime,
+            coalesce(v_row.status, 'confirmed'), v_row.notes,
+            v_row.series_id, v_row.series_occurrence_start
+        )
+        returning id into v_id;
+    exception
+        when exclusion_violation then
+            -- Bloqueio (trigger) mantém a própria mensagem
+            if sqlerrm = 'block_conflict' then
+                raise;
+            end if;
+            raise exception 'booking_conflict'
+                using errcode = '23P01';
+    end;
+
+    return v_id::text;
+end;
+$$;
@@ -0,0 +1,75 @@
+-- =====================================================
+-- Conversa única por (empresa, instância, telefone)
+-- =====================================================
+-- Índice único que impede conversas duplicadas para o mesmo contato na
+-- mesma instância, e a RPC get_or_create_conversation_by_phone usada por
+-- `PUT /chat/conversations/by-phone` (INSERT ... ON CONFLICT DO NOTHING +
+-- leitura, em uma única chamada).
+--
+-- Se já existirem duplicatas, a criação do índice falha. Para listá-las:
+--   select empresa_id, instance_id, fone, count(*)
+--     from public.chat_conversations
+--    where instance_id is not null and fone is not null
+--    group by 1, 2, 3 having count(*) > 1;
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create unique index if not exists uq_chat_conversations_empresa_instance_fone
+    on public.chat_conversations (empresa_id, instance_id, fone);
+
+-- Instância inexistente ou de outra empresa: erro P0002 (no_data_found),
+-- mapeado para 404 pela API.
+create or replace function public.get_or_create_conversation_by_phone(
+    p_empresa_id uuid,
+    p_instance_id uuid,
+    p_fone text,
+    p_defaults jsonb default '{}'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_conversation public.chat_conversations;
+    v_created boolean := false;
+begin
+    perform 1
+       from public.whatsapp_instances
+      where id = p_instance_id
+        and empresa_id = p_empresa_id;
+
+    if not found then
+        raise exception 'instance % not found', p_instance_id
+            using errcode = 'P0002';
+    end if;
+
+    insert into public.chat_conversations (
+        empresa_id, instance_id, fone, lead_id, nome_instancia,
+        assigned_user_id, cod_lid, status
+    )
+    values (
+        p_empresa_id,
+        p_instance_id,
+        p_fone,
+        (p_defaults->>'lead_id')::uuid,
+        p_defaults->>'nome_instancia',
+        (p_defaults->>'assigned_user_id')::uuid,
+        p_defaults->>'cod_lid',
+        coalesce(p_defaults->>'status', 'active')
+    )
+    on conflict (empresa_id, instance_id, fone) do nothing
+    returning * into v_conversation;
+
+    if found then
+        v_created := true;
+    else
+        select *
+          into v_conversation
+          from public.chat_conversations
+         where empresa_id = p_empresa_id
+           and instance_id = p_instance_id
+           and fone = p_fone;
+    end if;
+
+    return to_jsonb(v_conversation) || jsonb_build_object('created', v_created);
+end;
+$$;
@@ -0,0 +1,129 @@
+-- =====================================================
+-- Caixa de entrada do chat (resumo por conversa)
+-- =====================================================
+-- Mantém na própria conversa a prévia da última mensagem (via trigger) e
+-- registra até onde cada atendente leu cada conversa. A RPC chat_inbox
+-- monta a caixa de entrada em uma única consulta, paginada por cursor em
+-- (coalesce(last_message_at, created_at), id).
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+alter table public.chat_conversations
+    add column if not exists last_message_preview text,
+    add column if not exists last_message_type text,
+    add column if not exists last_message_direction text;
+
+create table if not exists public.chat_conversation_reads (
+    conversation_id uuid not null references public.chat_conversations (id) on delete cascade,
+    user_id uuid not null,
+    empresa_id uuid not null,
+    last_read_at timestamptz not null default now(),
+    primary key (conversation_id, user_id)
+);
+
+create index if not exists idx_chat_conversations_inbox
+    on public.chat_conversations (empresa_id, (coalesce(last_message_at, created_at)) desc, id desc);
+
+create index if not exists idx_chat_messages_conversation_inbound
+    on public.chat_messages (conversation_id, "timestamp")
+    where direction = 'inbound';
+
+-- Prévia da última mensagem, atualizada a cada INSERT em chat_messages
+create or replace function public.chat_messages_update_preview()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.chat_conversations
+       set last_message_preview = left(new.content, 200),
+           last_message_type = new.message_type,
+           last_message_direction = new.direction
+     where id = new.conversation_id;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_chat_messages_update_preview on public.chat_messages;
+create trigger trg_chat_messages_update_preview
+    after insert on public.chat_messages
+    for each row execute function public.chat_messages_update_preview();
+
+-- Backfill das conversas existentes
+update public.chat_conversations c
+   set last_message_preview = left(m.content, 200),
+       last_message_type = m.message_type,
+       last_message_direction = m.direction
+  from (
+      select distinct on (conversation_id)
+             conversation_id, content, message_type, direction
+        from public.chat_messages
+       order by conversation_id, "timestamp" desc nulls last, created_at desc
+  ) m
+ where m.conversation_id = c.id;
+
+-- Caixa de entrada: conversas + prévia + não lidas do atendente.
+-- Sem p_user_id, as não lidas são calculadas para o atendente atribuído.
+-- A contagem de não lidas é limitada a p_unread_cap por conversa para que
+-- o custo por linha seja constante.
+create or replace function public.chat_inbox(
+    p_empresa_id uuid,
+    p_user_id uuid default null,
+    p_status text default null,
+    p_instance_id uuid default null,
+    p_assigned_user_id uuid default null,
+    p_before_at timestamptz default null,
+    p_before_id uuid default null,
+    p_limit integer default 20,
+    p_unread_cap integer default 100
+)
+returns setof jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+               'id', c.id,
+               'empresa_id', c.empresa_id,
+               'lead_id', c.lead_id,
+               'instance_id', c.instance_id,
+               'fone', c.fone,
+               'nome_instancia', c.nome_instancia,
+               'Nome_Whatsapp', c."Nome_Whatsapp",
+               'assigned_user_id', c.assigned_user_id,
+               'cod_lid', c.cod_lid,
+               'status', c.status,
+               'last_message_at', c.last_message_at,
+               'message_count', c.message_count,
+               'last_message_preview', c.last_message_preview,
+               'last_message_type', c.last_message_type,
+               'last_message_direction', c.last_message_direction,
+               'activity_at', coalesce(c.last_message_at, c.created_at),
+               'created_at', c.created_at,
+               'updated_at', c.updated_at,
+               'unread_count', u.unread_count
+           )
+      from public.chat_conversations c
+      left join public.chat_conversation_reads r
+             on r.conversation_id = c.id
+            and r.user_id = coalesce(p_user_id, c.assigned_user_id)
+      cross join lateral (
+          select count(*)::integer as unread_count
+            from (
+                select 1
+                  from public.chat_messages m
+                 where m.conversation_id = c.id
+                   and m.direction = 'inbound'
+                   and (r.last_read_at is null or m."timestamp" > r.last_read_at)
+                 limit p_unread_cap
+            ) capped
+      ) u
+     where c.empresa_id = p_empresa_id
+       and (p_status is null or c.status = p_status)
+       and (p_instance_id is null or c.instance_id = p_instance_id)
+       and (p_assigned_user_id is null or c.assigned_user_id = p_assigned_user_id)
+       and (
+           p_before_at is null
+           or (coalesce(c.last_message_at, c.created_at), c.id) < (p_before_at, p_before_id)
+       )
+     order by coalesce(c.last_message_at, c.created_at) desc, c.id desc
+     limit p_limit;
+$$;
@@ -0,0 +1,95 @@
+-- =====================================================
+-- Ingestão atômica de mensagens de chat
+-- =====================================================
+-- Um único trigger AFTER INSERT em chat_messages mantém, no mesmo UPDATE,
+-- message_count, last_message_at e a prévia da última mensagem da conversa
+-- (substitui o trigger de prévia de migration_chat_inbox.sql). Vale para
+-- qualquer escritor: API, gateway de envio ou inserts diretos.
+--
+-- A RPC ingest_chat_message valida que a conversa pertence à empresa e
+-- insere a mensagem em uma única chamada; o trigger roda na mesma
+-- transação, então os contadores nunca divergem das mensagens.
+--
+-- Executar no Supabase Dashboard (SQL Editor), após migration_chat_inbox.sql.
+
+create or replace function public.chat_messages_after_insert()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_at timestamptz := coalesce(new."timestamp", new.created_at, now());
+begin
+    update public.chat_conversations
+       set message_count = coalesce(message_count, 0) + 1,
+           last_message_at = greatest(coalesce(last_message_at, v_at), v_at),
+           last_message_preview = left(new.content, 200),
+           last_message_type = new.message_type,
+           last_message_direction = new.direction,
+           updated_at = now()
+     where id = new.conversation_id;
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_chat_messages_update_preview on public.chat_messages;
+drop function if exists public.chat_messages_update_preview();
+
+drop trigger if exists trg_chat_messages_after_insert on public.chat_messages;
+create trigger trg_chat_messages_after_insert
+    after insert on public.chat_messages
+    for each row execute function public.chat_messages_after_insert();
+
+-- Recalcula os contadores que divergiram antes do trigger
+update public.chat_conversations c
+   set message_count = m.total,
+       last_message_at = m.last_at
+  from (
+      select conversation_id, count(*) as total, max("timestamp") as last_at
+        from public.chat_messages
+       group by conversation_id
+  ) m
+ where m.conversation_id = c.id;
+
+-- Conversa inexistente ou de outra empresa: erro P0002 (no_data_found),
+-- mapeado para 404 pela API.
+create or replace function public.ingest_chat_message(
+    p_empresa_id uuid,
+    p_conversation_id uuid,
+    p_message jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_message public.chat_messages;
+begin
+    perform 1
+       from public.chat_conversations
+      where id = p_conversation_id
+        and empresa_id = p_empresa_id;
+
+    if not found then
+        raise exception 'conversation % not found', p_conversation_id
+            using errcode = 'P0002';
+    end if;
+
+    insert into public.chat_messages (
+        conversation_id, empresa_id, instance_id, message_type,
+        content, media_url, direction, status, "timestamp"
+    )
+    values (
+        p_conversation_id,
+        p_empresa_id,
+        (p_message->>'instance_id')::uuid,
+        coalesce(p_message->>'message_type', 'text'),
+        p_message->>'content',
+        p_message->>'media_url',
+        p_message->>'direction',
+        coalesce(p_message->>'status', 'sent'),
+        coalesce((p_message->>'timestamp')::timestamptz, now())
+    )
+    returning * into v_message;
+
+    return to_jsonb(v_message);
+end;
+$$;
@@ -0,0 +1,69 @@
+-- =====================================================
+-- Ingestão em lote de mensagens de chat
+-- =====================================================
+-- - external_id: id da mensagem no gateway/WhatsApp, único por empresa,
+--   usado para deduplicar reenvios (INSERT ... ON CONFLICT DO NOTHING).
+-- - O trigger de contadores de migration_chat_message_ingest.sql passa a
+--   ser por statement (transition table): um INSERT de N linhas atualiza
+--   cada conversa uma única vez, somando as mensagens do lote. A prévia só
+--   é trocada quando o lote traz mensagens mais novas que a última
+--   (backfills antigos não sobrescrevem a prévia).
+--
+-- Executar no Supabase Dashboard (SQL Editor), após
+-- migration_chat_message_ingest.sql.
+
+alter table public.chat_messages
+    add column if not exists external_id text;
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conname = 'chat_messages_empresa_external_id_key'
+    ) then
+        alter table public.chat_messages
+            add constraint chat_messages_empresa_external_id_key
+            unique (empresa_id, external_id);
+    end if;
+end;
+$$;
+
+create or replace function public.chat_messages_after_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.chat_conversations c
+       set message_count = coalesce(c.message_count, 0) + n.total,
+           last_message_at = greatest(coalesce(c.last_message_at, n.last_at), n.last_at),
+           last_message_preview = case
+               when c.last_message_at is null or n.last_at >= c.last_message_at
+               then left(n.content, 200) else c.last_message_preview end,
+           last_message_type = case
+               when c.last_message_at is null or n.last_at >= c.last_message_at
+               then n.message_type else c.last_message_type end,
+           last_message_direction = case
+               when c.last_message_at is null or n.last_at >= c.last_message_at
+               then n.direction else c.last_message_direction end,
+           updated_at = now()
+      from (
+          select distinct on (conversation_id)
+                 conversation_id,
+                 count(*) over (partition by conversation_id) as total,
+                 coalesce("timestamp", created_at, now()) as last_at,
+                 content,
+                 message_type,
+                 direction
+            from new_rows
+           order by conversation_id, coalesce("timestamp", created_at, now()) desc
+      ) n
+     where c.id = n.conversation_id;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_chat_messages_after_insert on public.chat_messages;
+create trigger trg_chat_messages_after_insert
+    after insert on public.chat_messages
+    referencing new table as new_rows
+    for each statement execute function public.chat_messages_after_insert();
@@ -0,0 +1,11 @@
+-- =====================================================
+-- Paginação por cursor das mensagens de chat
+-- =====================================================
+-- Índice que atende `GET /chat/conversations/{id}/messages/cursor`:
+-- busca das mensagens mais recentes e navegação por (timestamp, id)
+-- sem offset, em tempo constante.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_chat_messages_conversation_timestamp_id
+    on public.chat_messages (conversation_id, "timestamp" desc, id desc);
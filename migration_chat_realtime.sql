@@ -0,0 +1,21 @@
+-- =====================================================
+-- Realtime de mensagens de chat
+-- =====================================================
+-- Publica os INSERTs de chat_messages no Supabase Realtime, consumidos
+-- pelos endpoints SSE `GET /chat/conversations/{id}/stream` e
+-- `GET /chat/inbox/stream` (uma única assinatura por processo da API).
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime'
+          and schemaname = 'public'
+          and tablename = 'chat_messages'
+    ) then
+        alter publication supabase_realtime add table public.chat_messages;
+    end if;
+end;
+$$;
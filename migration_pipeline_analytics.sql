@@ -0,0 +1,72 @@
+-- =====================================================
+-- Analytics de funil por pipeline
+-- =====================================================
+-- Calcula, em uma única passada sobre lead_pipeline_history, por stage:
+--   - entries: quantas vezes leads entraram no stage dentro do período;
+--   - advanced: quantas dessas entradas avançaram para um stage posterior;
+--   - dwell_*: tempo de permanência (mediana e p90), em segundos, das
+--     entradas que já saíram do stage.
+--
+-- Uma "entrada" é uma linha do histórico cujo stage_id difere do
+-- previous_stage_id (criação do lead ou mudança de stage). Linhas como
+-- marked_as_lost/marked_as_sold mantêm o mesmo stage e são ignoradas.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_lead_pipeline_history_pipeline_lead
+    on public.lead_pipeline_history (empresa_id, pipeline_id, lead_id, changed_at);
+
+create or replace function public.pipeline_stage_analytics(
+    p_empresa_id uuid,
+    p_pipeline_id uuid,
+    p_date_from timestamptz default null,
+    p_date_to timestamptz default null
+)
+returns table (
+    stage_id uuid,
+    entries bigint,
+    advanced bigint,
+    dwell_median_seconds double precision,
+    dwell_p90_seconds double precision
+)
+language sql
+stable
+as $$
+    with stage_entries as (
+        select
+            h.lead_id,
+            h.stage_id,
+            h.changed_at,
+            lead(h.stage_id) over w as next_stage_id,
+            lead(h.changed_at) over w as next_changed_at
+        from public.lead_pipeline_history h
+        where h.empresa_id = p_empresa_id
+          and h.pipeline_id = p_pipeline_id
+          and h.stage_id is not null
+          and h.stage_id is distinct from h.previous_stage_id
+        window w as (partition by h.lead_id order by h.changed_at)
+    ),
+    in_range as (
+        select e.*, s.position, ns.position as next_position
+        from stage_entries e
+        join public.stages s on s.id = e.stage_id
+        left join public.stages ns on ns.id = e.next_stage_id
+        where (p_date_from is null or e.changed_at >= p_date_from)
+          and (p_date_to is null or e.changed_at <= p_date_to)
+    )
+    select
+        s.id as stage_id,
+        count(r.lead_id) as entries,
+        count(r.lead_id) filter (where r.next_position > r.position) as advanced,
+        percentile_cont(0.5) within group (
+            order by extract(epoch from r.next_changed_at - r.changed_at)
+        ) filter (where r.next_changed_at is not null) as dwell_median_seconds,
+        percentile_cont(0.9) within group (
+            order by extract(epoch from r.next_changed_at - r.changed_at)
+        ) filter (where r.next_changed_at is not null) as dwell_p90_seconds
+    from public.stages s
+    left join in_range r on r.stage_id = s.id
+    where s.pipeline_id = p_pipeline_id
+    group by s.id, s.position
+    order by s.position;
+$$;
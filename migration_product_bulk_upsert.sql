@@ -0,0 +1,69 @@
+-- =====================================================
+-- Sincronização em lote de preço/estoque por SKU (ERP)
+-- =====================================================
+-- `POST /products/bulk-upsert` resolve os SKUs em lotes (índice abaixo),
+-- compara com os valores atuais e grava só as linhas alteradas:
+--   - existentes: bulk_update_products aplica o lote num único UPDATE
+--     (jsonb_array_elements), alterando apenas os campos presentes em cada
+--     item;
+--   - novas (com `create_missing`): INSERT multi-linha pela API.
+--
+-- Um upsert (INSERT ... ON CONFLICT) parcial não serve para as existentes:
+-- o Postgres valida NOT NULL (ex.: nome) da linha proposta antes de
+-- detectar o conflito.
+--
+-- Mesmas regras de estoque de adjust_product_stock: linhas cujo novo
+-- estoque fica abaixo de `quantidade_reservada` não são alteradas (a API
+-- as reporta como erro), e sem `status` explícito o produto que zera vira
+-- `vendido` e o `vendido` reabastecido volta a `ativo`. Executar DEPOIS de
+-- migration_product_reservations.sql.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_products_empresa_sku
+    on public.products (empresa_id, sku);
+
+create or replace function public.bulk_update_products(
+    p_empresa_id uuid,
+    p_rows jsonb
+)
+returns table (id uuid)
+language sql
+as $$
+    -- Reservas vencidas não seguram estoque
+    select public.expire_product_reservations();
+
+    -- jsonb_populate_record converte cada campo para o tipo da coluna
+    update public.products p
+       set nome = case when r ? 'nome' then x.nome else p.nome end,
+           preco = case when r ? 'preco' then x.preco else p.preco end,
+           preco_promocional = case
+               when r ? 'preco_promocional' then x.preco_promocional
+               else p.preco_promocional
+           end,
+           quantidade_estoque = case
+               when r ? 'quantidade_estoque' then x.quantidade_estoque
+               else p.quantidade_estoque
+           end,
+           status = case
+               when r ? 'status' then x.status
+               when not r ? 'quantidade_estoque'
+                 or coalesce(p.tipo::text, 'produto') = 'servico'
+                   then p.status
+               when coalesce(x.quantidade_estoque, 0) = 0 and p.status::text = 'ativo'
+                   then 'vendido'
+               when coalesce(x.quantidade_estoque, 0) > 0 and p.status::text = 'vendido'
+                   then 'ativo'
+               else p.status
+           end,
+           updated_at = now()
+      from jsonb_array_elements(p_rows) as r,
+           lateral jsonb_populate_record(null::public.products, r) as x
+     where p.id = x.id
+       and p.empresa_id = p_empresa_id
+       and (
+           not r ? 'quantidade_estoque'
+           or coalesce(x.quantidade_estoque, 0) >= p.quantidade_reservada
+       )
+    returning p.id;
+$$;
@@ -0,0 +1,151 @@
+-- =====================================================
+-- Facetas do catálogo de produtos/serviços
+-- =====================================================
+-- `GET /products/facets` monta a barra de filtros do catálogo numa única
+-- chamada: contagens por categoria, marca, tipo e status, faixa de preços
+-- e um histograma do preço efetivo (promocional, se houver, senão o cheio).
+--
+-- Os filtros espelham `product_service._apply_filters` (os mesmos de
+-- `GET /products`); mantenha os dois em sincronia. O conjunto filtrado é
+-- lido uma vez e todas as agregações saem dele na mesma consulta.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_products_empresa_status
+    on public.products (empresa_id, status);
+
+create or replace function public.product_facets(
+    p_empresa_id uuid,
+    p_search text default null,
+    p_categoria_id uuid default null,
+    p_tipo text default null,
+    p_status text[] default null,
+    p_marca text[] default null,
+    p_preco_min numeric default null,
+    p_preco_max numeric default null,
+    p_only_promotion boolean default false,
+    p_status_produto text default null,
+    p_buckets integer default 10
+)
+returns jsonb
+language sql
+stable
+as $$
+    with filtered as materialized (
+        select
+            p.categoria_id,
+            p.marca,
+            p.tipo::text as tipo,
+            p.status::text as status,
+            p.preco,
+            p.preco_promocional,
+            coalesce(p.preco_promocional, p.preco) as preco_efetivo
+        from public.products p
+        where p.empresa_id = p_empresa_id
+          and (
+              p_search is null
+              or p.nome ilike '%' || p_search || '%'
+              or p.descricao ilike '%' || p_search || '%'
+              or p.sku ilike '%' || p_search || '%'
+              or p.marca ilike '%' || p_search || '%'
+          )
+          and (p_categoria_id is null or p.categoria_id = p_categoria_id)
+          and (p_tipo is null or p.tipo::text = p_tipo)
+          and (p_marca is null or p.marca = any (p_marca))
+          and (p_status is null or p.status::text = any (p_status))
+          and (
+              case
+                  when p_status_produto = 'vendido' then p.status::text = 'vendido'
+                  when p_status_produto = 'todos' or p_status is not null then true
+                  else p.status::text <> 'vendido'
+              end
+          )
+          and (p_preco_min is null or p.preco >= p_preco_min)
+          and (p_preco_max is null or p.preco <= p_preco_max)
+          and (not p_only_promotion or p.preco_promocional is not null)
+    ),
+    bounds as (
+        select
+            count(*) as total,
+            min(preco) as preco_min,
+            max(preco) as preco_max,
+            min(preco_promocional) as promo_min,
+            max(preco_promocional) as promo_max,
+            min(preco_efetivo) as efetivo_min,
+            max(preco_efetivo) as efetivo_max
+        from filtered
+    ),
+    counts as (
+        select
+            case
+                when grouping(categoria_id) = 0 then 'categoria_id'
+                when grouping(marca) = 0 then 'marca'
+                when grouping(tipo) = 0 then 'tipo'
+                else 'status'
+            end as facet,
+            coalesce(categoria_id::text, marca, tipo, status) as value,
+            count(*) as count
+        from filtered
+        group by grouping sets ((categoria_id), (marca), (tipo), (status))
+    ),
+    histogram as (
+        -- Faixas de largura igual entre o menor e o maior preço efetivo;
+        -- o maior preço cai na última faixa
+        select
+            case
+                when b.efetivo_max = b.efetivo_min then 1
+                else least(
+                    width_bucket(f.preco_efetivo, b.efetivo_min, b.efetivo_max, p_buckets),
+                    p_buckets
+                )
+            end as bucket,
+            count(*) as count
+        from filtered f
+        cross join bounds b
+        where f.preco_efetivo is not null
+        group by 1
+    )
+    select jsonb_build_object(
+        'total', b.total,
+        'counts', coalesce(
+            (
+                select jsonb_object_agg(c.facet, c.buckets)
+                from (
+                    select facet, jsonb_agg(
+                        jsonb_build_object('value', value, 'count', count)
+                        order by count desc, value
+                    ) as buckets
+                    from counts
+                    group by facet
+                ) c
+            ),
+            '{}'::jsonb
+        ),
+        'preco', jsonb_build_object('min', b.preco_min, 'max', b.preco_max),
+        'preco_promocional', jsonb_build_object('min', b.promo_min, 'max', b.promo_max),
+        'histogram', coalesce(
+            (
+                select jsonb_agg(
+                    jsonb_build_object(
+                        'min', b.efetivo_min
+                            + (s.bucket - 1) * (b.efetivo_max - b.efetivo_min) / p_buckets,
+                        'max', case
+                            when b.efetivo_max = b.efetivo_min then b.efetivo_max
+                            else b.efetivo_min
+                                + s.bucket * (b.efetivo_max - b.efetivo_min) / p_buckets
+                        end,
+                        'count', coalesce(h.count, 0)
+                    )
+                    order by s.bucket
+                )
+                from generate_series(
+                    1, case when b.efetivo_max > b.efetivo_min then p_buckets else 1 end
+                ) as s(bucket)
+                left join histogram h on h.bucket = s.bucket
+                where b.efetivo_min is not null
+            ),
+            '[]'::jsonb
+        )
+    )
+    from bounds b;
+$$;
@@ -0,0 +1,122 @@
+-- =====================================================
+-- Feed do catálogo (marketplaces): índices e validadores
+-- =====================================================
+-- O índice (empresa_id, status, id) suporta a leitura por keyset em `id`
+-- dos produtos ativos de `GET /products/feed.{csv,xml,ndjson}`.
+--
+-- O ETag/Last-Modified do feed vem de product_feed_validator:
+--   - produtos: agregado barato (quantidade de ativos e maior `updated_at`
+--     de todos os produtos da empresa, por index-only scan). Inativar,
+--     vender, ajustar estoque ou editar atualiza `updated_at`; excluir um
+--     ativo muda a contagem. Os contadores de reserva não tocam
+--     `updated_at`, então checkout e o sweeper não invalidam o feed;
+--   - imagens e categorias: `product_catalog_versions`, uma linha por
+--     empresa incrementada por triggers por comando (transition tables)
+--     em product_images e product_categories, o que capta exclusão e
+--     reordenação de imagens e renomeação de categorias.
+-- Escritas em `products` não passam pela linha de versão: vendas e
+-- ajustes de estoque simultâneos não disputam um lock por empresa.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_products_empresa_status_id
+    on public.products (empresa_id, status, id);
+
+create index if not exists idx_products_empresa_updated_status
+    on public.products (empresa_id, updated_at, status);
+
+-- Usados pela primeira versão da validação (maiores updated_at/created_at)
+drop index if exists public.idx_products_empresa_status_updated;
+drop index if exists public.idx_product_images_empresa_created;
+
+create table if not exists public.product_catalog_versions (
+    empresa_id uuid primary key,
+    version bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create or replace function public.bump_product_catalog_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'DELETE' then
+        insert into public.product_catalog_versions as v (empresa_id, version, updated_at)
+        select distinct empresa_id, 1, now()
+          from old_rows
+         where empresa_id is not null
+        on conflict (empresa_id) do update
+            set version = v.version + 1,
+                updated_at = now();
+    else
+        insert into public.product_catalog_versions as v (empresa_id, version, updated_at)
+        select distinct empresa_id, 1, now()
+          from new_rows
+         where empresa_id is not null
+        on conflict (empresa_id) do update
+            set version = v.version + 1,
+                updated_at = now();
+    end if;
+    return null;
+end;
+$$;
+
+do $$
+declare
+    v_table text;
+begin
+    -- Versão anterior também versionava products
+    drop trigger if exists trg_products_catalog_version_ins on public.products;
+    drop trigger if exists trg_products_catalog_version_upd on public.products;
+    drop trigger if exists trg_products_catalog_version_del on public.products;
+
+    foreach v_table in array array['product_images', 'product_categories']
+    loop
+        execute format(
+            'drop trigger if exists trg_%1$s_catalog_version_ins on public.%1$I;
+             create trigger trg_%1$s_catalog_version_ins
+                 after insert on public.%1$I
+                 referencing new table as new_rows
+                 for each statement
+                 execute function public.bump_product_catalog_version();
+             drop trigger if exists trg_%1$s_catalog_version_upd on public.%1$I;
+             create trigger trg_%1$s_catalog_version_upd
+                 after update on public.%1$I
+                 referencing new table as new_rows
+                 for each statement
+                 execute function public.bump_product_catalog_version();
+             drop trigger if exists trg_%1$s_catalog_version_del on public.%1$I;
+             create trigger trg_%1$s_catalog_version_del
+                 after delete on public.%1$I
+                 referencing old table as old_rows
+                 for each statement
+                 execute function public.bump_product_catalog_version();',
+            v_table
+        );
+    end loop;
+end;
+$$;
+
+create or replace function public.product_feed_validator(p_empresa_id uuid)
+returns table (
+    active_count bigint,
+    products_updated_at timestamptz,
+    catalog_version bigint,
+    last_modified timestamptz
+)
+language sql
+stable
+as $$
+    select p.active_count,
+           p.updated_at,
+           coalesce(v.version, 0),
+           greatest(p.updated_at, v.updated_at)
+      from (
+           select count(*) filter (where status::text = 'ativo') as active_count,
+                  max(updated_at) as updated_at
+             from public.products
+            where empresa_id = p_empresa_id
+      ) as p
+      left join public.product_catalog_versions v
+        on v.empresa_id = p_empresa_id;
+$$;
@@ -0,0 +1,82 @@
+-- =====================================================
+-- Reordenação de imagens de produto em um único statement
+-- =====================================================
+-- `POST /products/{id}/images/reorder` renumera todas as imagens do
+-- produto num único UPDATE: as informadas ficam em 0..n-1, na ordem
+-- recebida, e as demais seguem depois, na ordem atual. Sendo um statement
+-- só, ou todas as posições mudam ou nenhuma (sem posições duplicadas no
+-- meio do caminho), em uma ida ao banco.
+--
+-- Erros, mapeados pela API:
+--   - P0002 (no_data_found): produto inexistente ou de outra empresa -> 404;
+--   - 22023 (invalid_parameter_value): imagens que não pertencem ao produto
+--     (ids em DETAIL) -> 422.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create index if not exists idx_product_images_product_position
+    on public.product_images (product_id, position);
+
+create or replace function public.reorder_product_images(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_image_ids uuid[]
+)
+returns setof public.product_images
+language plpgsql
+as $$
+declare
+    v_missing text;
+begin
+    perform 1
+       from public.products
+      where id = p_product_id
+        and empresa_id = p_empresa_id;
+
+    if not found then
+        raise exception 'product % not found', p_product_id
+            using errcode = 'P0002';
+    end if;
+
+    select string_agg(requested.id::text, ', ' order by requested.ord)
+      into v_missing
+      from unnest(p_image_ids) with ordinality as requested (id, ord)
+     where not exists (
+           select 1
+             from public.product_images i
+            where i.id = requested.id
+              and i.product_id = p_product_id
+              and i.empresa_id = p_empresa_id
+     );
+
+    if v_missing is not null then
+        raise exception 'images_not_in_product'
+            using errcode = '22023', detail = v_missing;
+    end if;
+
+    with ordered as (
+        select
+            i.id,
+            (row_number() over (
+                order by requested.ord nulls last, i.position, i.created_at, i.id
+            ) - 1)::integer as position
+          from public.product_images i
+          left join unnest(p_image_ids) with ordinality as requested (id, ord)
+            on requested.id = i.id
+         where i.product_id = p_product_id
+           and i.empresa_id = p_empresa_id
+    )
+    update public.product_images i
+       set position = o.position
+      from ordered o
+     where i.id = o.id
+       and i.position is distinct from o.position;
+
+    return query
+    select *
+      from public.product_images
+     where product_id = p_product_id
+       and empresa_id = p_empresa_id
+     order by position;
+end;
+$$;
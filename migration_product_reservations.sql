@@ -0,0 +1,385 @@
+-- =====================================================
+-- Reservas de estoque com expiração (checkout)
+-- =====================================================
+-- `POST /products/{id}/reservations` segura estoque durante o checkout.
+-- A reserva é confirmada (vira venda) ou liberada explicitamente; se não,
+-- expira em `expires_at` e um sweeper da API a libera em lote.
+--
+-- `products.quantidade_reservada` é um contador mantido pelas funções
+-- abaixo, então o estoque disponível (`quantidade_estoque -
+-- quantidade_reservada`) sai da própria linha do produto, sem varrer as
+-- reservas a cada leitura.
+--
+-- Recria sell_product para vender apenas o estoque não reservado e
+-- adjust_product_stock para não baixar o estoque abaixo do reservado;
+-- executar DEPOIS de migration_product_stock.sql.
+--
+-- Erros, mapeados pela API:
+--   - P0002 (no_data_found): produto/reserva inexistente -> 404;
+--   - 23514 (check_violation, 'insufficient_stock'): estoque insuficiente;
+--   - 22023 (invalid_parameter_value, 'not_stockable'): serviço não tem estoque;
+--   - 55000 (object_not_in_prerequisite_state): reserva já encerrada/expirada.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+alter table public.products
+    add column if not exists quantidade_reservada integer not null default 0
+        check (quantidade_reservada >= 0);
+
+create table if not exists public.product_reservations (
+    id uuid primary key default gen_random_uuid(),
+    empresa_id uuid not null,
+    product_id uuid not null references public.products (id) on delete cascade,
+    quantidade integer not null check (quantidade > 0),
+    status text not null default 'active'
+        check (status in ('active', 'committed', 'released', 'expired')),
+    expires_at timestamptz not null,
+    reference text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists idx_product_reservations_due
+    on public.product_reservations (expires_at)
+    where status = 'active';
+
+create index if not exists idx_product_reservations_product_due
+    on public.product_reservations (product_id, expires_at)
+    where status = 'active';
+
+-- Expira reservas vencidas (de um produto, ou de todos no sweeper) e
+-- devolve as quantidades ao estoque disponível. Retorna quantas expirou.
+create or replace function public.expire_product_reservations(
+    p_product_id uuid default null,
+    p_limit integer default 1000
+)
+returns integer
+language sql
+as $$
+    with expired as (
+        update public.product_reservations r
+           set status = 'expired',
+               updated_at = now()
+         where r.id in (
+               select id
+                 from public.product_reservations
+                where status = 'active'
+                  and expires_at <= now()
+                  and (p_product_id is null or product_id = p_product_id)
+                order by expires_at
+                limit p_limit
+                for update skip locked
+         )
+        returning r.product_id, r.quantidade
+    ),
+    totals as (
+        select product_id, sum(quantidade)::integer as quantidade
+          from expired
+         group by product_id
+    ),
+    released as (
+        update public.products p
+           set quantidade_reservada = p.quantidade_reservada - t.quantidade
+          from totals t
+         where p.id = t.product_id
+        returning p.id
+    )
+    select count(*)::integer from expired;
+$$;
+
+create or replace function public.reserve_product_stock(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_quantidade integer,
+    p_ttl_seconds integer,
+    p_reference text default null
+)
+returns setof public.product_reservations
+language plpgsql
+as $$
+declare
+    v_tipo text;
+begin
+    -- Reservas vencidas ainda não varridas não devem segurar estoque
+    perform public.expire_product_reservations(p_product_id);
+
+    update public.products p
+       set quantidade_reservada = p.quantidade_reservada + p_quantidade
+     where p.id = p_product_id
+       and p.empresa_id = p_empresa_id
+       and coalesce(p.tipo::text, 'produto') <> 'servico'
+       and coalesce(p.quantidade_estoque, 0) - p.quantidade_reservada >= p_quantidade;
+
+    if not found then
+        select tipo::text into v_tipo
+          from public.products
+         where id = p_product_id
+           and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'product % not found', p_product_id
+                using errcode = 'P0002';
+        end if;
+
+        if v_tipo = 'servico' then
+            raise exception 'not_stockable' using errcode = '22023';
+        end if;
+
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+
+    return query
+    with reservation as (
+        insert into public.product_reservations (
+            empresa_id, product_id, quantidade, expires_at, reference
+        )
+        values (
+            p_empresa_id,
+            p_product_id,
+            p_quantidade,
+            now() + make_interval(secs => p_ttl_seconds),
+            p_reference
+        )
+        returning *
+    )
+    select * from reservation;
+end;
+$$;
+
+-- Confirma a reserva como venda: baixa o estoque e a quantidade reservada
+-- no mesmo UPDATE (status `vendido` quando o estoque zera). Idempotente
+-- para reservas já confirmadas.
+create or replace function public.commit_product_reservation(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_reservation_id uuid
+)
+returns setof public.product_reservations
+language plpgsql
+as $$
+declare
+    v_reservation public.product_reservations;
+begin
+    update public.product_reservations
+       set status = 'committed',
+           updated_at = now()
+     where id = p_reservation_id
+       and product_id = p_product_id
+       and empresa_id = p_empresa_id
+       and status = 'active'
+       and expires_at > now()
+    returning * into v_reservation;
+
+    if not found then
+        select * into v_reservation
+          from public.product_reservations
+         where id = p_reservation_id
+           and product_id = p_product_id
+           and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'reservation % not found', p_reservation_id
+                using errcode = 'P0002';
+        end if;
+
+        if v_reservation.status = 'committed' then
+            return next v_reservation;
+            return;
+        end if;
+
+        -- Vencida mas ainda não varrida conta como expirada
+        raise exception 'reservation_%',
+            case when v_reservation.status = 'active' then 'expired'
+                 else v_reservation.status end
+            using errcode = '55000';
+    end if;
+
+    update public.products p
+       set quantidade_estoque = coalesce(p.quantidade_estoque, 0) - v_reservation.quantidade,
+           quantidade_reservada = p.quantidade_reservada - v_reservation.quantidade,
+           status = case
+               when coalesce(p.quantidade_estoque, 0) - v_reservation.quantidade = 0
+                   then 'vendido'
+               else 'ativo'
+           end,
+           updated_at = now()
+     where p.id = v_reservation.product_id
+       and coalesce(p.quantidade_estoque, 0) >= v_reservation.quantidade;
+
+    if not found then
+        -- Estoque reduzido por ajuste manual abaixo do reservado
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+
+    return next v_reservation;
+end;
+$$;
+
+-- Libera a reserva, devolvendo a quantidade ao estoque disponível.
+-- Idempotente para reservas já liberadas ou expiradas.
+create or replace function public.release_product_reservation(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_reservation_id uuid
+)
+returns setof public.product_reservations
+language plpgsql
+as $$
+declare
+    v_reservation public.product_reservations;
+begin
+    update public.product_reservations
+       set status = 'released',
+           updated_at = now()
+     where id = p_reservation_id
+       and product_id = p_product_id
+       and empresa_id = p_empresa_id
+       and status = 'active'
+    returning * into v_reservation;
+
+    if not found then
+        select * into v_reservation
+          from public.product_reservations
+         where id = p_reservation_id
+           and product_id = p_product_id
+           and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'reservation % not found', p_reservation_id
+                using errcode = 'P0002';
+        end if;
+
+        if v_reservation.status = 'committed' then
+            raise exception 'reservation_committed' using errcode = '55000';
+        end if;
+
+        return next v_reservation;
+        return;
+    end if;
+
+    update public.products p
+       set quantidade_reservada = p.quantidade_reservada - v_reservation.quantidade
+     where p.id = v_reservation.product_id;
+
+    return next v_reservation;
+end;
+$$;
+
+-- Venda direta: só o estoque não reservado está disponível
+create or replace function public.sell_product(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_quantidade integer default 1
+)
+returns setof public.products
+language plpgsql
+as $$
+begin
+    perform public.expire_product_reservations(p_product_id);
+
+    return query
+    with sold as (
+        update public.products p
+           set quantidade_estoque = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                       then p.quantidade_estoque
+                   else coalesce(p.quantidade_estoque, 0) - p_quantidade
+               end,
+               status = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                     or coalesce(p.quantidade_estoque, 0) - p_quantidade = 0
+                       then 'vendido'
+                   else 'ativo'
+               end,
+               updated_at = now()
+         where p.id = p_product_id
+           and p.empresa_id = p_empresa_id
+           and (
+               coalesce(p.tipo::text, 'produto') = 'servico'
+               or coalesce(p.quantidade_estoque, 0) - p.quantidade_reservada >= p_quantidade
+           )
+        returning p.*
+    )
+    select * from sold;
+
+    if not found then
+        perform 1
+           from public.products
+          where id = p_product_id
+            and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'product % not found', p_product_id
+                using errcode = 'P0002';
+        end if;
+
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+end;
+$$;
+
+-- Ajuste de estoque: o novo valor não pode ficar abaixo do reservado, senão
+-- o disponível fica negativo e as confirmações pendentes falham
+create or replace function public.adjust_product_stock(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_delta integer default null,
+    p_quantidade integer default null
+)
+returns setof public.products
+language plpgsql
+as $$
+begin
+    perform public.expire_product_reservations(p_product_id);
+
+    -- `p_quantidade` define o valor absoluto; senão aplica `p_delta`.
+    -- Produto que zera vira `vendido`; `vendido` reabastecido volta a
+    -- `ativo` (mesma regra de sell_product). Outros status são mantidos.
+    return query
+    with adjusted as (
+        update public.products p
+           set quantidade_estoque = coalesce(
+                   p_quantidade,
+                   coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+               ),
+               status = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                       then p.status
+                   when p.status::text = 'ativo' and coalesce(
+                           p_quantidade,
+                           coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+                       ) = 0
+                       then 'vendido'
+                   when p.status::text = 'vendido' and coalesce(
+                           p_quantidade,
+                           coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+                       ) > 0
+                       then 'ativo'
+                   else p.status
+               end,
+               updated_at = now()
+         where p.id = p_product_id
+           and p.empresa_id = p_empresa_id
+           and coalesce(
+                   p_quantidade,
+                   coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+               ) >= p.quantidade_reservada
+        returning p.*
+    )
+    select * from adjusted;
+
+    if not found then
+        perform 1
+           from public.products
+          where id = p_product_id
+            and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'product % not found', p_product_id
+                using errcode = 'P0002';
+        end if;
+
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+end;
+$$;
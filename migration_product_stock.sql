@@ -0,0 +1,133 @@
+-- =====================================================
+-- Ajuste de estoque e venda atômicos
+-- =====================================================
+-- `POST /products/{id}/adjust-stock` e `POST /products/{id}/mark-sold`
+-- aplicam a variação num único UPDATE condicional
+-- (`estoque = estoque + delta WHERE estoque + delta >= 0`). Em READ
+-- COMMITTED, um UPDATE concorrente na mesma linha espera o outro terminar
+-- e reavalia a condição sobre o valor já gravado: não há atualização
+-- perdida nem venda além do estoque.
+--
+-- As duas funções retornam a linha alterada (`setof products`), então a API
+-- busca o produto com categoria e imagens na mesma chamada.
+--
+-- Erros, mapeados pela API:
+--   - P0002 (no_data_found): produto inexistente ou de outra empresa -> 404;
+--   - 23514 (check_violation, 'insufficient_stock'): estoque insuficiente
+--     -> 409.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create or replace function public.adjust_product_stock(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_delta integer default null,
+    p_quantidade integer default null
+)
+returns setof public.products
+language plpgsql
+as $$
+begin
+    -- `p_quantidade` define o valor absoluto; senão aplica `p_delta`.
+    -- Produto que zera vira `vendido`; `vendido` reabastecido volta a
+    -- `ativo` (mesma regra de sell_product). Outros status são mantidos.
+    return query
+    with adjusted as (
+        update public.products p
+           set quantidade_estoque = coalesce(
+                   p_quantidade,
+                   coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+               ),
+               status = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                       then p.status
+                   when p.status::text = 'ativo' and coalesce(
+                           p_quantidade,
+                           coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+                       ) = 0
+                       then 'vendido'
+                   when p.status::text = 'vendido' and coalesce(
+                           p_quantidade,
+                           coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+                       ) > 0
+                       then 'ativo'
+                   else p.status
+               end,
+               updated_at = now()
+         where p.id = p_product_id
+           and p.empresa_id = p_empresa_id
+           and coalesce(
+                   p_quantidade,
+                   coalesce(p.quantidade_estoque, 0) + coalesce(p_delta, 0)
+               ) >= 0
+        returning p.*
+    )
+    select * from adjusted;
+
+    if not found then
+        perform 1
+           from public.products
+          where id = p_product_id
+            and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'product % not found', p_product_id
+                using errcode = 'P0002';
+        end if;
+
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+end;
+$$;
+
+-- Serviço: só marca como vendido. Produto: baixa `p_quantidade` do estoque
+-- e marca como vendido quando zera (senão mantém/volta para ativo).
+create or replace function public.sell_product(
+    p_empresa_id uuid,
+    p_product_id uuid,
+    p_quantidade integer default 1
+)
+returns setof public.products
+language plpgsql
+as $$
+begin
+    return query
+    with sold as (
+        update public.products p
+           set quantidade_estoque = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                       then p.quantidade_estoque
+                   else coalesce(p.quantidade_estoque, 0) - p_quantidade
+               end,
+               status = case
+                   when coalesce(p.tipo::text, 'produto') = 'servico'
+                     or coalesce(p.quantidade_estoque, 0) - p_quantidade = 0
+                       then 'vendido'
+                   else 'ativo'
+               end,
+               updated_at = now()
+         where p.id = p_product_id
+           and p.empresa_id = p_empresa_id
+           and (
+               coalesce(p.tipo::text, 'produto') = 'servico'
+               or coalesce(p.quantidade_estoque, 0) >= p_quantidade
+           )
+        returning p.*
+    )
+    select * from sold;
+
+    if not found then
+        perform 1
+           from public.products
+          where id = p_product_id
+            and empresa_id = p_empresa_id;
+
+        if not found then
+            raise exception 'product % not found', p_product_id
+                using errcode = 'P0002';
+        end if;
+
+        raise exception 'insufficient_stock' using errcode = '23514';
+    end if;
+end;
+$$;
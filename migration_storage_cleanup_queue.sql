@@ -0,0 +1,48 @@
+-- =====================================================
+-- Fila persistente de remoção de arquivos do Storage
+-- =====================================================
+-- Os deletes de produtos, imagens e anexos de leads apagam o registro e
+-- enfileiram aqui os caminhos dos arquivos; o worker da API reserva lotes
+-- com claim_storage_cleanup (FOR UPDATE SKIP LOCKED + lease), remove do
+-- bucket em chamadas `remove([...])` e apaga as linhas removidas. Falhas
+-- voltam para a fila com backoff; um lote cujo worker morreu volta quando
+-- o lease (locked_until) expira. A fila sobrevive a restarts da API.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create table if not exists public.storage_cleanup_queue (
+    id uuid primary key default gen_random_uuid(),
+    bucket text not null,
+    path text not null,
+    attempts integer not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    locked_until timestamptz,
+    last_error text,
+    created_at timestamptz not null default now(),
+    constraint storage_cleanup_queue_bucket_path unique (bucket, path)
+);
+
+create index if not exists idx_storage_cleanup_queue_due
+    on public.storage_cleanup_queue (next_attempt_at);
+
+create or replace function public.claim_storage_cleanup(
+    p_limit integer,
+    p_lease_seconds integer
+)
+returns setof public.storage_cleanup_queue
+language sql
+as $$
+    update public.storage_cleanup_queue q
+       set attempts = q.attempts + 1,
+           locked_until = now() + make_interval(secs => p_lease_seconds)
+     where q.id in (
+           select id
+             from public.storage_cleanup_queue
+            where next_attempt_at <= now()
+              and (locked_until is null or locked_until < now())
+            order by next_attempt_at
+            limit p_limit
+            for update skip locked
+     )
+    returning q.*;
+$$;
@@ -0,0 +1,57 @@
+-- =====================================================
+-- Fila persistente de envios WhatsApp (outbox)
+-- =====================================================
+-- `POST /chat/conversations/{id}/send-async` grava o envio aqui e responde
+-- 202; os workers da API reservam lotes com claim_whatsapp_outbox
+-- (FOR UPDATE SKIP LOCKED + lease) e entregam ao gateway com retry e
+-- backoff exponencial. Um envio cujo worker morreu volta para a fila quando
+-- o lease (locked_until) expira.
+--
+-- Executar no Supabase Dashboard (SQL Editor).
+
+create table if not exists public.whatsapp_outbox (
+    id uuid primary key default gen_random_uuid(),
+    empresa_id uuid not null,
+    conversation_id uuid not null references public.chat_conversations (id) on delete cascade,
+    idempotency_key text,
+    payload jsonb not null,
+    status text not null default 'pending'
+        check (status in ('pending', 'sending', 'sent', 'failed')),
+    attempts integer not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    locked_until timestamptz,
+    last_error text,
+    webhook_response jsonb,
+    sent_at timestamptz,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    constraint whatsapp_outbox_empresa_idempotency_key unique (empresa_id, idempotency_key)
+);
+
+create index if not exists idx_whatsapp_outbox_due
+    on public.whatsapp_outbox (next_attempt_at)
+    where status in ('pending', 'sending');
+
+create or replace function public.claim_whatsapp_outbox(
+    p_limit integer,
+    p_lease_seconds integer
+)
+returns setof public.whatsapp_outbox
+language sql
+as $$
+    update public.whatsapp_outbox o
+       set status = 'sending',
+           attempts = o.attempts + 1,
+           locked_until = now() + make_interval(secs => p_lease_seconds),
+           updated_at = now()
+     where o.id in (
+           select id
+             from public.whatsapp_outbox
+            where (status = 'pending' and next_attempt_at <= now())
+               or (status = 'sending' and locked_until < now())
+            order by next_attempt_at
+            limit p_limit
+            for update skip locked
+     )
+    returning o.*;
+$$;
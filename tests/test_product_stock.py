@@ -0,0 +1,242 @@
+"""Concorrência das RPCs de estoque contra um Postgres real.
+
+Roda as funções de `migration_product_stock.sql` e
+`migration_product_reservations.sql` num banco descartável apontado por
+`DATABASE_URL` (pulado sem a variável). As chamadas passam pelo serviço; o
+`FakeSupabase` só troca o PostgREST por uma conexão própria por chamada, que
+executa a RPC e converte o SQLSTATE em `APIError`. Assim a ausência de
+atualizações perdidas vem do UPDATE condicional do banco, não do teste.
+"""
+
+import asyncio
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.core.exceptions import ConflictException
+from app.services import product_service
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL, reason="DATABASE_URL não definido (Postgres descartável)"
+)
+psycopg = pytest.importorskip("psycopg")
+
+ROOT = Path(__file__).resolve().parent.parent
+MIGRATIONS = ("migration_product_stock.sql", "migration_product_reservations.sql")
+
+# Mínimo de `products` usado pelas RPCs, para bancos sem o schema do CRM
+PRODUCTS_TABLE = """
+create table if not exists public.products (
+    id uuid primary key default gen_random_uuid(),
+    empresa_id uuid,
+    nome text,
+    tipo text default 'produto',
+    status text default 'ativo',
+    quantidade_estoque integer,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+)
+"""
+
+RPC_PARAMS = {
+    "adjust_product_stock": ("p_empresa_id", "p_product_id", "p_delta", "p_quantidade"),
+    "sell_product": ("p_empresa_id", "p_product_id", "p_quantidade"),
+}
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _PostgresRpc:
+    """`supabase.rpc(...)` executado direto no Postgres, numa conexão nova."""
+
+    def __init__(self, function: str, params: dict):
+        self._function = function
+        self._params = params
+
+    def select(self, *_columns):
+        return self
+
+    def execute(self):
+        args = ", ".join(
+            f"{name} => %({name})s" for name in RPC_PARAMS[self._function]
+        )
+        sql = f"select to_jsonb(r) from public.{self._function}({args}) as r"
+        try:
+            with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                rows = conn.execute(sql, self._params).fetchall()
+        except psycopg.Error as exc:
+            raise APIError({
+                "code": exc.sqlstate,
+                "message": exc.diag.message_primary,
+            }) from exc
+        return _FakeResponse([row[0] for row in rows])
+
+
+class FakeSupabase:
+    def rpc(self, function: str, params: dict):
+        return _PostgresRpc(function, params)
+
+
+@pytest.fixture(scope="module")
+def schema():
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(PRODUCTS_TABLE)
+        for name in MIGRATIONS:
+            conn.execute((ROOT / name).read_text())
+
+
+@pytest.fixture
+def product(schema, monkeypatch):
+    """Produto com estoque 7 numa empresa própria, removido ao final."""
+    monkeypatch.setattr(product_service, "get_supabase", lambda: FakeSupabase())
+    empresa_id = str(uuid.uuid4())
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        product_id = conn.execute(
+            "insert into public.products "
+            "(empresa_id, nome, tipo, status, quantidade_estoque) "
+            "values (%s, 'Produto de teste', 'produto', 'ativo', 7) returning id::text",
+            (empresa_id,),
+        ).fetchone()[0]
+    yield empresa_id, product_id
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute("delete from public.products where id = %s", (product_id,))
+
+
+def _row(product_id: str) -> dict:
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        return conn.execute(
+            "select to_jsonb(p) from public.products p where id = %s", (product_id,)
+        ).fetchone()[0]
+
+
+def _reserve(empresa_id: str, product_id: str, quantidade: int) -> None:
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(
+            "insert into public.product_reservations "
+            "(empresa_id, product_id, quantidade, expires_at) "
+            "values (%s, %s, %s, now() + interval '1 hour')",
+            (empresa_id, product_id, quantidade),
+        )
+        conn.execute(
+            "update public.products set quantidade_reservada = quantidade_reservada + %s "
+            "where id = %s",
+            (quantidade, product_id),
+        )
+
+
+def _run_concurrently(calls: list) -> list:
+    """Executa as corrotinas em threads, liberadas juntas por uma barreira."""
+    barrier = threading.Barrier(len(calls))
+
+    def run(make_call):
+        barrier.wait()
+        try:
+            return asyncio.run(make_call())
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def test_concurrent_decrements_never_oversell(product):
+    empresa_id, product_id = product
+    calls = []
+    for i in range(20):
+        if i % 2:
+            calls.append(
+                lambda: product_service.adjust_stock(empresa_id, product_id, delta=-1)
+            )
+        else:
+            calls.append(
+                lambda: product_service.mark_product_as_sold(empresa_id, product_id, 1)
+            )
+
+    results = _run_concurrently(calls)
+
+    succeeded = [r for r in results if isinstance(r, dict)]
+    failed = [r for r in results if not isinstance(r, dict)]
+    assert len(succeeded) == 7
+    assert len(failed) == len(calls) - 7
+    assert all(isinstance(exc, ConflictException) for exc in failed)
+    assert all(exc.status_code == 409 for exc in failed)
+
+    row = _row(product_id)
+    assert row["quantidade_estoque"] == 0
+    assert row["status"] == "vendido"
+
+
+def test_concurrent_increments_are_all_applied(product):
+    empresa_id, product_id = product
+    calls = [
+        lambda: product_service.adjust_stock(empresa_id, product_id, delta=2)
+        for _ in range(20)
+    ]
+
+    results = _run_concurrently(calls)
+
+    assert all(isinstance(r, dict) for r in results)
+    row = _row(product_id)
+    assert row["quantidade_estoque"] == 7 + 20 * 2
+    assert row["status"] == "ativo"
+
+
+def test_restock_reactivates_sold_product(product):
+    empresa_id, product_id = product
+    asyncio.run(product_service.adjust_stock(empresa_id, product_id, quantidade_estoque=0))
+    assert _row(product_id)["status"] == "vendido"
+
+    result = asyncio.run(product_service.adjust_stock(empresa_id, product_id, delta=3))
+
+    assert result["quantidade_estoque"] == 3
+    assert result["quantidade_disponivel"] == 3
+    assert _row(product_id)["status"] == "ativo"
+
+
+def test_adjust_cannot_drop_below_reserved_stock(product):
+    empresa_id, product_id = product
+    _reserve(empresa_id, product_id, 3)
+
+    with pytest.raises(ConflictException):
+        asyncio.run(
+            product_service.adjust_stock(empresa_id, product_id, quantidade_estoque=2)
+        )
+    with pytest.raises(ConflictException):
+        asyncio.run(product_service.adjust_stock(empresa_id, product_id, delta=-5))
+
+    result = asyncio.run(product_service.adjust_stock(empresa_id, product_id, delta=-4))
+    assert result["quantidade_estoque"] == 3
+    assert result["quantidade_disponivel"] == 0
+
+
+def test_patch_stock_goes_through_the_reserved_guard(product, monkeypatch):
+    empresa_id, product_id = product
+    _reserve(empresa_id, product_id, 3)
+
+    async def get_product(*_args):
+        return _row(product_id)
+
+    monkeypatch.setattr(product_service, "get_product", get_product)
+
+    with pytest.raises(ConflictException):
+        asyncio.run(
+            product_service.update_product(
+                empresa_id, product_id, {"quantidade_estoque": 2}
+            )
+        )
+
+    result = asyncio.run(
+        product_service.update_product(empresa_id, product_id, {"quantidade_estoque": 3})
+    )
+    assert result["quantidade_disponivel"] == 0
+    assert _row(product_id)["quantidade_estoque"] == 3